@@ -0,0 +1,199 @@
+# Signed access tokens for the admin API
+#
+# A token is ``<payload>.<signature>``: base64url JSON claims (admin user id,
+# username, role, token id, issue and expiry times) followed by their
+# HMAC-SHA256 under SECRET_KEY. Verifying a token never touches the
+# database; revocations are mirrored into an in-process cache that is
+# refreshed every REVOCATION_CACHE_TTL seconds.
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, RevokedToken
+
+PLACEHOLDER_SECRET_KEY = "your-super-secret-key-here-change-this-in-production"
+
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+if not SECRET_KEY or SECRET_KEY == PLACEHOLDER_SECRET_KEY:
+    # Tokens then only verify in this process and die with it
+    print("SECRET_KEY is not set; using a random key for access tokens")
+    SECRET_KEY = secrets.token_urlsafe(32)
+
+# Lifetime of an access token (seconds)
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", 8 * 3600))
+
+# How stale the revocation cache may get before other workers see a revocation (seconds)
+REVOCATION_CACHE_TTL = int(os.getenv("REVOCATION_CACHE_TTL", 30))
+
+# Static bearer token for scrapers of /metrics and /health/db, which can't log
+# in; when empty those endpoints only accept access tokens
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+def hash_password(password: str) -> str:
+    """Hash password using SHA256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+async def hash_password_async(password: str) -> str:
+    """``hash_password`` on a worker thread, keeping the event loop free"""
+    return await run_in_threadpool(hash_password, password)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY.encode(), payload.encode("ascii"), hashlib.sha256).digest())
+
+def issue_access_token(user_id: int, username: str, role: str) -> Tuple[str, Dict]:
+    """Signed token for an admin user, with its claims"""
+    now = time.time()
+    claims = {
+        "sub": user_id,
+        "username": username,
+        "role": role,
+        "jti": secrets.token_hex(16),
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}", claims
+
+def decode_access_token(token: str) -> Dict:
+    """Claims of a valid, unexpired token; raises ValueError otherwise"""
+    payload, _, signature = token.partition(".")
+    # Tokens are base64url; anything else would fail encoding (and compare_digest) below
+    if not payload or not signature or not token.isascii():
+        raise ValueError("Malformed token")
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        raise ValueError("Invalid token signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise ValueError("Malformed token")
+    if claims.get("exp", 0) < time.time():
+        raise ValueError("Token has expired")
+    return claims
+
+class RevocationCache:
+    """In-process mirror of the revoked_tokens table"""
+
+    def __init__(self):
+        self._tokens: Dict[str, float] = {}
+        self._users: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, claims: Dict) -> bool:
+        if claims["jti"] in self._tokens:
+            return True
+        revoked_at = self._users.get(claims["sub"])
+        return revoked_at is not None and claims["iat"] <= revoked_at
+
+    def _remember(self, row: RevokedToken):
+        if row.jti:
+            self._tokens[row.jti] = row.expires_at
+        else:
+            self._users[row.admin_user_id] = max(self._users.get(row.admin_user_id, 0), row.revoked_at)
+
+    def revoke_token(self, db: Session, claims: Dict):
+        """Revoke one token; takes effect here at once, in other workers on their next refresh"""
+        row = RevokedToken(
+            jti=claims["jti"],
+            admin_user_id=claims["sub"],
+            revoked_at=time.time(),
+            expires_at=claims["exp"]
+        )
+        db.add(row)
+        db.commit()
+        with self._lock:
+            self._remember(row)
+
+    def revoke_user(self, db: Session, user_id: int):
+        """Revoke every token issued to a user so far (e.g. after a password change).
+
+        Adds to the caller's transaction; the caller commits.
+        """
+        now = time.time()
+        row = RevokedToken(
+            jti=None,
+            admin_user_id=user_id,
+            revoked_at=now,
+            expires_at=now + ACCESS_TOKEN_TTL
+        )
+        db.add(row)
+        with self._lock:
+            self._remember(row)
+
+    def refresh(self):
+        """Reload unexpired revocations and drop expired ones"""
+        now = time.time()
+        with SessionLocal() as db:
+            db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+            db.commit()
+            rows = db.execute(select(RevokedToken)).scalars().all()
+        with self._lock:
+            self._tokens = {}
+            self._users = {}
+            for row in rows:
+                self._remember(row)
+
+    async def run_refresher(self):
+        """Refresh every REVOCATION_CACHE_TTL seconds; runs until cancelled"""
+        while True:
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception as e:
+                # Keep serving from the last snapshot
+                print(f"Revocation cache refresh failed: {e}")
+            await asyncio.sleep(REVOCATION_CACHE_TTL)
+
+revocations = RevocationCache()
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def require_access_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> Dict:
+    """Claims of the request's bearer token, verified in memory; 401 if missing or invalid"""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = decode_access_token(credentials.credentials)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    if revocations.is_revoked(claims):
+        raise HTTPException(status_code=401, detail="Token has been revoked", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+async def require_monitoring_access(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> None:
+    """Guard of the monitoring endpoints: an access token, or METRICS_TOKEN if set"""
+    if METRICS_TOKEN and credentials is not None and hmac.compare_digest(
+        credentials.credentials.encode(), METRICS_TOKEN.encode()
+    ):
+        return
+    await require_access_token(credentials)
+
+def require_role(*roles: str):
+    """Dependency accepting only tokens issued to one of ``roles``"""
+    async def dependency(claims: Dict = Depends(require_access_token)) -> Dict:
+        if claims["role"] not in roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return claims
+    return dependency
@@ -0,0 +1,12 @@
+"""Load and latency benchmarks for the API
+
+Run from the backend directory:
+
+    python -m benchmarks --rows 100000 --concurrency 16 --output results.json
+    python -m benchmarks --rows 100000 --concurrency 16 --baseline baseline.json
+
+Every route of main.app is exercised in-process against a freshly seeded
+database (see dataset.py and scenarios.py). The report is JSON with
+throughput and p50/p95/p99 latency per endpoint; with ``--baseline`` it
+also lists regressions, and the exit status is 1 if there are any.
+"""
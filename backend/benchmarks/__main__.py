@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Load and latency benchmarks for the API")
+    parser.add_argument("--rows", type=int, default=10000,
+                        help="users, contact messages, tour requests and orders to seed (each)")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per endpoint first")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic dataset")
+    parser.add_argument("--only", action="append", default=[], metavar="TEXT",
+                        help="only endpoints whose name contains TEXT (repeatable)")
+    parser.add_argument("--database-url",
+                        help="database to benchmark (default: a new SQLite file in a scratch directory)")
+    parser.add_argument("--skip-seed", action="store_true", help="use the rows already in the database")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="compare against this earlier report")
+    parser.add_argument("--save-baseline", type=Path, help="also write the report here, to compare against later")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p95 / throughput change before flagging a regression (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore p95 increases smaller than this, which are mostly noise")
+    return parser.parse_args(argv)
+
+async def benchmark(args, progress) -> dict:
+    # The app and its database are configured on import, so these come after
+    # the environment is set up
+    import httpx
+    from main import app
+    from database import SessionLocal, engine
+    from ingest import INGEST_MODE
+    from benchmarks.dataset import seed, seed_admin
+    from benchmarks.runner import run_scenarios
+    from benchmarks.scenarios import BenchContext, SCENARIOS, uncovered_routes
+
+    scenarios = [s for s in SCENARIOS if not args.only or any(text in s.name for text in args.only)]
+    # Unhandled errors become 500 responses, as behind a real server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    # Startup hooks bring the schema up to date and create the default admins
+    async with app.router.lifespan_context(app):
+        with SessionLocal() as db:
+            seeded = {} if args.skip_seed else seed(db, args.rows, args.seed, progress)
+            seed_admin(db)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            ctx = BenchContext(uuid.uuid4().hex[:8], args.seed)
+            await ctx.setup(client)
+            started_at = datetime.utcnow()
+            endpoints = await run_scenarios(client, ctx, scenarios, args.requests, args.concurrency, args.warmup, progress)
+
+    return {
+        "settings": {
+            "rows": None if args.skip_seed else args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "database": engine.dialect.name,
+            "ingest_mode": INGEST_MODE,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "started_at": started_at.isoformat(),
+        "seeded": seeded,
+        "endpoints": endpoints,
+        "uncovered_routes": uncovered_routes(app, SCENARIOS),
+    }
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    for name in ("output", "baseline", "save_baseline"):
+        if getattr(args, name) is not None:
+            setattr(args, name, getattr(args, name).resolve())
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+
+    # The app keeps data/ and uploads/ relative to the working directory
+    workdir = Path(tempfile.mkdtemp(prefix="benchmark-"))
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir / 'bench.db'}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # Every session comes from this one client and most are never completed
+    os.environ["MAX_UPLOAD_SESSIONS"] = os.environ["MAX_UPLOAD_SESSIONS_PER_CLIENT"] = str(10 ** 6)
+
+    try:
+        # Keep stdout for the report; the app and progress lines go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(benchmark(args, lambda line: print(line, file=sys.stderr)))
+    finally:
+        if args.keep:
+            print(f"Scratch directory kept: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if baseline is not None:
+        from benchmarks.runner import compare
+        report["comparison"] = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        report["comparison"]["baseline"] = str(args.baseline)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        args.save_baseline.write_text(text + "\n")
+
+    if report.get("comparison", {}).get("regressions"):
+        print(f"Regressions: {', '.join(report['comparison']['regressions'])}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
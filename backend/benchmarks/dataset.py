@@ -0,0 +1,188 @@
+# Synthetic dataset for the benchmarks
+#
+# Rows go in through the models and the bulk helpers in database.py, so
+# the triggers behind search and the dashboard counters fire as they do in
+# production. Output is deterministic for a given seed.
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from auth import hash_password
+from catalog import CATEGORY_PRODUCTS
+from database import (
+    AdminUser, ContactMessage, Order, VirtualTour, User, bulk_insert, BULK_CHUNK_SIZE
+)
+
+# Rows generated and written per transaction
+SEED_BATCH_SIZE = 5000
+
+# Account the login and password scenarios act on. Changing a password
+# revokes the account's tokens, so admin routes are called as another user.
+BENCH_ADMIN = {"username": "bench", "email": "bench@example.com", "password": "bench-password", "role": "admin"}
+
+FIRST_NAMES = ["Amara", "Bruno", "Chloe", "Diego", "Elena", "Farid", "Grace", "Hugo", "Ines", "Jonas",
+               "Kofi", "Lea", "Marc", "Nadia", "Omar", "Paula", "Quentin", "Rosa", "Samuel", "Tina"]
+LAST_NAMES = ["Mbeki", "Dupont", "Okafor", "Martin", "Silva", "Nguyen", "Lambert", "Diallo", "Rossi",
+              "Moreau", "Kimani", "Bernard", "Garcia", "Fournier", "Mensah", "Leroy"]
+COMPANIES = ["Atlas Joinery", "Baobab Interiors", "Coastline Marine", "Delta Builders", "Evergreen Cabinets",
+             "Forest Line Furniture", "Granite & Oak", "Harbor Docks", "Ivory Coast Timber", None]
+SUBJECTS = ["Quote for marine plywood", "Melamine colours", "Veneer samples", "Container pricing",
+            "Delivery schedule", "Raw logs availability", "Custom thickness", "Distributor enquiry"]
+WORDS = ("okoume sapele ayous acajou plywood melamine veneer logs container panel sheet thickness "
+         "finish grain moisture marine structural furniture cabinet delivery price quote sample "
+         "export shipment pallet order volume supplier warehouse custom colour board").split()
+LANGUAGES = ["en", "en", "en", "fr"]
+TIMES = ["09:00", "10:30", "13:00", "15:30"]
+
+# Status distributions, weighted towards the states an inbox fills up with
+MESSAGE_STATUSES = (["unread", "read", "replied", "archived"], [4, 3, 2, 1])
+TOUR_STATUSES = (["pending", "confirmed", "completed", "cancelled", "archived"], [4, 2, 2, 1, 1])
+ORDER_STATUSES = (["inquiry", "quote_sent", "confirmed", "in_production", "shipped", "delivered", "cancelled"],
+                  [5, 3, 2, 2, 1, 2, 1])
+
+PRODUCTS = [
+    (category, product["id"])
+    for category, data in CATEGORY_PRODUCTS.items()
+    for product in data["products"]
+]
+UNITS = ["sheets", "m3", "pallets", "containers"]
+
+class DatasetGenerator:
+    """Produces column values for rows numbered from 0; row ``n`` is the
+    same for a given seed whatever the batch size"""
+
+    def __init__(self, seed: int = 0, days: int = 365):
+        self.seed = seed
+        self.days = days
+        self.now = datetime(2026, 1, 1)
+
+    def _random(self, kind: str, n: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{n}")
+
+    def _person(self, rng: random.Random, n: int) -> Dict:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        return dict(
+            name=f"{first} {last}",
+            email=f"{first.lower()}.{last.lower()}.{n}@example.com",
+            company=rng.choice(COMPANIES),
+            phone=f"+1555{rng.randrange(10 ** 7):07d}",
+            language=rng.choice(LANGUAGES),
+        )
+
+    def _text(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def _created_at(self, rng: random.Random) -> datetime:
+        return self.now - timedelta(seconds=rng.randrange(self.days * 86400))
+
+    def user(self, n: int) -> Dict:
+        rng = self._random("user", n)
+        created = self._created_at(rng)
+        return dict(**self._person(rng, n), country=rng.choice(["CA", "FR", "CI", "US", None]),
+                    created_at=created, updated_at=created, is_active=True)
+
+    def contact_message(self, n: int) -> Dict:
+        rng = self._random("contact", n)
+        created = self._created_at(rng)
+        return dict(
+            **self._person(rng, n),
+            subject=rng.choice(SUBJECTS),
+            message=self._text(rng, rng.randrange(10, 80)),
+            status=rng.choices(*MESSAGE_STATUSES)[0],
+            created_at=created, updated_at=created,
+        )
+
+    def virtual_tour(self, n: int) -> Dict:
+        rng = self._random("tour", n)
+        created = self._created_at(rng)
+        return dict(
+            **self._person(rng, n),
+            preferred_date=(created + timedelta(days=rng.randrange(3, 30))).date().isoformat(),
+            preferred_time=rng.choice(TIMES),
+            message=self._text(rng, rng.randrange(5, 40)) if rng.random() < 0.7 else None,
+            status=rng.choices(*TOUR_STATUSES)[0],
+            created_at=created, updated_at=created,
+        )
+
+    def order_products(self, rng: random.Random) -> List[Dict]:
+        return [
+            {"id": product_id, "category": category,
+             "quantity": rng.randrange(1, 200), "unit": rng.choice(UNITS)}
+            for category, product_id in rng.sample(PRODUCTS, rng.randrange(1, 4))
+        ]
+
+    def order(self, n: int) -> Dict:
+        rng = self._random("order", n)
+        created = self._created_at(rng)
+        person = self._person(rng, n)
+        return dict(
+            order_number=f"BENCH-{self.seed}-{n:08d}",
+            customer_name=person["name"],
+            customer_email=person["email"],
+            customer_company=person["company"],
+            customer_phone=person["phone"],
+            products=json.dumps(self.order_products(rng)),
+            total_amount=f"{rng.randrange(500, 250000)}.00",
+            currency="USD",
+            language=person["language"],
+            status=rng.choices(*ORDER_STATUSES)[0],
+            notes=self._text(rng, rng.randrange(3, 20)) if rng.random() < 0.5 else None,
+            created_at=created, updated_at=created,
+        )
+
+def seed_admin(db: Session):
+    """Create BENCH_ADMIN unless it exists"""
+    if db.scalar(select(AdminUser.id).where(AdminUser.username == BENCH_ADMIN["username"])) is None:
+        db.add(AdminUser(
+            username=BENCH_ADMIN["username"],
+            email=BENCH_ADMIN["email"],
+            password_hash=hash_password(BENCH_ADMIN["password"]),
+            role=BENCH_ADMIN["role"],
+        ))
+        db.commit()
+
+def seed(db: Session, rows: int, seed: int = 0, progress=print) -> Dict[str, int]:
+    """Insert ``rows`` users, contact messages, tour requests and orders
+    (with their line items) and return the number of rows written per table"""
+    from main import build_order_items, insert_order_items
+
+    generator = DatasetGenerator(seed)
+    written = {"users": 0, "contact_messages": 0, "virtual_tours": 0, "orders": 0, "order_items": 0}
+    tables = [
+        ("users", User, generator.user),
+        ("contact_messages", ContactMessage, generator.contact_message),
+        ("virtual_tours", VirtualTour, generator.virtual_tour),
+        ("orders", Order, generator.order),
+    ]
+    for table, model, make_row in tables:
+        for start in range(0, rows, SEED_BATCH_SIZE):
+            batch = [make_row(n) for n in range(start, min(rows, start + SEED_BATCH_SIZE))]
+            ids = bulk_insert(db, model, batch)
+            if model is Order:
+                if None in ids:
+                    # No RETURNING for executemany on this database
+                    numbers = [row["order_number"] for row in batch]
+                    by_number = {}
+                    for offset in range(0, len(numbers), BULK_CHUNK_SIZE):
+                        chunk = numbers[offset:offset + BULK_CHUNK_SIZE]
+                        by_number.update(db.execute(
+                            select(Order.order_number, Order.id).where(Order.order_number.in_(chunk))
+                        ).all())
+                    ids = [by_number[number] for number in numbers]
+                items = [
+                    item
+                    for order_id, row in zip(ids, batch)
+                    for item in build_order_items(order_id, json.loads(row["products"]))
+                ]
+                insert_order_items(db, items)
+                written["order_items"] += len(items)
+            db.commit()
+            written[table] += len(batch)
+            progress(f"Seeded {written[table]}/{rows} {table}")
+    seed_admin(db)
+    return written
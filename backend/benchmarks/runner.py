@@ -0,0 +1,136 @@
+# Drives the scenarios against the app in-process and summarizes latencies
+#
+# Requests go through httpx's ASGI transport straight into main.app, with
+# no sockets or server in between, so the numbers cover the application
+# and the database only.
+
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.scenarios import BenchContext, Scenario
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(scenario: Scenario, latencies: List[float], statuses: Dict[str, int], errors: int, wall: float) -> Dict:
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": len(ordered),
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": round(len(ordered) / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, ctx: BenchContext, scenario: Scenario,
+                       requests: int, concurrency: int, warmup: int) -> Dict:
+    """Send ``requests`` requests (after ``warmup`` untimed ones) from
+    ``concurrency`` concurrent workers and summarize them"""
+    total = min(requests, scenario.max_requests or requests)
+    indexes = list(range(warmup + total))
+
+    # Per-request setup happens up front so it doesn't count towards throughput
+    prepared = {}
+    if scenario.prepare is not None:
+        for i in indexes:
+            prepared[i] = await scenario.prepare(client, ctx, i)
+
+    async def send(i: int) -> httpx.Response:
+        return await client.request(scenario.method, **scenario.build(ctx, i, prepared.get(i)))
+
+    for i in indexes[:warmup]:
+        await send(i)
+
+    measured = iter(indexes[warmup:])
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in measured:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not status.isdigit() or int(status) >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return summarize(scenario, latencies, statuses, errors, time.perf_counter() - started)
+
+async def run_scenarios(client: httpx.AsyncClient, ctx: BenchContext, scenarios: List[Scenario],
+                        requests: int, concurrency: int, warmup: int, progress=print) -> Dict[str, Dict]:
+    results = {}
+    for scenario in scenarios:
+        result = await run_scenario(client, ctx, scenario, requests, concurrency, warmup)
+        results[scenario.name] = result
+        progress(
+            f"{scenario.name}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+            f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, {result['errors']} errors"
+        )
+    return results
+
+# Settings that must match for a comparison with a baseline to mean anything
+COMPARABLE_SETTINGS = ("rows", "concurrency", "database", "ingest_mode")
+
+def compare(report: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> Dict:
+    """Flag endpoints that got slower than ``baseline`` by more than ``tolerance``.
+
+    A regression is a p95 more than ``tolerance`` (a fraction) and
+    ``min_delta_ms`` above the baseline's, a throughput more than
+    ``tolerance`` below it, or errors where the baseline had none.
+    """
+    warnings = [
+        f"{setting} differs from the baseline ({baseline['settings'].get(setting)!r} vs {report['settings'].get(setting)!r})"
+        for setting in COMPARABLE_SETTINGS
+        if baseline.get("settings", {}).get(setting) != report["settings"].get(setting)
+    ]
+    endpoints = {}
+    regressions = []
+    for name, current in report["endpoints"].items():
+        before: Optional[Dict] = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        problems = []
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance) and current["p95_ms"] - before["p95_ms"] > min_delta_ms:
+            problems.append("p95")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append("throughput")
+        if current["errors"] and not before["errors"]:
+            problems.append("errors")
+        endpoints[name] = {
+            "p95_ms": {"baseline": before["p95_ms"], "current": current["p95_ms"]},
+            "throughput_rps": {"baseline": before["throughput_rps"], "current": current["throughput_rps"]},
+            "p95_change": round(current["p95_ms"] / before["p95_ms"] - 1, 3) if before["p95_ms"] else None,
+            "regressed": problems,
+        }
+        if problems:
+            regressions.append(name)
+    return {
+        "tolerance": tolerance,
+        "min_delta_ms": min_delta_ms,
+        "warnings": warnings,
+        "missing": [name for name in baseline.get("endpoints", {}) if name not in report["endpoints"]],
+        "regressions": regressions,
+        "endpoints": endpoints,
+    }
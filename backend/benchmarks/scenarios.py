@@ -0,0 +1,333 @@
+# One scenario per route of main.app
+#
+# A scenario builds the i-th request of its run. ``prepare`` does untimed
+# per-request setup (creating the row a DELETE removes, the upload session
+# a chunk goes into, ...), so only the request itself is measured.
+
+import hashlib
+import io
+import json
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from PIL import Image
+from sqlalchemy import select
+
+from auth import issue_access_token
+from benchmarks.dataset import BENCH_ADMIN, DatasetGenerator, PRODUCTS
+from catalog import CATEGORY_PRODUCTS
+from database import SessionLocal, AdminUser, ContactMessage, VirtualTour
+from exports import EXPORTS
+
+# Records per request for the bulk ingestion scenarios (5x as many ids for bulk actions)
+BULK_REQUEST_SIZE = 100
+
+SEARCH_QUERIES = ["marine plywood", "okoume", "veneer samples", "container price", "melamine finish", "sapele"]
+
+VIDEO_BYTES = bytes(range(256)) * 256  # 64 KB, one resumable chunk
+
+class BenchContext:
+    """State shared by the scenarios of one run: credentials, ids of seeded
+    rows and the fixture files uploaded during setup"""
+
+    def __init__(self, tag: str, seed: int = 0):
+        self.tag = tag
+        self.random = random.Random(seed)
+        self.generator = DatasetGenerator(seed)
+        self.headers: Dict[str, str] = {}
+        self.bench_admin_id: Optional[int] = None
+        self.contact_ids: List[int] = []
+        self.tour_ids: List[int] = []
+        self.image: Optional[str] = None
+        self.video: Optional[str] = None
+        self.upload_session: Optional[str] = None
+        self.reset_token: Optional[str] = None
+        self.png = self._png()
+
+    @staticmethod
+    def _png() -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480), (139, 90, 43)).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def pick(self, ids: List[int]) -> int:
+        return self.random.choice(ids) if ids else 1
+
+    def sample(self, ids: List[int]) -> List[int]:
+        return self.random.sample(ids, min(len(ids), BULK_REQUEST_SIZE * 5))
+
+    def unique_email(self, prefix: str, i: int) -> str:
+        return f"{prefix}.{self.tag}.{i}@example.com"
+
+    async def setup(self, client: httpx.AsyncClient):
+        from main import reset_tokens, RESET_TOKEN_TTL, DEFAULT_ADMIN_USERS
+
+        with SessionLocal() as db:
+            self.bench_admin_id = db.scalar(select(AdminUser.id).where(AdminUser.username == BENCH_ADMIN["username"]))
+            # Admin routes run as the default admin; password changes revoke the bench account's tokens
+            admin = db.execute(select(AdminUser).where(AdminUser.username == DEFAULT_ADMIN_USERS[0]["username"])).scalar_one()
+            token, _ = issue_access_token(admin.id, admin.username, admin.role)
+            self.headers = {"Authorization": f"Bearer {token}"}
+            # A sample of ids for the routes that address single rows
+            self.contact_ids = list(db.scalars(select(ContactMessage.id).limit(10000)))
+            self.tour_ids = list(db.scalars(select(VirtualTour.id).limit(10000)))
+
+        response = await client.post("/api/upload/image", files={"file": ("bench.png", self.png, "image/png")})
+        response.raise_for_status()
+        self.image = response.json()["filename"]
+        response = await client.post("/api/upload/video", files={"file": ("bench.mp4", VIDEO_BYTES, "video/mp4")})
+        response.raise_for_status()
+        self.video = response.json()["filename"]
+        self.upload_session = await self.create_upload_session(client)
+
+        self.reset_token = f"bench-{self.tag}"
+        await reset_tokens.set_async(
+            self.reset_token, {"user_id": self.bench_admin_id, "email": BENCH_ADMIN["email"]}, RESET_TOKEN_TTL
+        )
+
+    async def create_upload_session(self, client: httpx.AsyncClient) -> str:
+        response = await client.post("/api/upload/video/sessions", json={
+            "filename": "bench.mp4", "size": len(VIDEO_BYTES), "content_type": "video/mp4"
+        })
+        response.raise_for_status()
+        return response.json()["session_id"]
+
+    # Request bodies, one per i
+
+    def contact_body(self, i: int) -> Dict:
+        row = self.generator.contact_message(i)
+        return {
+            "name": row["name"], "email": self.unique_email("contact", i), "company": row["company"],
+            "phone": row["phone"], "subject": row["subject"], "message": row["message"], "language": row["language"],
+        }
+
+    def tour_body(self, i: int) -> Dict:
+        row = self.generator.virtual_tour(i)
+        return {
+            "name": row["name"], "email": self.unique_email("tour", i), "company": row["company"],
+            "phone": row["phone"], "preferredDate": row["preferred_date"], "preferredTime": row["preferred_time"],
+            "message": row["message"], "language": row["language"],
+        }
+
+    def order_body(self, i: int) -> Dict:
+        row = self.generator.order(i)
+        return {
+            "customer_name": row["customer_name"], "customer_email": self.unique_email("order", i),
+            "customer_company": row["customer_company"], "customer_phone": row["customer_phone"],
+            "products": json.loads(row["products"]), "notes": row["notes"], "language": row["language"],
+        }
+
+    def bulk_body(self, make: Callable[[int], Dict], i: int) -> List[Dict]:
+        return [make(i * BULK_REQUEST_SIZE + n) for n in range(BULK_REQUEST_SIZE)]
+
+Build = Callable[[BenchContext, int, object], Dict]
+Prepare = Callable[[httpx.AsyncClient, BenchContext, int], Awaitable[object]]
+
+class Scenario:
+    """Request ``i`` of a run is ``client.request(method, **build(ctx, i, prepared))``.
+
+    ``max_requests`` caps the run for scenarios whose cost grows with the
+    dataset (full exports, recounts).
+    """
+
+    def __init__(self, method: str, route: str, build: Build, prepare: Optional[Prepare] = None,
+                 variant: Optional[str] = None, max_requests: Optional[int] = None):
+        self.method = method
+        self.route = route
+        self.build = build
+        self.prepare = prepare
+        self.variant = variant
+        self.max_requests = max_requests
+
+    @property
+    def name(self) -> str:
+        name = f"{self.method} {self.route}"
+        return f"{name} [{self.variant}]" if self.variant else name
+
+def authed(ctx: BenchContext, **kwargs) -> Dict:
+    return {**kwargs, "headers": {**ctx.headers, **kwargs.get("headers", {})}}
+
+async def _create_contact(client, ctx, i):
+    response = await client.post("/api/contact", json=ctx.contact_body(10 ** 6 + i))
+    return response.json()["message_id"]
+
+async def _create_tour(client, ctx, i):
+    response = await client.post("/api/virtual-tour", json=ctx.tour_body(10 ** 6 + i))
+    return response.json()["tour_id"]
+
+async def _create_session(client, ctx, i):
+    return await ctx.create_upload_session(client)
+
+async def _create_filled_session(client, ctx, i):
+    session_id = await ctx.create_upload_session(client)
+    response = await client.put(f"/api/upload/video/sessions/{session_id}/chunks/0", content=VIDEO_BYTES)
+    response.raise_for_status()
+    return session_id
+
+async def _issue_token(client, ctx, i):
+    token, _ = issue_access_token(ctx.bench_admin_id, BENCH_ADMIN["username"], BENCH_ADMIN["role"])
+    return token
+
+async def _set_reset_token(client, ctx, i):
+    from main import reset_tokens, RESET_TOKEN_TTL
+
+    token = f"bench-{ctx.tag}-{i}"
+    await reset_tokens.set_async(token, {"user_id": ctx.bench_admin_id, "email": BENCH_ADMIN["email"]}, RESET_TOKEN_TTL)
+    return token
+
+CATEGORIES = list(CATEGORY_PRODUCTS)
+EXPORT_KINDS = list(EXPORTS)
+VIDEO_SHA256 = hashlib.sha256(VIDEO_BYTES).hexdigest()
+
+SCENARIOS = [
+    # Static and cached payloads
+    Scenario("GET", "/", lambda ctx, i, _: {"url": "/"}),
+    Scenario("GET", "/health", lambda ctx, i, _: {"url": "/health"}),
+    Scenario("GET", "/health/db", lambda ctx, i, _: authed(ctx, url="/health/db")),
+    Scenario("GET", "/metrics", lambda ctx, i, _: authed(ctx, url="/metrics")),
+    Scenario("GET", "/api/detect-language", lambda ctx, i, _: {
+        "url": "/api/detect-language", "headers": {"Accept-Language": "fr-CA,fr;q=0.9,en;q=0.8"}
+    }),
+    Scenario("GET", "/api/translations/{language}", lambda ctx, i, _: {"url": f"/api/translations/{'en' if i % 2 else 'fr'}"}),
+    Scenario("GET", "/api/products", lambda ctx, i, _: {"url": "/api/products"}),
+    Scenario("GET", "/api/products/{category}", lambda ctx, i, _: {"url": f"/api/products/{CATEGORIES[i % len(CATEGORIES)]}"}),
+    Scenario("GET", "/api/sample-request", lambda ctx, i, _: {"url": "/api/sample-request"}),
+    Scenario("GET", "/api/company-info", lambda ctx, i, _: {"url": "/api/company-info"}),
+
+    # Public form submissions
+    Scenario("POST", "/api/contact", lambda ctx, i, _: {"url": "/api/contact", "json": ctx.contact_body(i)}),
+    Scenario("POST", "/api/contact/bulk", lambda ctx, i, _: authed(
+        ctx, url="/api/contact/bulk", json=ctx.bulk_body(ctx.contact_body, 10 ** 7 + i)
+    )),
+    Scenario("POST", "/api/virtual-tour", lambda ctx, i, _: {"url": "/api/virtual-tour", "json": ctx.tour_body(i)}),
+    Scenario("POST", "/api/virtual-tour/bulk", lambda ctx, i, _: authed(
+        ctx, url="/api/virtual-tour/bulk", json=ctx.bulk_body(ctx.tour_body, 10 ** 7 + i)
+    )),
+    Scenario("POST", "/api/orders", lambda ctx, i, _: {"url": "/api/orders", "json": ctx.order_body(i)}),
+    Scenario("POST", "/api/orders/bulk", lambda ctx, i, _: authed(
+        ctx, url="/api/orders/bulk", json=ctx.bulk_body(ctx.order_body, 10 ** 7 + i)
+    )),
+    Scenario("POST", "/api/users/register", lambda ctx, i, _: {"url": "/api/users/register", "json": {
+        "name": "Bench User", "email": ctx.unique_email("user", i), "language": "en", "country": "CA"
+    }}),
+
+    # Admin inbox
+    Scenario("GET", "/api/contact-messages", lambda ctx, i, _: authed(ctx, url="/api/contact-messages", params={"page": 1 + i % 5})),
+    Scenario("GET", "/api/contact-messages", lambda ctx, i, _: authed(ctx, url="/api/contact-messages", params={"cursor": ""}), variant="cursor"),
+    Scenario("PATCH", "/api/contact-messages/{message_id}/archive", lambda ctx, i, _: authed(
+        ctx, url=f"/api/contact-messages/{ctx.pick(ctx.contact_ids)}/archive"
+    )),
+    Scenario("DELETE", "/api/contact-messages/{message_id}", lambda ctx, i, message_id: authed(
+        ctx, url=f"/api/contact-messages/{message_id}"
+    ), prepare=_create_contact),
+    Scenario("POST", "/api/contact-messages/bulk-actions", lambda ctx, i, _: authed(
+        ctx, url="/api/contact-messages/bulk-actions", json={
+            "action": "set_status", "status": "read" if i % 2 else "unread", "ids": ctx.sample(ctx.contact_ids)
+        }
+    )),
+    Scenario("GET", "/api/virtual-tours", lambda ctx, i, _: authed(ctx, url="/api/virtual-tours", params={"page": 1 + i % 5})),
+    Scenario("GET", "/api/virtual-tours", lambda ctx, i, _: authed(ctx, url="/api/virtual-tours", params={"cursor": ""}), variant="cursor"),
+    Scenario("PATCH", "/api/virtual-tours/{tour_id}/archive", lambda ctx, i, _: authed(
+        ctx, url=f"/api/virtual-tours/{ctx.pick(ctx.tour_ids)}/archive"
+    )),
+    Scenario("DELETE", "/api/virtual-tours/{tour_id}", lambda ctx, i, tour_id: authed(
+        ctx, url=f"/api/virtual-tours/{tour_id}"
+    ), prepare=_create_tour),
+    Scenario("POST", "/api/virtual-tours/bulk-actions", lambda ctx, i, _: authed(
+        ctx, url="/api/virtual-tours/bulk-actions", json={
+            "action": "set_status", "status": "confirmed" if i % 2 else "pending", "ids": ctx.sample(ctx.tour_ids)
+        }
+    )),
+    Scenario("GET", "/api/orders", lambda ctx, i, _: authed(ctx, url="/api/orders", params={"page": 1 + i % 5})),
+    Scenario("GET", "/api/orders", lambda ctx, i, _: authed(ctx, url="/api/orders", params={
+        "category": PRODUCTS[i % len(PRODUCTS)][0]
+    }), variant="category"),
+    Scenario("GET", "/api/orders/volume", lambda ctx, i, _: authed(ctx, url="/api/orders/volume")),
+    Scenario("GET", "/api/orders/export", lambda ctx, i, _: authed(ctx, url="/api/orders/export"), max_requests=10),
+    Scenario("GET", "/api/export/{kind}", lambda ctx, i, _: authed(
+        ctx, url=f"/api/export/{EXPORT_KINDS[i % len(EXPORT_KINDS)]}", headers={"Accept-Encoding": "identity"}
+    ), max_requests=10),
+    Scenario("GET", "/api/export/{kind}", lambda ctx, i, _: authed(
+        ctx, url="/api/export/contact-messages", params={"format": "ndjson"}, headers={"Accept-Encoding": "gzip"}
+    ), variant="ndjson gzip", max_requests=10),
+    Scenario("GET", "/api/admin/stats", lambda ctx, i, _: authed(ctx, url="/api/admin/stats")),
+    Scenario("POST", "/api/admin/stats/reconcile", lambda ctx, i, _: authed(ctx, url="/api/admin/stats/reconcile"), max_requests=20),
+    Scenario("GET", "/api/admin/ingest", lambda ctx, i, _: authed(ctx, url="/api/admin/ingest")),
+    Scenario("GET", "/api/admin/notifications", lambda ctx, i, _: authed(ctx, url="/api/admin/notifications")),
+    Scenario("GET", "/api/search", lambda ctx, i, _: authed(ctx, url="/api/search", params={
+        "q": SEARCH_QUERIES[i % len(SEARCH_QUERIES)]
+    })),
+
+    # Uploads and media
+    Scenario("POST", "/api/upload/image", lambda ctx, i, _: {
+        "url": "/api/upload/image", "files": {"file": ("bench.png", ctx.png, "image/png")}
+    }),
+    Scenario("POST", "/api/upload/video", lambda ctx, i, _: {
+        "url": "/api/upload/video", "files": {"file": ("bench.mp4", VIDEO_BYTES, "video/mp4")}
+    }),
+    Scenario("POST", "/api/upload/video/sessions", lambda ctx, i, _: {"url": "/api/upload/video/sessions", "json": {
+        "filename": "bench.mp4", "size": len(VIDEO_BYTES), "content_type": "video/mp4"
+    }}),
+    Scenario("GET", "/api/upload/video/sessions/{session_id}", lambda ctx, i, _: {
+        "url": f"/api/upload/video/sessions/{ctx.upload_session}"
+    }),
+    Scenario("PUT", "/api/upload/video/sessions/{session_id}/chunks/{index}", lambda ctx, i, session_id: {
+        "url": f"/api/upload/video/sessions/{session_id}/chunks/0",
+        "content": VIDEO_BYTES, "headers": {"X-Chunk-SHA256": VIDEO_SHA256}
+    }, prepare=_create_session),
+    Scenario("POST", "/api/upload/video/sessions/{session_id}/complete", lambda ctx, i, session_id: {
+        "url": f"/api/upload/video/sessions/{session_id}/complete"
+    }, prepare=_create_filled_session),
+    Scenario("DELETE", "/api/upload/video/sessions/{session_id}", lambda ctx, i, session_id: {
+        "url": f"/api/upload/video/sessions/{session_id}"
+    }, prepare=_create_session),
+    Scenario("GET", "/api/images/{filename}", lambda ctx, i, _: {"url": f"/api/images/{ctx.image}"}),
+    Scenario("GET", "/api/images/{filename}", lambda ctx, i, _: {
+        "url": f"/api/images/{ctx.image}", "params": {"w": 320, "format": "webp"}
+    }, variant="derivative"),
+    Scenario("HEAD", "/api/images/{filename}", lambda ctx, i, _: {"url": f"/api/images/{ctx.image}"}),
+    Scenario("GET", "/api/videos/{filename}", lambda ctx, i, _: {
+        "url": f"/api/videos/{ctx.video}", "headers": {"Range": "bytes=0-4095"}
+    }),
+    Scenario("HEAD", "/api/videos/{filename}", lambda ctx, i, _: {"url": f"/api/videos/{ctx.video}"}),
+
+    # Authentication; password changes target the bench account only
+    Scenario("POST", "/api/auth/login", lambda ctx, i, _: {"url": "/api/auth/login", "json": {
+        "username": BENCH_ADMIN["username"], "password": BENCH_ADMIN["password"]
+    }}),
+    Scenario("POST", "/api/auth/logout", lambda ctx, i, token: {
+        "url": "/api/auth/logout", "headers": {"Authorization": f"Bearer {token}"}
+    }, prepare=_issue_token),
+    Scenario("POST", "/api/auth/register", lambda ctx, i, _: authed(ctx, url="/api/auth/register", json={
+        "username": f"bench-{ctx.tag}-{i}", "email": ctx.unique_email("admin", i),
+        "password": "bench-password", "role": "processor"
+    })),
+    Scenario("POST", "/api/auth/change-password", lambda ctx, i, _: authed(ctx, url="/api/auth/change-password", json={
+        "username": BENCH_ADMIN["username"], "new_password": BENCH_ADMIN["password"]
+    })),
+    Scenario("GET", "/api/auth/users", lambda ctx, i, _: authed(ctx, url="/api/auth/users")),
+    Scenario("POST", "/api/auth/request-password-reset", lambda ctx, i, _: {
+        "url": "/api/auth/request-password-reset", "json": {"email": BENCH_ADMIN["email"]}
+    }),
+    Scenario("POST", "/api/auth/validate-reset-token", lambda ctx, i, _: {
+        "url": "/api/auth/validate-reset-token", "json": {"token": ctx.reset_token}
+    }),
+    Scenario("POST", "/api/auth/reset-password", lambda ctx, i, token: {"url": "/api/auth/reset-password", "json": {
+        "token": token, "new_password": BENCH_ADMIN["password"]
+    }}, prepare=_set_reset_token),
+]
+
+def app_routes(app) -> List[str]:
+    """``METHOD /path`` for every route of ``app`` that a scenario should cover"""
+    routes = []
+    for route in app.routes:
+        if not getattr(route, "include_in_schema", False) and getattr(route, "path", "") != "/metrics":
+            continue
+        for method in sorted(getattr(route, "methods", None) or ()):
+            routes.append(f"{method} {route.path}")
+    return routes
+
+def uncovered_routes(app, scenarios: List[Scenario]) -> List[str]:
+    covered = {f"{s.method} {s.route}" for s in scenarios}
+    return [route for route in app_routes(app) if route not in covered]
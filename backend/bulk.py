@@ -0,0 +1,181 @@
+# Helpers for the bulk ingestion endpoints and the admin bulk actions
+
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import BULK_CHUNK_SIZE
+from exports import naive_utc
+
+# Largest number of records accepted in one bulk request
+BULK_MAX_ITEMS = 50000
+
+# Largest bulk request body accepted (bytes)
+BULK_MAX_BODY_SIZE = int(os.getenv("BULK_MAX_BODY_SIZE", 32 * 1024 * 1024))
+
+def chunked(items: Sequence, size: int = BULK_CHUNK_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def parse_bulk_body(body: bytes, content_type: str) -> List:
+    """Decode a JSON array or an NDJSON body into a list of raw items.
+
+    Undecodable NDJSON lines are kept as ``None`` so they get reported
+    against their position instead of failing the whole batch.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+    return items
+
+def validate_bulk_items(items: List, model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[Dict]]:
+    """Validate every item against ``model``.
+
+    Returns the valid ``(index, instance)`` pairs and a result entry per item,
+    with failures already filled in.
+    """
+    valid = []
+    results: List[Dict] = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "success": False, "errors": ["Item must be a JSON object"]})
+            continue
+        try:
+            valid.append((index, model.model_validate(item)))
+            results.append({"index": index, "success": True})
+        except ValidationError as e:
+            results.append({
+                "index": index,
+                "success": False,
+                "errors": [
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                ]
+            })
+    return valid, results
+
+async def read_bulk_body(request: Request) -> bytes:
+    """The request body, refused with 413 as soon as it passes BULK_MAX_BODY_SIZE"""
+    too_large = HTTPException(status_code=413, detail=f"Body exceeds the {BULK_MAX_BODY_SIZE} byte limit")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > BULK_MAX_BODY_SIZE:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > BULK_MAX_BODY_SIZE:
+            raise too_large
+    return bytes(body)
+
+def _parse_and_validate(body: bytes, content_type: str, model: Type[BaseModel]):
+    return validate_bulk_items(parse_bulk_body(body, content_type), model)
+
+async def read_bulk_items(request: Request, model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[Dict]]:
+    """Read, decode and validate a bulk request body (see validate_bulk_items).
+
+    Decoding and validating tens of thousands of items takes a while, so it
+    runs in the threadpool rather than on the event loop.
+    """
+    body = await read_bulk_body(request)
+    return await run_in_threadpool(_parse_and_validate, body, request.headers.get("content-type", ""), model)
+
+def fill_missing_ids(db: Session, model, key: str, rows: List[dict], ids: List[Optional[int]]) -> List[int]:
+    """Ids of freshly inserted ``rows``, looked up by their unique ``key``
+    column when bulk_insert() couldn't return them (no executemany RETURNING)"""
+    if None not in ids:
+        return ids
+    column = getattr(model, key)
+    found = {}
+    for chunk in chunked([row[key] for row in rows]):
+        found.update(db.execute(select(column, model.id).where(column.in_(chunk))).all())
+    return [found[row[key]] for row in rows]
+
+def bulk_summary(results: List[Dict]) -> Dict:
+    created = sum(1 for result in results if result["success"])
+    return {
+        "success": True,
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }
+
+# Admin bulk actions: archive, delete or re-status many inbox rows with
+# set-based statements in one transaction
+
+BULK_ACTIONS = ("archive", "delete", "set_status")
+
+def bulk_criteria(model, statuses: Optional[Sequence[str]] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, email: Optional[str] = None) -> List:
+    """WHERE clauses for a bulk action filter; raises HTTPException on unknown statuses"""
+    criteria = []
+    if statuses:
+        unknown = [s for s in statuses if s not in model.status.type.enums]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown status: {', '.join(unknown)}")
+        criteria.append(model.status.in_(statuses))
+    if since is not None:
+        criteria.append(model.created_at >= naive_utc(since))
+    if until is not None:
+        criteria.append(model.created_at < naive_utc(until))
+    if email:
+        criteria.append(func.lower(model.email) == email.strip().lower())
+    return criteria
+
+def apply_bulk_action(db: Session, model, action: str, criteria: List,
+                      ids: Optional[Sequence[int]] = None, status: Optional[str] = None) -> int:
+    """Apply ``action`` to the rows of ``model`` matching ``criteria`` (and
+    ``ids``, if given) and commit. Returns the number of rows changed.
+
+    Rows already in the target status are left alone and not counted.
+    Triggers keep the search index and the status counters in step.
+    """
+    if action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Action must be one of: {', '.join(BULK_ACTIONS)}")
+    if action == "archive":
+        status = "archived"
+    elif action == "set_status" and status not in model.status.type.enums:
+        raise HTTPException(
+            status_code=400, detail=f"status must be one of: {', '.join(model.status.type.enums)}"
+        )
+    if ids is None and not criteria:
+        # Never touch a whole table by accident
+        raise HTTPException(status_code=400, detail="Select rows with ids or at least one filter")
+    if ids is not None and len(ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} ids per request")
+
+    if action == "delete":
+        statement = delete(model)
+    else:
+        statement = update(model).where(model.status.is_distinct_from(status)).values(status=status, updated_at=datetime.now())
+    statement = statement.where(*criteria).execution_options(synchronize_session=False)
+
+    affected = 0
+    # Long id lists go in chunks to stay under bound-parameter limits, still in one transaction
+    for chunk in (chunked(sorted(set(ids))) if ids is not None else [None]):
+        chunk_statement = statement.where(model.id.in_(chunk)) if chunk is not None else statement
+        affected += db.execute(chunk_statement).rowcount
+    db.commit()
+    return affected
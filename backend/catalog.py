@@ -0,0 +1,125 @@
+# Static catalog and company data served by the API
+
+PRODUCT_CATEGORIES = {
+    "categories": [
+        {
+            "id": "plywood",
+            "title": "Plywood",
+            "description": "Premium, marine, and structural plywood",
+            "productCount": 3
+        },
+        {
+            "id": "melamine",
+            "title": "Prefinished Melamine",
+            "description": "Various colors with custom options",
+            "productCount": 2
+        },
+        {
+            "id": "melamine-plywood",
+            "title": "Prefinished Melamine Plywood",
+            "description": "High-quality melamine-faced plywood",
+            "productCount": 2
+        },
+        {
+            "id": "veneer",
+            "title": "Wood Veneer",
+            "description": "Different thicknesses and wood types",
+            "productCount": 4
+        },
+        {
+            "id": "logs",
+            "title": "Raw Wood Logs",
+            "description": "Sustainably sourced raw logs",
+            "productCount": 1
+        }
+    ]
+}
+
+CATEGORY_PRODUCTS = {
+    "plywood": {
+        "title": "Plywood",
+        "products": [
+            {
+                "id": "premium-plywood",
+                "title": "Premium Plywood",
+                "description": "High-grade plywood for furniture and construction",
+                "specifications": {
+                    "Thickness": "1mm - 30mm",
+                    "Sizes": "Standard and custom",
+                    "Wood Types": "Okoume, Acajou, Ayous, Sapele"
+                }
+            },
+            {
+                "id": "marine-plywood",
+                "title": "Marine Plywood",
+                "description": "Water-resistant plywood for marine applications",
+                "specifications": {
+                    "Thickness": "6mm - 25mm",
+                    "Water Resistance": "High",
+                    "Applications": "Boats, outdoor furniture"
+                }
+            },
+            {
+                "id": "structural-plywood",
+                "title": "Structural Plywood",
+                "description": "Strong plywood for construction use",
+                "specifications": {
+                    "Thickness": "9mm - 30mm",
+                    "Strength": "High load-bearing capacity",
+                    "Applications": "Construction, flooring"
+                }
+            }
+        ]
+    },
+    "melamine": {
+        "title": "Prefinished Melamine",
+        "products": [
+            {
+                "id": "white-melamine",
+                "title": "White Melamine",
+                "description": "Classic white finish",
+                "specifications": {
+                    "Finish": "Smooth matte",
+                    "Custom Colors": "Available"
+                }
+            },
+            {
+                "id": "wood-grain-melamine",
+                "title": "Wood Grain Melamine",
+                "description": "Natural wood appearance",
+                "specifications": {
+                    "Patterns": "Multiple wood grains",
+                    "Texture": "Embossed"
+                }
+            }
+        ]
+    }
+}
+
+SAMPLE_REQUEST_INFO = {
+    "message": "Sample request endpoint",
+    "process": [
+        "Fill out the sample request form",
+        "Specify products and quantities",
+        "Provide shipping information",
+        "Receive confirmation within 24 hours",
+        "Samples shipped within 3-5 business days"
+    ]
+}
+
+COMPANY_INFO = {
+    "name": "Tropical Wood, a division of Roilux",
+    "location": "Cameroon",
+    "established": "2010",
+    "capacity": "50+ containers per month",
+    "certifications": [
+        "FSC Certified",
+        "ISO 9001:2015",
+        "PEFC Certified"
+    ],
+    "contact": {
+        "email": "roilux.woods@gmail.com",
+        "phone": "+237-681-21-1111",
+        "address": "Abonbang, Cameroon"
+    }
+}
@@ -1,9 +1,22 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Enum, Boolean
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, DateTime, Enum, Boolean, Float, ForeignKey, Index, case, func, literal_column, insert as sa_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from typing import Dict, List, Optional
+from inspect import signature as inspect_signature
+import functools
 import os
+import time
 from dotenv import load_dotenv
+from db_profile import load_engine_profile, engine_kwargs, apply_sqlite_pragmas
+from metrics import current_request, COLLECTORS, DB_POOL_WAIT, DB_POOL_CONNECTIONS
 
 load_dotenv()
 
@@ -16,10 +29,91 @@ DATABASE_URL = os.getenv(
     "sqlite:///./data/tropical_wood.db"
 )
 
-engine = create_engine(DATABASE_URL, echo=True)
+# Serve DB endpoints from an async engine (set DB_ASYNC=false for the sync threadpool path)
+USE_ASYNC_DB = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+
+# Async drivers for the sync URLs we support
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver equivalent"""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database '{backend}'")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+ASYNC_DATABASE_URL = (
+    os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+) if USE_ASYNC_DB else None
+
+# Pool sizing, SQL echo and SQLite PRAGMAs come from DB_PROFILE (see db_profile.py)
+ENGINE_PROFILE = load_engine_profile(DATABASE_URL)
+
+engine = create_engine(DATABASE_URL, **engine_kwargs(ENGINE_PROFILE))
+apply_sqlite_pragmas(engine, ENGINE_PROFILE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Objects returned from async sessions are used after the session ends,
+# so they must not be expired on commit
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_kwargs(ENGINE_PROFILE, asynchronous=True)) if USE_ASYNC_DB else None
+if async_engine is not None:
+    apply_sqlite_pragmas(async_engine.sync_engine, ENGINE_PROFILE)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+) if USE_ASYNC_DB else None
+
+def instrument_engine(sync_engine, name: str):
+    """Count queries and DB time into the current request's metrics, and
+    record how long pool checkouts wait (see metrics.py)"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+    
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        started = conn.info.pop("query_started", None)
+        if stats is not None and started is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+    
+    # Pools have no event before a checkout starts waiting, so time the getter itself
+    pool = sync_engine.pool
+    do_get = pool._do_get
+    
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started, name)
+    
+    pool._do_get = timed_do_get
+    
+    def collect_pool_status():
+        # Only queue pools track these; SQLite's in-memory pools don't.
+        # QueuePool counts overflow up from -size, so clamp it at zero
+        for state in ("size", "checkedout", "overflow", "checkedin"):
+            if hasattr(pool, state):
+                DB_POOL_CONNECTIONS.set(name, state, value=max(0, getattr(pool, state)()))
+    
+    COLLECTORS.append(collect_pool_status)
+
+instrument_engine(engine, "sync")
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine, "async")
+
+def archived_flag(status):
+    """Sort key putting archived rows last; rendered with inline literals so the
+    query expression matches the inbox indexes exactly"""
+    return case((status == literal_column("'archived'"), literal_column("1")), else_=literal_column("0"))
+
 # Database Models
 class User(Base):
     __tablename__ = "users"
@@ -48,6 +142,34 @@ class AdminUser(Base):
     last_login = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
 
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # A row without a token id revokes every token the user was issued before revoked_at
+    jti = Column(String(64), unique=True, nullable=True)
+    admin_user_id = Column(Integer, ForeignKey("admin_users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Unix timestamps, compared directly against token claims
+    revoked_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
+class KeyValueEntry(Base):
+    """Entries of the database-backed TTL store (see kvstore.py)"""
+    __tablename__ = "kv_entries"
+    
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)  # JSON
+    # Unix timestamp
+    expires_at = Column(Float, nullable=False, index=True)
+
+class StatusCounter(Base):
+    """Rows per status of each record kind, kept current by triggers (migration 0003)"""
+    __tablename__ = "status_counters"
+    
+    kind = Column(String(20), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
 class ContactMessage(Base):
     __tablename__ = "contact_messages"
     
@@ -63,6 +185,13 @@ class ContactMessage(Base):
     status = Column(Enum("unread", "read", "replied", "archived", name="message_status"), default="unread")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Journal id of rows written by the write-behind queue (ingest.py); keeps replays idempotent
+    submission_id = Column(String(32), unique=True, index=True, nullable=True)
+
+    # Matches the inbox sort order used for keyset pagination (see pagination.py)
+    __table_args__ = (
+        Index("ix_contact_messages_inbox", archived_flag(status), created_at.desc(), id.desc()),
+    )
 
 class VirtualTour(Base):
     __tablename__ = "virtual_tours"
@@ -80,6 +209,13 @@ class VirtualTour(Base):
     status = Column(Enum("pending", "confirmed", "completed", "cancelled", "archived", name="tour_status"), default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Journal id of rows written by the write-behind queue (ingest.py); keeps replays idempotent
+    submission_id = Column(String(32), unique=True, index=True, nullable=True)
+
+    # Matches the inbox sort order used for keyset pagination (see pagination.py)
+    __table_args__ = (
+        Index("ix_virtual_tours_inbox", archived_flag(status), created_at.desc(), id.desc()),
+    )
 
 class Order(Base):
     __tablename__ = "orders"
@@ -100,6 +236,40 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class NotificationOutbox(Base):
+    """Notifications waiting to be delivered by the dispatcher (see notifications.py)"""
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event = Column(String(50), nullable=False)
+    channel = Column(String(20), nullable=False)  # email or webhook
+    target = Column(String(500), nullable=False)  # recipient addresses or webhook URL
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(Enum("pending", "failed", name="notification_status"), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set by the dispatcher that is delivering the row, until next_attempt_at (the lease) passes
+    claim = Column(String(32), nullable=True, index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_due", status, next_attempt_at),
+    )
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # Index within the submitted products list
+    product_id = Column(String(100), nullable=True, index=True)
+    category = Column(String(100), nullable=True, index=True)
+    quantity = Column(Float, nullable=True)
+    unit = Column(String(50), nullable=True)
+    attributes = Column(Text, nullable=True)  # JSON string of any other product fields
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -108,6 +278,141 @@ def get_db():
     finally:
         db.close()
 
-# Create tables
-def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def upsert_user(db: Session, email: str, name: str, company: str = None,
+                phone: str = None, language: str = "en") -> int:
+    """Find or create the User with ``email`` in one statement and return its id.
+
+    Runs inside the caller's transaction, so the user and the row referencing
+    it commit together. Existing users are left unchanged, and concurrent
+    posts for the same email resolve to the same row instead of failing on
+    the unique constraint.
+    """
+    values = dict(name=name, email=email, company=company, phone=phone, language=language)
+    dialect = db.get_bind().dialect.name
+    
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = insert(User).values(**values)
+        # A no-op update (rather than DO NOTHING) makes RETURNING yield the existing row
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.email], set_={"email": stmt.excluded.email}
+        ).returning(User.id)
+        return db.execute(stmt).scalar_one()
+    
+    if dialect == "mysql":
+        # LAST_INSERT_ID(id) reports the existing row's id on a duplicate key
+        stmt = mysql_insert(User).values(**values).on_duplicate_key_update(
+            id=func.last_insert_id(User.id)
+        )
+        return db.execute(stmt).lastrowid
+    
+    # Generic fallback: look up, then insert under a savepoint
+    user_id = db.query(User.id).filter(User.email == email).scalar()
+    if user_id is not None:
+        return user_id
+    try:
+        with db.begin_nested():
+            user = User(**values)
+            db.add(user)
+        return user.id
+    except IntegrityError:
+        return db.query(User.id).filter(User.email == email).scalar()
+
+# Rows per multi-row INSERT / IN (...) lookup in the bulk helpers
+BULK_CHUNK_SIZE = 500
+
+def upsert_users(db: Session, users: List[dict]) -> Dict[str, int]:
+    """Bulk variant of ``upsert_user``: find or create every user in ``users``
+    (dicts with the User columns) and return a mapping of email to id.
+
+    The first entry for each email wins; existing users are left unchanged.
+    """
+    by_email = {}
+    for user in users:
+        by_email.setdefault(user["email"], user)
+    rows = list(by_email.values())
+    dialect = db.get_bind().dialect.name
+    
+    ids = {}
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_CHUNK_SIZE]
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            db.execute(insert(User).on_conflict_do_nothing(index_elements=[User.email]), chunk)
+        elif dialect == "mysql":
+            db.execute(mysql_insert(User).prefix_with("IGNORE"), chunk)
+        else:
+            for row in chunk:
+                upsert_user(db, **row)
+        
+        emails = [row["email"] for row in chunk]
+        ids.update(db.query(User.email, User.id).filter(User.email.in_(emails)).all())
+    return ids
+
+def bulk_insert(db: Session, model, rows: List[dict]) -> List[Optional[int]]:
+    """Insert ``rows`` with executemany in chunks and return their new ids in
+    order. Ids are None on databases without RETURNING support for executemany.
+    """
+    supports_returning = db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order
+    ids: List[Optional[int]] = []
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_CHUNK_SIZE]
+        if supports_returning:
+            stmt = sa_insert(model).returning(model.id, sort_by_parameter_order=True)
+            ids.extend(db.execute(stmt, chunk).scalars().all())
+        else:
+            db.execute(sa_insert(model), chunk)
+            ids.extend([None] * len(chunk))
+    return ids
+
+class AsyncDB:
+    """Runs Session-based endpoint code without blocking the event loop.
+
+    With DB_ASYNC enabled the code runs on an AsyncSession through
+    ``run_sync``, so every query goes through the async driver. Otherwise it
+    runs on a regular Session in Starlette's threadpool.
+    """
+    
+    def __init__(self, session):
+        self.session = session
+    
+    async def run(self, fn, *args, **kwargs):
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+# Dependency to get an async database handle
+async def get_async_db():
+    if USE_ASYNC_DB:
+        async with AsyncSessionLocal() as session:
+            yield AsyncDB(session)
+    else:
+        db = SessionLocal()
+        try:
+            yield AsyncDB(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+def async_endpoint(fn):
+    """Turn a sync endpoint taking ``db: Session = Depends(get_db)`` into an
+    async one whose body runs through ``AsyncDB.run``.
+
+    Apply it below the route decorator:
+
+        @app.get("/api/things")
+        @async_endpoint
+        def get_things(db: Session = Depends(get_db)):
+            ...
+    """
+    signature = inspect_signature(fn)
+    parameters = [
+        param.replace(default=Depends(get_async_db), annotation=AsyncDB) if name == "db" else param
+        for name, param in signature.parameters.items()
+    ]
+    
+    @functools.wraps(fn)
+    async def wrapper(*args, db: AsyncDB, **kwargs):
+        return await db.run(lambda session: fn(*args, db=session, **kwargs))
+    
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
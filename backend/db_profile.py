@@ -0,0 +1,186 @@
+# Environment-driven database engine profiles
+
+import os
+from typing import Dict
+
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Baseline settings per DB_PROFILE; every key can be overridden from the environment
+PROFILES = {
+    "production": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_busy_timeout": 5000,  # milliseconds
+        "sqlite_mmap_size": 268435456,  # 256MB
+    },
+    "development": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_busy_timeout": 5000,
+        "sqlite_mmap_size": 0,
+    },
+}
+
+# Environment variable for each profile setting
+ENV_OVERRIDES = {
+    "echo": "DB_ECHO",
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "sqlite_journal_mode": "SQLITE_JOURNAL_MODE",
+    "sqlite_synchronous": "SQLITE_SYNCHRONOUS",
+    "sqlite_busy_timeout": "SQLITE_BUSY_TIMEOUT",
+    "sqlite_mmap_size": "SQLITE_MMAP_SIZE",
+}
+
+SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SQLITE_SYNCHRONOUS_MODES = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Expected a boolean, got '{value}'")
+
+def load_engine_profile(database_url: str) -> Dict:
+    """Resolve DB_PROFILE plus environment overrides into a validated profile"""
+    name = os.getenv("DB_PROFILE", "production")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}'. Must be one of: {', '.join(PROFILES)}")
+
+    profile = dict(PROFILES[name])
+    for key, env_var in ENV_OVERRIDES.items():
+        value = os.getenv(env_var)
+        if value is None:
+            continue
+        default = profile[key]
+        try:
+            if isinstance(default, bool):
+                profile[key] = _parse_bool(value)
+            elif isinstance(default, int):
+                profile[key] = int(value)
+            else:
+                profile[key] = value.upper()
+        except ValueError as e:
+            raise ValueError(f"Invalid {env_var}: {e}")
+
+    profile["name"] = name
+    profile["dialect"] = database_url.split("://", 1)[0].split("+", 1)[0]
+    profile["in_memory"] = profile["dialect"] == "sqlite" and (":memory:" in database_url or "mode=memory" in database_url)
+    validate_engine_profile(profile)
+    return profile
+
+def validate_engine_profile(profile: Dict) -> None:
+    """Reject settings the engine would silently misbehave with"""
+    for key in ("pool_size", "pool_timeout"):
+        if profile[key] < 1:
+            raise ValueError(f"{key} must be at least 1")
+    for key in ("max_overflow", "pool_recycle"):
+        # -1 means unlimited / never recycle
+        if profile[key] < -1:
+            raise ValueError(f"{key} must be -1 or greater")
+    for key in ("sqlite_busy_timeout", "sqlite_mmap_size"):
+        if profile[key] < 0:
+            raise ValueError(f"{key} must not be negative")
+    if profile["sqlite_journal_mode"] not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"sqlite_journal_mode must be one of: {', '.join(sorted(SQLITE_JOURNAL_MODES))}")
+    if profile["sqlite_synchronous"] not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"sqlite_synchronous must be one of: {', '.join(SQLITE_SYNCHRONOUS_MODES)}")
+
+def engine_kwargs(profile: Dict, asynchronous: bool = False) -> Dict:
+    """Keyword arguments for create_engine, or create_async_engine with ``asynchronous``"""
+    kwargs = {"echo": profile["echo"], "pool_pre_ping": profile["pool_pre_ping"]}
+    if profile["in_memory"]:
+        # Every pooled connection would open its own empty database
+        return kwargs
+    if profile["dialect"] == "sqlite" and asynchronous:
+        # aiosqlite defaults to NullPool, which opens a connection (and a
+        # thread, and runs the PRAGMAs) on every checkout
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+    kwargs.update(
+        pool_size=profile["pool_size"],
+        max_overflow=profile["max_overflow"],
+        pool_timeout=profile["pool_timeout"],
+        pool_recycle=profile["pool_recycle"],
+    )
+    return kwargs
+
+def sqlite_pragmas(profile: Dict) -> Dict:
+    return {
+        "journal_mode": profile["sqlite_journal_mode"],
+        "synchronous": profile["sqlite_synchronous"],
+        "busy_timeout": profile["sqlite_busy_timeout"],
+        "mmap_size": profile["sqlite_mmap_size"],
+    }
+
+def apply_sqlite_pragmas(sync_engine, profile: Dict) -> None:
+    """Set the profile's PRAGMAs on every new SQLite connection.
+
+    Pass ``async_engine.sync_engine`` for async engines.
+    """
+    if profile["dialect"] != "sqlite":
+        return
+
+    pragmas = sqlite_pragmas(profile)
+
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def check_engine_profile(engine, profile: Dict) -> Dict:
+    """Read the effective settings back from a live connection.
+
+    Returns a report of what is configured, what the database actually uses
+    and any mismatches (e.g. WAL refused on a network filesystem).
+    """
+    report = {
+        "profile": profile["name"],
+        "dialect": profile["dialect"],
+        "settings": {key: profile[key] for key in ENV_OVERRIDES},
+        "pool": engine.pool.status(),
+        "problems": [],
+    }
+    if profile["dialect"] != "sqlite":
+        return report
+
+    expected = sqlite_pragmas(profile)
+    actual = {}
+    with engine.connect() as conn:
+        for name in expected:
+            actual[name] = conn.execute(text(f"PRAGMA {name}")).scalar()
+    report["sqlite_pragmas"] = actual
+
+    if str(actual["journal_mode"]).upper() != expected["journal_mode"]:
+        report["problems"].append(
+            f"journal_mode is {actual['journal_mode']}, expected {expected['journal_mode']}"
+        )
+    if actual["synchronous"] != SQLITE_SYNCHRONOUS_MODES[expected["synchronous"]]:
+        report["problems"].append(
+            f"synchronous is {actual['synchronous']}, expected {expected['synchronous']}"
+        )
+    if actual["busy_timeout"] != expected["busy_timeout"]:
+        report["problems"].append(
+            f"busy_timeout is {actual['busy_timeout']}, expected {expected['busy_timeout']}"
+        )
+    return report
@@ -0,0 +1,145 @@
+# Streaming CSV / NDJSON exports of users, contact messages and tour requests
+#
+# Rows are selected as plain column tuples in keyset pages (id > last id),
+# each page in its own short-lived session, so no cursor or transaction
+# stays open while a slow client reads and rows never enter an identity
+# map. Memory use stays flat whatever the table size, gzip included: the
+# compressor works on one page at a time.
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from database import SessionLocal, User, ContactMessage, VirtualTour
+
+# Rows fetched and encoded per page, and per chunk of the response
+EXPORT_BATCH_SIZE = 500
+
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# kind -> (model, exported columns)
+EXPORTS = {
+    "users": (User, (
+        "id", "name", "email", "company", "phone", "language", "country",
+        "is_active", "created_at", "updated_at",
+    )),
+    "contact-messages": (ContactMessage, (
+        "id", "user_id", "name", "email", "company", "phone", "subject", "message",
+        "language", "status", "created_at", "updated_at",
+    )),
+    "virtual-tours": (VirtualTour, (
+        "id", "user_id", "name", "email", "company", "phone", "preferred_date",
+        "preferred_time", "message", "language", "status", "created_at", "updated_at",
+    )),
+}
+
+# Users have no status column; these filter on is_active instead
+USER_STATUSES = {"active": True, "inactive": False}
+
+def naive_utc(value: datetime) -> datetime:
+    """created_at is stored as naive UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def parse_statuses(kind: str, value: Optional[str]) -> List[str]:
+    """Statuses from a comma-separated ``status`` parameter, validated for ``kind``"""
+    if not value:
+        return []
+    statuses = [s.strip() for s in value.split(",") if s.strip()]
+    model, _ = EXPORTS[kind]
+    allowed = list(USER_STATUSES) if model is User else model.status.type.enums
+    unknown = [s for s in statuses if s not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown status for {kind}: {', '.join(unknown)} (expected one of {', '.join(allowed)})")
+    return statuses
+
+def export_query(kind: str, statuses: Sequence[str] = (), since: Optional[datetime] = None,
+                 until: Optional[datetime] = None) -> Select:
+    """SELECT of the exported columns, oldest first. ``since`` is inclusive,
+    ``until`` exclusive."""
+    model, columns = EXPORTS[kind]
+    query = select(*(getattr(model, column) for column in columns)).order_by(model.id)
+    if statuses:
+        if model is User:
+            query = query.where(User.is_active.in_({USER_STATUSES[s] for s in statuses}))
+        else:
+            query = query.where(model.status.in_(statuses))
+    if since is not None:
+        query = query.where(model.created_at >= naive_utc(since))
+    if until is not None:
+        query = query.where(model.created_at < naive_utc(until))
+    return query
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _json_value(value)
+
+def encode_rows(fmt: str, columns: Sequence[str], rows) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def csv_header(columns: Sequence[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\r\n").writerow(columns)
+    return buffer.getvalue()
+
+def stream_export(kind: str, query: Select, fmt: str, compress: bool = False) -> Iterator[bytes]:
+    """Encoded (and optionally gzipped) export body, one page of rows per chunk.
+
+    ``query`` must be ordered by id (see export_query). Each page opens its
+    own session: the body is streamed after the request's session has been
+    closed.
+    """
+    model, columns = EXPORTS[kind]
+    id_index = columns.index("id")
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # 31: gzip framing
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    header = csv_header(columns) if fmt == "csv" else ""
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(query.where(model.id > last_id).limit(EXPORT_BATCH_SIZE)).all()
+        if not rows:
+            break
+        last_id = rows[-1][id_index]
+        chunk = encode(header + encode_rows(fmt, columns, rows))
+        header = ""
+        # The compressor buffers small inputs; only send what it emitted
+        if chunk:
+            yield chunk
+    if header:
+        # No rows: the CSV is just its header
+        yield encode(header)
+    if compressor:
+        yield compressor.flush()
+
+def export_filename(kind: str, fmt: str) -> str:
+    return f"{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}.{FORMATS[fmt][1]}"
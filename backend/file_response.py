@@ -0,0 +1,231 @@
+# File responses with byte ranges, conditional GET and path sending
+
+import os
+import re
+import stat
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from http_cache import etag_matches
+
+# Files named after their SHA-256 (and their derivatives) never change
+CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(?:[-.]|$)")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=3600"
+
+# More ranges than this in one request are answered with the full file
+MAX_RANGES = 16
+
+RANGE_SPEC = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+def file_etag(path: Path, stat_result: os.stat_result) -> str:
+    """Strong validator: the content hash for content-addressed files,
+    otherwise derived from modification time and size"""
+    match = CONTENT_ADDRESSED.match(path.name)
+    if match:
+        # Derivatives share the source hash, so include the full name
+        suffix = path.name[len(match.group(1)):]
+        return f'"{match.group(1)}{suffix}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def parse_range_header(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a ``Range: bytes=...`` header into sorted, merged inclusive
+    (start, end) pairs.
+
+    Returns None when the header is malformed or unsupported (the full file
+    should be sent) and an empty list when no range is satisfiable (416).
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC.match(spec)
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Coalesce overlapping and adjacent ranges
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _http_date(header: Optional[str]) -> Optional[float]:
+    if not header:
+        return None
+    try:
+        return parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def not_modified_since(header: Optional[str], mtime: float) -> bool:
+    date = _http_date(header)
+    return date is not None and int(mtime) <= date
+
+def if_range_matches(header: str, etag: str, mtime: float) -> bool:
+    """True if an If-Range validator still describes the file: the exact
+    ETag, or a date equal to its Last-Modified (RFC 9110 13.1.5)"""
+    header = header.strip()
+    if header.startswith(("\"", "W/")):
+        # Weak tags never match
+        return header == etag
+    return _http_date(header) == int(mtime)
+
+class RangeFileResponse(Response):
+    """Streams whole files, a single range or multipart/byteranges.
+
+    Whole files go out through the ASGI ``http.response.pathsend``
+    extension when the server offers it; otherwise, and for ranges, the file
+    is read in chunks on a worker thread.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, size: int, status_code: int, headers: dict,
+                 media_type: str, ranges: Optional[List[Tuple[int, int]]] = None):
+        self.path = path
+        self.size = size
+        self.ranges = ranges
+        self.content_type = media_type
+        self.boundary = uuid.uuid4().hex if ranges and len(ranges) > 1 else None
+        self.status_code = status_code
+        self.background = None
+
+        if self.boundary:
+            headers["Content-Type"] = f"multipart/byteranges; boundary={self.boundary}"
+            headers["Content-Length"] = str(sum(
+                len(self._part_header(start, end)) + end - start + 1 for start, end in ranges
+            ) + len(self._closing()))
+        else:
+            headers["Content-Type"] = media_type
+            if ranges:
+                start, end = ranges[0]
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+            else:
+                headers["Content-Length"] = str(size)
+        self.init_headers(headers)
+
+    def _part_header(self, start: int, end: int) -> bytes:
+        return (
+            f"\r\n--{self.boundary}\r\n"
+            f"Content-Type: {self.content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n"
+        ).encode("latin-1")
+
+    def _closing(self) -> bytes:
+        return f"\r\n--{self.boundary}--\r\n".encode("latin-1")
+
+    async def _send_range(self, send: Send, file, start: int, end: int, more_body: bool):
+        count = end - start + 1
+        await file.seek(start)
+        while count > 0:
+            chunk = await file.read(min(self.chunk_size, count))
+            if not chunk:
+                break
+            count -= len(chunk)
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body or count > 0,
+            })
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if not self.ranges and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        ranges = self.ranges or [(0, self.size - 1)]
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            if self.size == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+            if not self.boundary:
+                start, end = ranges[0]
+                await self._send_range(send, file, start, end, more_body=False)
+                return
+            for start, end in ranges:
+                await send({"type": "http.response.body", "body": self._part_header(start, end), "more_body": True})
+                await self._send_range(send, file, start, end, more_body=True)
+            await send({"type": "http.response.body", "body": self._closing(), "more_body": False})
+
+async def serve_file(request: Request, path: Path, media_type: Optional[str] = None) -> Response:
+    """Serve ``path`` with strong validators, conditional GET and byte ranges.
+
+    Content-addressed files are marked immutable so browsers and CDNs never
+    revalidate them.
+    """
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = stat_result.st_size
+    etag = file_etag(path, stat_result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if CONTENT_ADDRESSED.match(path.name) else REVALIDATE_CACHE_CONTROL,
+    }
+    media_type = media_type or guess_type(path.name)[0] or "application/octet-stream"
+
+    # If-None-Match takes precedence over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif not_modified_since(request.headers.get("if-modified-since"), stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and not if_range_matches(if_range, etag, stat_result.st_mtime):
+        # The client's copy is stale: send the whole current file
+        range_header = None
+
+    ranges = parse_range_header(range_header, size) if range_header else None
+    if ranges == []:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    if ranges:
+        return RangeFileResponse(path, size, 206, headers, media_type, ranges)
+    return RangeFileResponse(path, size, 200, headers, media_type)
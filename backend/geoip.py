@@ -0,0 +1,119 @@
+# Offline IPv4 -> country lookup over a sorted binary range table
+#
+# Table format: an 8-byte magic header followed by fixed-size records of
+# (range start: uint32, range end: uint32, ISO country code: 2 ASCII bytes),
+# big-endian and sorted by range start, with no overlapping ranges.
+#
+# Build it from any "start_ip,end_ip,country_code" CSV (e.g. the free
+# DB-IP / IP2Location LITE country exports):
+#
+#     python geoip.py ip-country.csv data/geoip.bin
+
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+from typing import Optional
+
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH", "data/geoip.bin")
+
+MAGIC = b"GEOIP4\x00\x01"
+RECORD = struct.Struct(">II2s")
+
+class GeoIPTable:
+    """Memory-mapped range table searched with a binary search"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a GeoIP range table")
+        self._count = (len(self._map) - len(MAGIC)) // RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, ip: int) -> Optional[str]:
+        """Country code for an IPv4 address given as an integer"""
+        lo, hi = 0, self._count - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            start, end, country = RECORD.unpack_from(self._map, len(MAGIC) + mid * RECORD.size)
+            if ip < start:
+                hi = mid - 1
+            elif ip > end:
+                lo = mid + 1
+            else:
+                return country.decode("ascii")
+        return None
+
+    def close(self):
+        self._map.close()
+
+_table: Optional[GeoIPTable] = None
+_table_loaded = False
+
+def get_table() -> Optional[GeoIPTable]:
+    """The table at GEOIP_DB_PATH, opened on first use; None if there is none"""
+    global _table, _table_loaded
+    if not _table_loaded:
+        _table_loaded = True
+        if os.path.exists(GEOIP_DB_PATH):
+            try:
+                _table = GeoIPTable(GEOIP_DB_PATH)
+            except (OSError, ValueError) as e:
+                print(f"GeoIP table not loaded: {e}")
+    return _table
+
+def lookup_country(ip: Optional[str]) -> Optional[str]:
+    """Country code for an IP address string, or None if unknown"""
+    table = get_table()
+    if table is None or not ip:
+        return None
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if address.version == 6:
+        # Only IPv4-mapped IPv6 addresses are covered by the table
+        address = address.ipv4_mapped
+        if address is None:
+            return None
+    if not address.is_global:
+        return None
+    return table.lookup(int(address))
+
+def build_table(csv_path: str, output_path: str) -> int:
+    """Convert a start_ip,end_ip,country_code CSV into a binary range table"""
+    records = []
+    with open(csv_path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            try:
+                start = ipaddress.ip_address(row[0].strip())
+                end = ipaddress.ip_address(row[1].strip())
+            except ValueError:
+                # Header rows and malformed lines
+                continue
+            country = row[2].strip().upper()
+            if start.version != 4 or end.version != 4 or len(country) != 2:
+                continue
+            records.append((int(start), int(end), country.encode("ascii")))
+
+    records.sort()
+    with open(output_path, "wb") as f:
+        f.write(MAGIC)
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python geoip.py <ip-country.csv> <output.bin>")
+        sys.exit(1)
+    count = build_table(sys.argv[1], sys.argv[2])
+    print(f"Wrote {count} ranges to {sys.argv[2]}")
@@ -0,0 +1,84 @@
+# Pre-serialized JSON responses with strong ETags and conditional GET
+
+import gzip
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Default Cache-Control for static API payloads: browsers and CDNs may reuse
+# them for a few minutes, then revalidate cheaply with If-None-Match
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+
+# Bodies smaller than this are never gzipped
+GZIP_MIN_SIZE = 1024
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches ``etag``"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses weak comparison
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def accepts_gzip(request: Request) -> bool:
+    """True if Accept-Encoding allows gzip (a q=0 weight refuses it)"""
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if name.lower() not in ("gzip", "*"):
+            continue
+        for param in params:
+            if param.lower().startswith("q="):
+                try:
+                    return float(param[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+class CachedJSON:
+    """A JSON payload serialized (and gzipped) to bytes once, with its ETags"""
+
+    def __init__(self, payload, cache_control: str = DEFAULT_CACHE_CONTROL):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = make_etag(self.body)
+        self.cache_control = cache_control
+
+        # Small bodies aren't worth the gzip framing overhead
+        self.gzip_body = None
+        self.gzip_etag = None
+        if len(self.body) >= GZIP_MIN_SIZE:
+            self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+            # Each encoding is a separate representation and needs its own strong ETag
+            self.gzip_etag = self.etag[:-1] + '-gzip"'
+
+    def respond(self, request: Request) -> Response:
+        """Serve the cached bytes, or a bodiless 304 if the client has them"""
+        use_gzip = self.gzip_body is not None and accepts_gzip(request)
+        etag = self.gzip_etag if use_gzip else self.etag
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if self.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("if-none-match")
+        if etag_matches(if_none_match, self.etag) or (
+            self.gzip_etag and etag_matches(if_none_match, self.gzip_etag)
+        ):
+            return Response(status_code=304, headers=headers)
+
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=self.gzip_body, media_type="application/json", headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
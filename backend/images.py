@@ -0,0 +1,241 @@
+# Resized / re-encoded image derivatives rendered on a process pool
+
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import anyio
+from PIL import Image, ImageOps
+
+# Widths derivatives are rendered at; requests snap up to the nearest one
+DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+
+# Rendered for every uploaded image, in addition to on-demand variants
+DEFAULT_DERIVATIVE_FORMATS = ("webp",)
+
+# Pillow encoder name and media type per output format
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+# Encoder options per output format
+SAVE_OPTIONS = {
+    "WEBP": {"quality": 80, "method": 4},
+    "AVIF": {"quality": 60},
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+}
+
+# Disk space the derivative cache may use before evicting least recently used files
+DERIVATIVE_CACHE_BUDGET = int(os.getenv("DERIVATIVE_CACHE_BUDGET", 1024 * 1024 * 1024))
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+def supported_formats() -> List[str]:
+    """Output formats this Pillow build can encode (AVIF needs a plugin)"""
+    Image.init()
+    return [name for name, (encoder, _) in FORMATS.items() if encoder in Image.SAVE]
+
+def snap_width(width: int) -> int:
+    """Smallest standard width that covers ``width``"""
+    for candidate in DERIVATIVE_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return DERIVATIVE_WIDTHS[-1]
+
+def parse_accept(header: str) -> List[Tuple[str, float]]:
+    """Parse an Accept header into (media range, q) pairs; malformed entries
+    are skipped"""
+    ranges = []
+    for item in header.split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if "/" not in media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = -1.0
+        if 0 <= q <= 1:
+            ranges.append((media_range.lower(), q))
+    return ranges
+
+def pick_format(requested: Optional[str], accept: str, source_name: str) -> str:
+    """Output format for a variant request.
+
+    ``auto`` picks whichever of AVIF and WebP the client's Accept header
+    prefers (AVIF on a tie), falling back to JPEG; no format keeps the
+    source's own format when it can be re-encoded.
+    Raises ValueError for unknown or unavailable formats.
+    """
+    available = supported_formats()
+    if requested == "auto":
+        # Only explicitly listed types count: clients that send just */* or
+        # image/* are often older ones that can't decode either format
+        weights = dict(parse_accept(accept))
+        best, best_weight = "jpeg", 0.0
+        for fmt in ("avif", "webp"):
+            weight = weights.get(FORMATS[fmt][1], 0.0)
+            if fmt in available and weight > best_weight:
+                best, best_weight = fmt, weight
+        return best
+    if requested:
+        fmt = "jpeg" if requested.lower() == "jpg" else requested.lower()
+        if fmt not in available:
+            raise ValueError(f"Unsupported format '{requested}'. Available: {', '.join(available)}")
+        return fmt
+    extension = source_name.rsplit(".", 1)[-1].lower()
+    extension = "jpeg" if extension == "jpg" else extension
+    return extension if extension in available else "jpeg"
+
+def derivative_name(source_name: str, width: int, fmt: str) -> str:
+    stem = source_name.rsplit(".", 1)[0]
+    return f"{stem}-w{width}.{fmt}"
+
+def render_derivative(source: str, target: str, width: int, fmt: str) -> int:
+    """Resize ``source`` to at most ``width`` pixels wide and encode it as
+    ``fmt`` into ``target``. Runs in a worker process; returns the file size."""
+    encoder = FORMATS[fmt][0]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if encoder == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+
+        temp = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            image.save(temp, encoder, **SAVE_OPTIONS[encoder])
+            os.replace(temp, target)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+    return os.path.getsize(target)
+
+class DerivativeCache:
+    """Renders derivatives on a process pool and keeps them within a disk budget.
+
+    Concurrent requests for the same missing variant share one render, and
+    files are evicted least recently used first once the budget is exceeded.
+    """
+
+    def __init__(self, directory: Path, budget: int = DERIVATIVE_CACHE_BUDGET, workers: int = IMAGE_WORKERS):
+        self.directory = directory
+        self.budget = budget
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._entries: Optional[OrderedDict] = None
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _load_entries(self):
+        # Rebuild the LRU order from disk: least recently touched first
+        directory_files = [p for p in self.directory.iterdir() if p.is_file() and not p.name.endswith(".tmp")]
+        directory_files.sort(key=lambda p: p.stat().st_mtime)
+        self._entries = OrderedDict((p.name, p.stat().st_size) for p in directory_files)
+        self._used = sum(self._entries.values())
+
+    def _touch(self, name: str):
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+            if name in self._entries:
+                self._entries.move_to_end(name)
+
+    def _record(self, name: str, size: int):
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+            self._used += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._used > self.budget and len(self._entries) > 1:
+                oldest, oldest_size = self._entries.popitem(last=False)
+                self._used -= oldest_size
+                try:
+                    (self.directory / oldest).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _hit(self, name: str) -> bool:
+        """True if the variant is cached, marking it recently used"""
+        target = self.directory / name
+        try:
+            # Keep the on-disk order meaningful across restarts
+            os.utime(target)
+        except FileNotFoundError:
+            return False
+        self._touch(name)
+        return True
+
+    async def get(self, source: Path, width: int, fmt: str) -> Path:
+        """Path of the ``width``/``fmt`` variant of ``source``, rendering it if missing"""
+        name = derivative_name(source.name, width, fmt)
+        target = self.directory / name
+        # The first lookup scans the directory; none of it belongs on the event loop
+        if await anyio.to_thread.run_sync(self._hit, name):
+            return target
+
+        # Coalesce concurrent renders of the same variant
+        future = self._inflight.get(name)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.executor(), render_derivative, str(source), str(target), width, fmt
+            )
+            self._inflight[name] = future
+            try:
+                size = await future
+                await anyio.to_thread.run_sync(self._record, name, size)
+            finally:
+                self._inflight.pop(name, None)
+        else:
+            await future
+        return target
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        # Failures (e.g. a corrupt image) surface again when the variant is requested
+        if not task.cancelled():
+            task.exception()
+
+    def render_defaults(self, source: Path) -> List[str]:
+        """Schedule the standard variants of a new upload in the background.
+
+        Returns the derivative names that will be available.
+        """
+        names = []
+        formats = [fmt for fmt in DEFAULT_DERIVATIVE_FORMATS if fmt in supported_formats()]
+        for fmt in formats:
+            for width in DERIVATIVE_WIDTHS:
+                names.append(derivative_name(source.name, width, fmt))
+                task = asyncio.create_task(self.get(source, width, fmt))
+                # The loop only keeps weak references to tasks
+                self._background.add(task)
+                task.add_done_callback(self._background_done)
+        return names
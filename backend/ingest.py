@@ -0,0 +1,279 @@
+# Write-behind ingestion for public form submissions
+#
+# With INGEST_MODE=journal, /api/contact and /api/virtual-tour validate a
+# post, append it to a local journal, fsync, and answer with a submission
+# id. A background writer then commits queued records in batches, one
+# transaction per batch, instead of one transaction per post.
+#
+# Durability: a record is acknowledged only once its journal line is on
+# disk. Concurrent posts share fsyncs (group commit). On startup the journal
+# is replayed; rows carry their submission id in a unique column, so records
+# committed just before a crash are not written twice.
+#
+# A batch that keeps failing is split into one transaction per record, and
+# records the database still rejects while others go through are moved to
+# a dead-letter file next to the journal instead of blocking the queue.
+#
+# The journal is local to one process. Run a single worker in this mode,
+# or give each worker its own INGEST_JOURNAL_DIR.
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import COLLECTORS, Counter, Gauge, Histogram, QUERY_COUNT_BUCKETS
+
+INGEST_MODES = ("direct", "journal")
+INGEST_MODE = os.getenv("INGEST_MODE", "direct").lower()
+INGEST_JOURNAL_DIR = os.getenv("INGEST_JOURNAL_DIR", "data/ingest")
+# Largest group commit, and how long the writer waits for a batch to fill (seconds)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 0.05))
+# Journal segments are rotated at this size and deleted once fully committed
+INGEST_SEGMENT_SIZE = int(os.getenv("INGEST_SEGMENT_SIZE", 16 * 1024 * 1024))
+# Longest wait between retries of a failing flush (seconds)
+INGEST_MAX_RETRY_DELAY = 30.0
+# Failed attempts at a batch before it is retried one record at a time
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", 5))
+
+INGEST_QUEUE_DEPTH = Gauge(
+    "ingest_queue_depth", "Journaled submissions not yet committed to the database"
+)
+INGEST_FLUSH_LATENCY = Histogram(
+    "ingest_flush_duration_seconds", "Time to commit one batch of submissions"
+)
+INGEST_FLUSH_ROWS = Histogram(
+    "ingest_flush_rows", "Submissions per group commit", buckets=QUERY_COUNT_BUCKETS + (200, 500, 1000)
+)
+INGEST_FLUSH_FAILURES = Counter(
+    "ingest_flush_failures_total", "Group commits that failed and were retried"
+)
+INGEST_JOURNAL_SYNC = Histogram(
+    "ingest_journal_fsync_seconds", "Time spent in journal fsyncs"
+)
+INGEST_DEAD_LETTERS = Counter(
+    "ingest_dead_letters_total", "Submissions the database rejected, moved to the dead-letter file"
+)
+
+class WriteBehindQueue:
+    """Journal-backed queue of submissions, committed in batches by ``flush``.
+
+    ``flush(records)`` runs on a worker thread. It must write every record
+    in one transaction and skip records whose id was already written.
+    """
+
+    def __init__(self, directory, flush: Callable[[List[Dict]], None],
+                 batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL,
+                 segment_size: int = INGEST_SEGMENT_SIZE):
+        self.directory = Path(directory)
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+
+        # (segment, record) in journal order; the writer commits from the front
+        self.pending: List[Tuple[int, Dict]] = []
+        self.segment = 0
+        self._file = None
+        self._lock_file = None
+        self._written = 0
+        self._synced = 0
+        # Bound to the loop of the running app, so created in open()
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.last_flush: Optional[Dict] = None
+        self.dead_letters = 0
+        self.last_dead_letter: Optional[Dict] = None
+        COLLECTORS.append(lambda: INGEST_QUEUE_DEPTH.set(value=len(self.pending)))
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"journal-{segment:08d}.log"
+
+    @property
+    def dead_letter_path(self) -> Path:
+        return self.directory / "dead-letter.log"
+
+    def _segments(self) -> List[int]:
+        return sorted(int(path.stem.split("-")[1]) for path in self.directory.glob("journal-*.log"))
+
+    def open(self) -> int:
+        """Take the journal directory, load unflushed records and start a
+        new segment. Returns the number of records to replay."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / "lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError(f"Ingest journal {self.directory} is in use by another process")
+        self._sync_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._written = self._synced = 0
+        if self.dead_letter_path.exists():
+            with open(self.dead_letter_path, "rb") as f:
+                self.dead_letters = sum(1 for _ in f)
+
+        # Everything not yet committed is in the segments, including what an
+        # earlier open() of this queue left pending
+        self.pending = []
+        segments = self._segments()
+        for segment in segments:
+            with open(self._segment_path(segment), "rb") as f:
+                for line in f:
+                    try:
+                        self.pending.append((segment, json.loads(line)))
+                    except ValueError:
+                        # A line torn by a crash was never acknowledged
+                        continue
+        self.segment = segments[-1] + 1 if segments else 0
+        self._file = open(self._segment_path(self.segment), "ab")
+        if self.pending:
+            self._wake.set()
+        return len(self.pending)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _rotate(self):
+        # Runs between fsyncs only, so no thread holds the old descriptor
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self.segment += 1
+        self._file = open(self._segment_path(self.segment), "ab")
+
+    async def submit(self, kind: str, values: Dict) -> str:
+        """Journal a submission and return its id once it is durable"""
+        record = {"id": uuid.uuid4().hex, "kind": kind, "received_at": time.time(), "values": values}
+        if self._file.tell() >= self.segment_size and not self._sync_lock.locked():
+            self._rotate()
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        self.pending.append((self.segment, record))
+        self._written += 1
+        await self._sync(self._written)
+        self._wake.set()
+        return record["id"]
+
+    async def _sync(self, target: int):
+        """fsync until write number ``target`` is on disk. Writers that queue
+        up during an fsync are all covered by the next one."""
+        async with self._sync_lock:
+            if self._synced >= target:
+                return
+            upto = self._written
+            started = time.perf_counter()
+            await run_in_threadpool(os.fsync, self._file.fileno())
+            INGEST_JOURNAL_SYNC.observe(time.perf_counter() - started)
+            self._synced = max(self._synced, upto)
+
+    def _release_segments(self):
+        """Delete segments whose records are all committed; truncate the
+        current one when nothing is pending"""
+        oldest = self.pending[0][0] if self.pending else self.segment
+        for segment in self._segments():
+            if segment < oldest:
+                self._segment_path(segment).unlink(missing_ok=True)
+        if not self.pending and self._file.tell() and not self._sync_lock.locked():
+            self._file.truncate(0)
+            self._file.seek(0)
+
+    def _dead_letter(self, record: Dict, error: Exception):
+        entry = {"record": record, "error": f"{type(error).__name__}: {error}", "at": time.time()}
+        with open(self.dead_letter_path, "ab") as f:
+            f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        INGEST_DEAD_LETTERS.inc()
+        self.dead_letters += 1
+        self.last_dead_letter = {"id": record["id"], "kind": record["kind"], "error": entry["error"], "at": entry["at"]}
+        print(f"Ingest submission {record['id']} moved to {self.dead_letter_path}: {entry['error']}")
+
+    async def _flush_one_by_one(self, batch: List[Dict]) -> int:
+        """Commit ``batch`` one record per transaction and dead-letter the
+        records that fail. Returns the number committed."""
+        committed, failed = 0, []
+        for record in batch:
+            try:
+                await run_in_threadpool(self.flush, [record])
+                committed += 1
+            except Exception as e:
+                failed.append((record, e))
+        if failed and not committed:
+            # Nothing went through: more likely the database than the records
+            raise failed[0][1]
+        for record, error in failed:
+            self._dead_letter(record, error)
+        return committed
+
+    async def flush_pending(self):
+        """Commit everything queued so far, in batches. Failed batches are
+        retried with backoff, one record at a time after INGEST_MAX_ATTEMPTS."""
+        delay = self.flush_interval or 0.05
+        attempts = 0
+        while self.pending:
+            batch = [record for _, record in self.pending[:self.batch_size]]
+            started = time.perf_counter()
+            try:
+                if attempts < INGEST_MAX_ATTEMPTS:
+                    await run_in_threadpool(self.flush, batch)
+                    committed = len(batch)
+                else:
+                    committed = await self._flush_one_by_one(batch)
+            except Exception as e:
+                attempts += 1
+                INGEST_FLUSH_FAILURES.inc()
+                print(f"Ingest flush of {len(batch)} submissions failed, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, INGEST_MAX_RETRY_DELAY)
+                continue
+            elapsed = time.perf_counter() - started
+            # Records are only ever appended, so the batch is still the front of
+            # the queue; every record in it is now committed or dead-lettered
+            del self.pending[:len(batch)]
+            INGEST_FLUSH_LATENCY.observe(elapsed)
+            INGEST_FLUSH_ROWS.observe(committed)
+            self.last_flush = {"rows": committed, "seconds": round(elapsed, 6), "at": time.time()}
+            delay = self.flush_interval or 0.05
+            attempts = 0
+        self._release_segments()
+
+    async def run_writer(self):
+        """Commit queued submissions as they arrive; runs until cancelled"""
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            # Let a burst gather into one group commit
+            if len(self.pending) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            await self.flush_pending()
+
+    def status(self) -> Dict:
+        oldest = self.pending[0][1]["received_at"] if self.pending else None
+        return {
+            "mode": "journal",
+            "queue_depth": len(self.pending),
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else None,
+            "journal_segment": self.segment,
+            "last_flush": self.last_flush,
+            "dead_letters": self.dead_letters,
+            "last_dead_letter": self.last_dead_letter,
+        }
+
+def create_ingest_queue(flush: Callable[[List[Dict]], None]) -> Optional[WriteBehindQueue]:
+    """Queue for INGEST_MODE=journal, or None when posts are written directly"""
+    if INGEST_MODE == "direct":
+        return None
+    if INGEST_MODE == "journal":
+        return WriteBehindQueue(INGEST_JOURNAL_DIR, flush)
+    raise ValueError(f"Unknown INGEST_MODE '{INGEST_MODE}'. Expected one of: {', '.join(INGEST_MODES)}")
@@ -0,0 +1,191 @@
+# Key-value stores whose entries expire on their own
+#
+# Two interchangeable backends, chosen per use through an env variable:
+#   memory   - a dict plus a min-heap of expiry times; per-process only
+#   database - the kv_entries table, shared by every worker
+
+import asyncio
+import heapq
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, KeyValueEntry
+
+# How often expired entries are swept (seconds)
+KV_SWEEP_INTERVAL = 60
+
+class TTLStore(ABC):
+    """Interface shared by the backends. Values are JSON-serializable."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove ``key`` and return its value; for single-use entries"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drop expired entries; returns how many"""
+
+    # Async variants for endpoints; blocking backends run on the threadpool
+    async def get_async(self, key: str) -> Optional[Any]:
+        return await run_in_threadpool(self.get, key)
+
+    async def set_async(self, key: str, value: Any, ttl: float):
+        await run_in_threadpool(self.set, key, value, ttl)
+
+    async def pop_async(self, key: str) -> Optional[Any]:
+        return await run_in_threadpool(self.pop, key)
+
+    async def run_sweeper(self):
+        """Sweep every KV_SWEEP_INTERVAL seconds; runs until cancelled"""
+        while True:
+            await asyncio.sleep(KV_SWEEP_INTERVAL)
+            try:
+                await run_in_threadpool(self.sweep)
+            except Exception as e:
+                print(f"TTL store sweep failed: {e}")
+
+class MemoryTTLStore(TTLStore):
+    """Dict lookups, with expiry times kept in a min-heap so a sweep only
+    touches entries that have actually expired"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: float):
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            heapq.heappush(self._expiries, (expires_at, key))
+        self.sweep()
+
+    def pop(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def sweep(self) -> int:
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiries)
+                # Skip heap entries left behind by overwritten or popped keys
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] == expires_at:
+                    del self._entries[key]
+                    removed += 1
+        return removed
+
+    # Lookups are dict operations, so skip the threadpool
+    async def get_async(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: Any, ttl: float):
+        self.set(key, value, ttl)
+
+    async def pop_async(self, key: str) -> Optional[Any]:
+        return self.pop(key)
+
+class DatabaseTTLStore(TTLStore):
+    """Entries in the kv_entries table, looked up by primary key. Keys are
+    prefixed with ``namespace`` so several stores can share the table."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with SessionLocal() as db:
+            value = db.execute(
+                select(KeyValueEntry.value).where(
+                    KeyValueEntry.key == self._key(key),
+                    KeyValueEntry.expires_at > time.time()
+                )
+            ).scalar()
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        values = dict(key=self._key(key), value=json.dumps(value), expires_at=time.time() + ttl)
+        with SessionLocal() as db:
+            dialect = db.get_bind().dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+                stmt = insert(KeyValueEntry).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[KeyValueEntry.key],
+                    set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+                )
+                db.execute(stmt)
+            elif dialect == "mysql":
+                stmt = mysql_insert(KeyValueEntry).values(**values)
+                stmt = stmt.on_duplicate_key_update(
+                    value=stmt.inserted.value, expires_at=stmt.inserted.expires_at
+                )
+                db.execute(stmt)
+            else:
+                db.merge(KeyValueEntry(**values))
+            db.commit()
+
+    def pop(self, key: str) -> Optional[Any]:
+        with SessionLocal() as db:
+            entry = db.get(KeyValueEntry, self._key(key), with_for_update=True)
+            if entry is None:
+                return None
+            value, expires_at = entry.value, entry.expires_at
+            # Only one concurrent pop deletes the row, so only one caller gets the value
+            deleted = db.execute(
+                delete(KeyValueEntry).where(KeyValueEntry.key == self._key(key))
+            ).rowcount
+            db.commit()
+        if not deleted or expires_at <= time.time():
+            return None
+        return json.loads(value)
+
+    def sweep(self) -> int:
+        with SessionLocal() as db:
+            removed = db.execute(
+                delete(KeyValueEntry).where(KeyValueEntry.expires_at <= time.time())
+            ).rowcount
+            db.commit()
+        return removed
+
+STORE_BACKENDS = ("memory", "database")
+
+def create_store(namespace: str, backend: Optional[str] = None) -> TTLStore:
+    """Store for ``namespace``; ``backend`` defaults to the <NAMESPACE>_STORE env variable"""
+    backend = backend or os.getenv(f"{namespace.upper()}_STORE", "memory")
+    if backend == "memory":
+        return MemoryTTLStore()
+    if backend == "database":
+        return DatabaseTTLStore(namespace)
+    raise ValueError(f"Unknown TTL store backend '{backend}'. Expected one of: {', '.join(STORE_BACKENDS)}")
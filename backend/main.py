@@ -1,19 +1,39 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import os
 from datetime import datetime
 import json
-import shutil
 from pathlib import Path
-import httpx
-from database import get_db, create_tables, User, ContactMessage, VirtualTour, Order, AdminUser
-from translations import get_translation, get_user_language
+from database import get_db, get_async_db, async_endpoint, AsyncDB, upsert_user, upsert_users, bulk_insert, engine, async_engine, ENGINE_PROFILE, SessionLocal, User, ContactMessage, VirtualTour, Order, OrderItem, AdminUser
+from translations import TRANSLATIONS, SUPPORTED_LANGUAGES, get_translation, get_translation_bundle, detect_user_language, normalize_key_filter
+from pagination import keyset_page, inbox_order, cached_count
+from db_profile import check_engine_profile
+from schema import ensure_schema
+from catalog import PRODUCT_CATEGORIES, CATEGORY_PRODUCTS, SAMPLE_REQUEST_INFO, COMPANY_INFO
+from http_cache import CachedJSON, accepts_gzip
+from media import store_upload, TEMP_PREFIX, UPLOAD_REQUEST_BODY, MAX_IMAGE_UPLOAD_SIZE, MAX_VIDEO_UPLOAD_SIZE
+from file_response import serve_file
+from resumable import UploadSessions
+from PIL.Image import DecompressionBombError
+from images import DerivativeCache, DERIVATIVE_WIDTHS, FORMATS as IMAGE_FORMATS, pick_format, snap_width
+from auth import hash_password, hash_password_async, issue_access_token, revocations, require_access_token, require_monitoring_access, require_role
+from kvstore import create_store
+from search import search, KINDS as SEARCH_KINDS
+from exports import EXPORTS, EXPORT_BATCH_SIZE, FORMATS as EXPORT_FORMATS, parse_statuses, export_query, stream_export, export_filename
+from metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from ingest import create_ingest_queue
+from notifications import NotificationDispatcher, queue_notifications, outbox_status, email_enabled
+from stats import read_status_counts, reconcile_status_counts, run_reconciler as run_stats_reconciler
+from bulk import chunked, read_bulk_items, fill_missing_ids, bulk_summary, bulk_criteria, apply_bulk_action
 import uuid
-import hashlib
+import secrets
+import asyncio
 
 app = FastAPI(title="Tropical Wood API", version="1.0.0")
 
@@ -26,24 +46,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, status codes and DB work, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
     # Ensure data directory exists
     os.makedirs("data", exist_ok=True)
     print("Data directory ensured")
-    create_tables()
-    print("Database tables created")
-    await create_default_admin()
+    report = check_engine_profile(engine, ENGINE_PROFILE)
+    for problem in report["problems"]:
+        print(f"Database profile warning: {problem}")
+    # Usually a single stamp lookup; one-off work only follows a migration
+    if ensure_schema():
+        backfill_order_items()
+        seed_default_admins()
+        print("Database schema up to date")
 
 # Create directories for storing uploads
 UPLOAD_DIR = Path("uploads")
 IMAGES_DIR = UPLOAD_DIR / "images"
 VIDEOS_DIR = UPLOAD_DIR / "videos"
+DERIVATIVES_DIR = UPLOAD_DIR / "derivatives"
+# Must share a filesystem with VIDEOS_DIR so finished uploads are renamed, not copied
+UPLOAD_SESSIONS_DIR = UPLOAD_DIR / "sessions"
 
-for directory in [IMAGES_DIR, VIDEOS_DIR]:
+for directory in [IMAGES_DIR, VIDEOS_DIR, DERIVATIVES_DIR, UPLOAD_SESSIONS_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# Resized / re-encoded image variants, rendered on a process pool
+derivative_cache = DerivativeCache(DERIVATIVES_DIR)
+
+# Resumable video uploads
+video_upload_sessions = UploadSessions(UPLOAD_SESSIONS_DIR, VIDEOS_DIR, MAX_VIDEO_UPLOAD_SIZE)
+
+@app.on_event("startup")
+async def start_upload_session_gc():
+    app.state.upload_session_gc = asyncio.create_task(video_upload_sessions.run_garbage_collector())
+
+# Password reset tokens, valid for 30 minutes. Set RESET_TOKEN_STORE=database
+# when running several workers so a reset link works on any of them.
+RESET_TOKEN_TTL = 1800
+# Base URL of the reset links sent by email
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000").rstrip("/")
+reset_tokens = create_store("reset_token")
+
+@app.on_event("startup")
+async def start_auth_background_tasks():
+    app.state.revocation_refresher = asyncio.create_task(revocations.run_refresher())
+    app.state.reset_token_sweeper = asyncio.create_task(reset_tokens.run_sweeper())
+
+@app.on_event("startup")
+async def start_stats_reconciler():
+    app.state.stats_reconciler = asyncio.create_task(run_stats_reconciler())
+
+# Email / webhook notifications, sent in the background from an outbox table
+# that endpoints write to in their own transaction (see notifications.py)
+notifier = NotificationDispatcher()
+
+@app.on_event("startup")
+async def start_notification_dispatcher():
+    app.state.notification_dispatcher = asyncio.create_task(notifier.run()) if notifier.enabled else None
+
+@app.on_event("shutdown")
+async def shutdown_background_work():
+    derivative_cache.shutdown()
+    app.state.upload_session_gc.cancel()
+    app.state.revocation_refresher.cancel()
+    app.state.reset_token_sweeper.cancel()
+    app.state.stats_reconciler.cancel()
+    if ingest_queue is not None:
+        app.state.ingest_writer.cancel()
+        # Commit what is still queued; whatever doesn't make it is replayed on the next start
+        try:
+            await asyncio.wait_for(ingest_queue.flush_pending(), timeout=10)
+        except asyncio.TimeoutError:
+            print(f"Ingest queue not drained; {len(ingest_queue.pending)} submissions left in the journal")
+        ingest_queue.close()
+    # Undelivered notifications stay in the outbox for the next start
+    if app.state.notification_dispatcher is not None:
+        app.state.notification_dispatcher.cancel()
+    await notifier.close()
+    if async_engine is not None:
+        # Pooled aiosqlite connections each hold a thread that would keep the process alive
+        await async_engine.dispose()
+
 # Pydantic models
 class VirtualTourRequest(BaseModel):
     name: str
@@ -89,6 +177,23 @@ class Product(BaseModel):
     specifications: Dict[str, str]
     images: List[str]
 
+class BulkActionFilter(BaseModel):
+    status: Optional[List[str]] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    email: Optional[str] = None
+
+class BulkActionRequest(BaseModel):
+    action: str  # archive, delete or set_status
+    status: Optional[str] = None  # new status for set_status
+    ids: Optional[List[int]] = None
+    filter: Optional[BulkActionFilter] = None
+
+class VideoUploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
 # Root endpoint
 @app.get("/")
 def read_root():
@@ -102,166 +207,59 @@ def read_root():
 @app.get("/api/detect-language")
 async def detect_language(request: Request):
     """Detect user language based on location and headers"""
-    
-    # Try to get user's country from IP (simplified)
-    client_ip = request.client.host
-    country_code = None
-    
-    # In production, you would use a real GeoIP service
-    # For now, we'll use the Accept-Language header
-    
-    language = get_user_language(request, country_code)
+    client_ip = request.client.host if request.client else None
+    language, country_code = detect_user_language(
+        client_ip, request.headers.get("accept-language", "")
+    )
     
     return {
         "detected_language": language,
-        "available_languages": ["en", "fr"],
+        "available_languages": list(SUPPORTED_LANGUAGES),
         "country_code": country_code
     }
 
 # Get translations endpoint
 @app.get("/api/translations/{language}")
-async def get_translations(language: str):
-    """Get all translations for a specific language"""
-    from translations import TRANSLATIONS
-    
+async def get_translations(language: str, request: Request, keys: Optional[str] = None):
+    """Get translations for a specific language
+
+    ``keys`` restricts the bundle to matching keys, e.g. ``nav_*,product_*``.
+    """
     if language not in TRANSLATIONS:
         raise HTTPException(status_code=404, detail="Language not supported")
     
-    return {
-        "language": language,
-        "translations": TRANSLATIONS[language]
-    }
+    return get_translation_bundle(language, normalize_key_filter(keys)).respond(request)
+
+# Full translation bundles are the most requested payloads; build them up front
+for _language in TRANSLATIONS:
+    get_translation_bundle(_language)
+
+# Catalog payloads are static, so serialize them once at import
+PRODUCTS_RESPONSE = CachedJSON(PRODUCT_CATEGORIES)
+CATEGORY_RESPONSES = {
+    category: CachedJSON(data) for category, data in CATEGORY_PRODUCTS.items()
+}
+SAMPLE_REQUEST_RESPONSE = CachedJSON(SAMPLE_REQUEST_INFO)
+COMPANY_INFO_RESPONSE = CachedJSON(COMPANY_INFO)
 
 # Products endpoints
 @app.get("/api/products")
-def get_products():
+async def get_products(request: Request):
     """Get all product categories"""
-    return {
-        "categories": [
-            {
-                "id": "plywood",
-                "title": "Plywood",
-                "description": "Premium, marine, and structural plywood",
-                "productCount": 3
-            },
-            {
-                "id": "melamine",
-                "title": "Prefinished Melamine",
-                "description": "Various colors with custom options",
-                "productCount": 2
-            },
-            {
-                "id": "melamine-plywood",
-                "title": "Prefinished Melamine Plywood",
-                "description": "High-quality melamine-faced plywood",
-                "productCount": 2
-            },
-            {
-                "id": "veneer",
-                "title": "Wood Veneer",
-                "description": "Different thicknesses and wood types",
-                "productCount": 4
-            },
-            {
-                "id": "logs",
-                "title": "Raw Wood Logs",
-                "description": "Sustainably sourced raw logs",
-                "productCount": 1
-            }
-        ]
-    }
+    return PRODUCTS_RESPONSE.respond(request)
 
 @app.get("/api/products/{category}")
-def get_products_by_category(category: str):
+async def get_products_by_category(category: str, request: Request):
     """Get products by category"""
-    categories_data = {
-        "plywood": {
-            "title": "Plywood",
-            "products": [
-                {
-                    "id": "premium-plywood",
-                    "title": "Premium Plywood",
-                    "description": "High-grade plywood for furniture and construction",
-                    "specifications": {
-                        "Thickness": "1mm - 30mm",
-                        "Sizes": "Standard and custom",
-                        "Wood Types": "Okoume, Acajou, Ayous, Sapele"
-                    }
-                },
-                {
-                    "id": "marine-plywood",
-                    "title": "Marine Plywood",
-                    "description": "Water-resistant plywood for marine applications",
-                    "specifications": {
-                        "Thickness": "6mm - 25mm",
-                        "Water Resistance": "High",
-                        "Applications": "Boats, outdoor furniture"
-                    }
-                },
-                {
-                    "id": "structural-plywood",
-                    "title": "Structural Plywood",
-                    "description": "Strong plywood for construction use",
-                    "specifications": {
-                        "Thickness": "9mm - 30mm",
-                        "Strength": "High load-bearing capacity",
-                        "Applications": "Construction, flooring"
-                    }
-                }
-            ]
-        },
-        "melamine": {
-            "title": "Prefinished Melamine",
-            "products": [
-                {
-                    "id": "white-melamine",
-                    "title": "White Melamine",
-                    "description": "Classic white finish",
-                    "specifications": {
-                        "Finish": "Smooth matte",
-                        "Custom Colors": "Available"
-                    }
-                },
-                {
-                    "id": "wood-grain-melamine",
-                    "title": "Wood Grain Melamine",
-                    "description": "Natural wood appearance",
-                    "specifications": {
-                        "Patterns": "Multiple wood grains",
-                        "Texture": "Embossed"
-                    }
-                }
-            ]
-        }
-    }
-    
-    if category not in categories_data:
+    if category not in CATEGORY_RESPONSES:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    return categories_data[category]
+    return CATEGORY_RESPONSES[category].respond(request)
 
-# Virtual tour booking
-@app.post("/api/virtual-tour")
-def book_virtual_tour(tour_request: VirtualTourRequest, db: Session = Depends(get_db)):
-    """Book a virtual tour"""
-    
-    # Check if user exists or create new user
-    user = db.query(User).filter(User.email == tour_request.email).first()
-    if not user:
-        user = User(
-            name=tour_request.name,
-            email=tour_request.email,
-            company=tour_request.company,
-            phone=tour_request.phone,
-            language=tour_request.language
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    # Create virtual tour request
-    tour = VirtualTour(
-        user_id=user.id,
+def virtual_tour_values(tour_request: VirtualTourRequest, user_id: int) -> dict:
+    """Column values for a new VirtualTour row"""
+    return dict(
+        user_id=user_id,
         name=tour_request.name,
         email=tour_request.email,
         company=tour_request.company,
@@ -272,39 +270,100 @@ def book_virtual_tour(tour_request: VirtualTourRequest, db: Session = Depends(ge
         language=tour_request.language,
         status="pending"
     )
+
+def store_virtual_tour(db: Session, tour_request: VirtualTourRequest) -> int:
+    # Find or create the user in the same transaction as the tour request
+    user_id = upsert_user(
+        db,
+        email=tour_request.email,
+        name=tour_request.name,
+        company=tour_request.company,
+        phone=tour_request.phone,
+        language=tour_request.language
+    )
+    
+    # Create virtual tour request
+    tour = VirtualTour(**virtual_tour_values(tour_request, user_id))
     
     db.add(tour)
+    db.flush()
+    tour_id = tour.id
+    queue_notifications(db, [("tour.created", dict(tour_id=tour_id, **tour_request.model_dump()))])
+    db.commit()
+    return tour_id
+
+# Virtual tour booking
+@app.post("/api/virtual-tour")
+async def book_virtual_tour(tour_request: VirtualTourRequest, db: AsyncDB = Depends(get_async_db)):
+    """Book a virtual tour
+
+    With INGEST_MODE=journal the request is queued and committed shortly
+    after; the response then has a ``submission_id`` instead of ``tour_id``.
+    """
+    response = {"success": True, "message": get_translation("tour_booked", tour_request.language)}
+    if ingest_queue is not None:
+        submission_id = await ingest_queue.submit("tour", tour_request.model_dump())
+        return {**response, "tour_id": None, "submission_id": submission_id}
+    
+    tour_id = await db.run(store_virtual_tour, tour_request)
+    notifier.wake()
+    return {**response, "tour_id": tour_id}
+
+# Bulk virtual tour import (admin endpoint)
+@app.post("/api/virtual-tour/bulk", dependencies=[Depends(require_access_token)])
+async def book_virtual_tours_bulk(request: Request, db: AsyncDB = Depends(get_async_db)):
+    """Import many tour requests from a JSON array or NDJSON body"""
+    valid, results = await read_bulk_items(request, VirtualTourRequest)
+    return await db.run(ingest_virtual_tours, valid, results)
+
+def ingest_virtual_tours(db: Session, valid: List, results: List[Dict]) -> dict:
+    user_ids = upsert_users(db, [
+        dict(email=r.email, name=r.name, company=r.company, phone=r.phone, language=r.language)
+        for _, r in valid
+    ])
+    rows = [dict(virtual_tour_values(r, user_ids[r.email]), submission_id=uuid.uuid4().hex) for _, r in valid]
+    ids = fill_missing_ids(db, VirtualTour, "submission_id", rows, bulk_insert(db, VirtualTour, rows))
     db.commit()
-    db.refresh(tour)
     
-    return {
-        "success": True,
-        "message": get_translation("tour_booked", tour_request.language),
-        "tour_id": tour.id
-    }
+    for (index, _), tour_id in zip(valid, ids):
+        results[index]["tour_id"] = tour_id
+    return bulk_summary(results)
 
-@app.get("/api/virtual-tours")
+@app.get("/api/virtual-tours", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def get_virtual_tours(
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Get virtual tour requests with pagination (admin endpoint)"""
-    offset = (page - 1) * limit
-    
-    # Query with sorting: non-archived first, then by created_at desc
+    """Get virtual tour requests with pagination (admin endpoint)
+
+    Pass ``cursor`` (empty for the first page, then ``next_cursor``) for keyset
+    pagination, where deep pages cost the same as the first one.
+    """
     query = db.query(VirtualTour)
     
+    if cursor is not None:
+        try:
+            tours, next_cursor = keyset_page(query, VirtualTour, cursor, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {
+            "tours": tours,
+            "next_cursor": next_cursor,
+            "limit": limit,
+            "total": cached_count(db, VirtualTour) if with_total else None
+        }
+    
+    offset = (page - 1) * limit
+    
     # Get total count
     total = query.count()
     
     # Sort: non-archived first, then by date
-    # SQLite doesn't handle boolean sorting directly, so we use CASE
-    from sqlalchemy import case
-    tours = query.order_by(
-        case((VirtualTour.status == 'archived', 1), else_=0),  # 0 for non-archived, 1 for archived
-        VirtualTour.created_at.desc()
-    ).offset(offset).limit(limit).all()
+    tours = query.order_by(*inbox_order(VirtualTour)).offset(offset).limit(limit).all()
     
     return {
         "tours": tours,
@@ -314,7 +373,8 @@ def get_virtual_tours(
         "pages": (total + limit - 1) // limit
     }
 
-@app.patch("/api/virtual-tours/{tour_id}/archive")
+@app.patch("/api/virtual-tours/{tour_id}/archive", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def archive_virtual_tour(tour_id: int, db: Session = Depends(get_db)):
     """Archive a virtual tour request"""
     tour = db.query(VirtualTour).filter(VirtualTour.id == tour_id).first()
@@ -327,7 +387,8 @@ def archive_virtual_tour(tour_id: int, db: Session = Depends(get_db)):
     
     return {"success": True, "message": "Tour request archived successfully"}
 
-@app.delete("/api/virtual-tours/{tour_id}")
+@app.delete("/api/virtual-tours/{tour_id}", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def delete_virtual_tour(tour_id: int, db: Session = Depends(get_db)):
     """Delete a virtual tour request (admin only)"""
     tour = db.query(VirtualTour).filter(VirtualTour.id == tour_id).first()
@@ -339,28 +400,10 @@ def delete_virtual_tour(tour_id: int, db: Session = Depends(get_db)):
     
     return {"success": True, "message": "Tour request deleted successfully"}
 
-# Contact form
-@app.post("/api/contact")
-def submit_contact(message_request: ContactMessageRequest, db: Session = Depends(get_db)):
-    """Submit a contact message"""
-    
-    # Check if user exists or create new user
-    user = db.query(User).filter(User.email == message_request.email).first()
-    if not user:
-        user = User(
-            name=message_request.name,
-            email=message_request.email,
-            company=message_request.company,
-            phone=message_request.phone,
-            language=message_request.language
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    # Create contact message
-    contact_message = ContactMessage(
-        user_id=user.id,
+def contact_message_values(message_request: ContactMessageRequest, user_id: int) -> dict:
+    """Column values for a new ContactMessage row"""
+    return dict(
+        user_id=user_id,
         name=message_request.name,
         email=message_request.email,
         company=message_request.company,
@@ -370,19 +413,120 @@ def submit_contact(message_request: ContactMessageRequest, db: Session = Depends
         language=message_request.language,
         status="unread"
     )
+
+# Write-behind ingestion (INGEST_MODE=journal): public form posts are
+# journaled, acknowledged, and committed in batches (see ingest.py)
+# kind -> (model, request model, column values, id key of responses and notifications)
+SUBMISSION_KINDS = {
+    "contact": (ContactMessage, ContactMessageRequest, contact_message_values, "message_id"),
+    "tour": (VirtualTour, VirtualTourRequest, virtual_tour_values, "tour_id"),
+}
+
+def write_submissions(records: List[Dict]):
+    """Commit journaled submissions in one transaction, skipping those already written"""
+    db = SessionLocal()
+    try:
+        parsed = [(record, SUBMISSION_KINDS[record["kind"]][1].model_validate(record["values"])) for record in records]
+        user_ids = upsert_users(db, [
+            dict(email=r.email, name=r.name, company=r.company, phone=r.phone, language=r.language)
+            for _, r in parsed
+        ])
+        for kind, (model, _, values, id_key) in SUBMISSION_KINDS.items():
+            batch = [(record, r) for record, r in parsed if record["kind"] == kind]
+            # A replayed journal can hold records committed just before a crash
+            written = set()
+            for ids in chunked([record["id"] for record, _ in batch]):
+                written.update(db.scalars(select(model.submission_id).where(model.submission_id.in_(ids))))
+            new = [(record, r) for record, r in batch if record["id"] not in written]
+            rows = []
+            for record, r in new:
+                received_at = datetime.utcfromtimestamp(record["received_at"])
+                rows.append(dict(
+                    values(r, user_ids[r.email]),
+                    submission_id=record["id"], created_at=received_at, updated_at=received_at
+                ))
+            row_ids = bulk_insert(db, model, rows)
+            queue_notifications(db, [
+                (f"{kind}.created", {id_key: row_id, "submission_id": record["id"], **r.model_dump()})
+                for (record, r), row_id in zip(new, row_ids)
+            ])
+        db.commit()
+    finally:
+        db.close()
+    notifier.wake()
+
+ingest_queue = create_ingest_queue(write_submissions)
+
+@app.on_event("startup")
+async def start_ingest_writer():
+    if ingest_queue is None:
+        return
+    replayed = ingest_queue.open()
+    if replayed:
+        print(f"Replaying {replayed} journaled submissions")
+    app.state.ingest_writer = asyncio.create_task(ingest_queue.run_writer())
+
+def store_contact_message(db: Session, message_request: ContactMessageRequest) -> int:
+    # Find or create the user in the same transaction as the message
+    user_id = upsert_user(
+        db,
+        email=message_request.email,
+        name=message_request.name,
+        company=message_request.company,
+        phone=message_request.phone,
+        language=message_request.language
+    )
+    
+    # Create contact message
+    contact_message = ContactMessage(**contact_message_values(message_request, user_id))
     
     db.add(contact_message)
+    db.flush()
+    message_id = contact_message.id
+    queue_notifications(db, [("contact.created", dict(message_id=message_id, **message_request.model_dump()))])
+    db.commit()
+    return message_id
+
+# Contact form
+@app.post("/api/contact")
+async def submit_contact(message_request: ContactMessageRequest, db: AsyncDB = Depends(get_async_db)):
+    """Submit a contact message
+
+    With INGEST_MODE=journal the message is queued and committed shortly
+    after; the response then has a ``submission_id`` instead of ``message_id``.
+    """
+    response = {"success": True, "message": get_translation("message_sent", message_request.language)}
+    if ingest_queue is not None:
+        submission_id = await ingest_queue.submit("contact", message_request.model_dump())
+        return {**response, "message_id": None, "submission_id": submission_id}
+    
+    message_id = await db.run(store_contact_message, message_request)
+    notifier.wake()
+    return {**response, "message_id": message_id}
+
+# Bulk contact message import (admin endpoint)
+@app.post("/api/contact/bulk", dependencies=[Depends(require_access_token)])
+async def submit_contacts_bulk(request: Request, db: AsyncDB = Depends(get_async_db)):
+    """Import many contact messages from a JSON array or NDJSON body"""
+    valid, results = await read_bulk_items(request, ContactMessageRequest)
+    return await db.run(ingest_contact_messages, valid, results)
+
+def ingest_contact_messages(db: Session, valid: List, results: List[Dict]) -> dict:
+    user_ids = upsert_users(db, [
+        dict(email=r.email, name=r.name, company=r.company, phone=r.phone, language=r.language)
+        for _, r in valid
+    ])
+    rows = [dict(contact_message_values(r, user_ids[r.email]), submission_id=uuid.uuid4().hex) for _, r in valid]
+    ids = fill_missing_ids(db, ContactMessage, "submission_id", rows, bulk_insert(db, ContactMessage, rows))
     db.commit()
-    db.refresh(contact_message)
     
-    return {
-        "success": True,
-        "message": get_translation("message_sent", message_request.language),
-        "message_id": contact_message.id
-    }
+    for (index, _), message_id in zip(valid, ids):
+        results[index]["message_id"] = message_id
+    return bulk_summary(results)
 
 # User registration endpoint
 @app.post("/api/users/register")
+@async_endpoint
 def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
     """Register a new user"""
     
@@ -411,32 +555,17 @@ def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
         "user_id": user.id
     }
 
-# Order submission endpoint
-@app.post("/api/orders")
-def submit_order(order_request: OrderRequest, db: Session = Depends(get_db)):
-    """Submit a product order/inquiry"""
-    
-    # Check if user exists or create new user
-    user = db.query(User).filter(User.email == order_request.customer_email).first()
-    if not user:
-        user = User(
-            name=order_request.customer_name,
-            email=order_request.customer_email,
-            company=order_request.customer_company,
-            phone=order_request.customer_phone,
-            language=order_request.language
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    # Generate order number
-    order_number = f"TW{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}"
-    
-    # Create order
-    order = Order(
-        user_id=user.id,
-        order_number=order_number,
+def new_order_number() -> str:
+    """Date prefix plus 64 random bits; a bulk import makes thousands of these
+    per day, where 8 hex digits (32 bits) would start colliding on the unique
+    column and fail the whole batch"""
+    return f"TW{datetime.now().strftime('%Y%m%d')}{uuid.uuid4().hex[:16].upper()}"
+
+def order_values(order_request: OrderRequest, user_id: int) -> dict:
+    """Column values for a new Order row, including a fresh order number"""
+    return dict(
+        user_id=user_id,
+        order_number=new_order_number(),
         customer_name=order_request.customer_name,
         customer_email=order_request.customer_email,
         customer_company=order_request.customer_company,
@@ -446,57 +575,372 @@ def submit_order(order_request: OrderRequest, db: Session = Depends(get_db)):
         status="inquiry",
         notes=order_request.notes
     )
+
+# Order submission endpoint
+@app.post("/api/orders")
+@async_endpoint
+def submit_order(order_request: OrderRequest, db: Session = Depends(get_db)):
+    """Submit a product order/inquiry"""
+    
+    # Find or create the user in the same transaction as the order
+    user_id = upsert_user(
+        db,
+        email=order_request.customer_email,
+        name=order_request.customer_name,
+        company=order_request.customer_company,
+        phone=order_request.customer_phone,
+        language=order_request.language
+    )
+    
+    # Create order
+    order = Order(**order_values(order_request, user_id))
     
     db.add(order)
+    # Flush to get the order id, then write its line items in the same transaction
+    db.flush()
+    insert_order_items(db, build_order_items(order.id, order_request.products))
+    order_id = order.id
+    order_number = order.order_number
+    queue_notifications(db, [(
+        "order.created", dict(order_id=order_id, order_number=order_number, **order_request.model_dump())
+    )])
     db.commit()
-    db.refresh(order)
+    notifier.wake()
     
     return {
         "success": True,
         "message": "Order inquiry submitted successfully",
-        "order_id": order.id,
-        "order_number": order.order_number
+        "order_id": order_id,
+        "order_number": order_number
     }
 
-# Get orders (admin endpoint)
-@app.get("/api/orders")
-def get_orders(db: Session = Depends(get_db)):
-    """Get all orders (admin endpoint)"""
-    orders = db.query(Order).all()
-    
-    # Convert JSON strings back to objects for display
-    for order in orders:
-        if order.products:
+# Bulk order import (admin endpoint)
+@app.post("/api/orders/bulk", dependencies=[Depends(require_access_token)])
+async def submit_orders_bulk(request: Request, db: AsyncDB = Depends(get_async_db)):
+    """Import many orders from a JSON array or NDJSON body"""
+    valid, results = await read_bulk_items(request, OrderRequest)
+    return await db.run(ingest_orders, valid, results)
+
+def ingest_orders(db: Session, valid: List, results: List[Dict]) -> dict:
+    user_ids = upsert_users(db, [
+        dict(
+            email=r.customer_email,
+            name=r.customer_name,
+            company=r.customer_company,
+            phone=r.customer_phone,
+            language=r.language
+        )
+        for _, r in valid
+    ])
+    rows = [order_values(r, user_ids[r.customer_email]) for _, r in valid]
+    ids = fill_missing_ids(db, Order, "order_number", rows, bulk_insert(db, Order, rows))
+    
+    items = [
+        item
+        for (_, r), order_id in zip(valid, ids)
+        for item in build_order_items(order_id, r.products)
+    ]
+    for chunk in chunked(items):
+        insert_order_items(db, chunk)
+    db.commit()
+    
+    for (index, _), order_id, row in zip(valid, ids, rows):
+        results[index]["order_id"] = order_id
+        results[index]["order_number"] = row["order_number"]
+    return bulk_summary(results)
+
+# Largest page the order listing will return
+MAX_ORDERS_PAGE_SIZE = 200
+
+# Product fields stored in their own order_items columns
+ORDER_ITEM_FIELDS = ("id", "product_id", "category", "quantity", "unit")
+
+def build_order_items(order_id: int, products: List[Dict]) -> List[Dict]:
+    """Normalize submitted products into order_items column values"""
+    items = []
+    for position, product in enumerate(products):
+        attributes = {k: v for k, v in product.items() if k not in ORDER_ITEM_FIELDS}
+        
+        quantity = product.get("quantity")
+        try:
+            quantity = float(quantity) if quantity is not None else None
+        except (TypeError, ValueError):
+            # Keep free-form quantities such as "2 containers" as attributes
+            attributes["quantity"] = quantity
+            quantity = None
+        
+        product_id = product.get("id", product.get("product_id"))
+        items.append(dict(
+            order_id=order_id,
+            position=position,
+            product_id=str(product_id) if product_id is not None else None,
+            category=product.get("category"),
+            quantity=quantity,
+            unit=product.get("unit"),
+            attributes=json.dumps(attributes) if attributes else None
+        ))
+    return items
+
+def insert_order_items(db: Session, items: List[Dict]):
+    """Write order_items rows with a single executemany"""
+    if items:
+        db.execute(insert(OrderItem), items)
+
+def backfill_order_items():
+    """Create line items for orders submitted before order_items existed"""
+    db = SessionLocal()
+    try:
+        missing = db.query(Order).filter(
+            ~Order.id.in_(db.query(OrderItem.order_id))
+        ).order_by(Order.id).all()
+        for order in missing:
             try:
-                order.products = json.loads(order.products)
-            except:
+                products = json.loads(order.products)
+            except ValueError:
+                continue
+            if isinstance(products, list):
+                insert_order_items(db, build_order_items(
+                    order.id, [p for p in products if isinstance(p, dict)]
+                ))
+        db.commit()
+        if missing:
+            print(f"Backfilled line items for {len(missing)} orders")
+    finally:
+        db.close()
+
+def serialize_order_item(item: OrderItem) -> dict:
+    """Rebuild the submitted product dict from an order_items row"""
+    product = json.loads(item.attributes) if item.attributes else {}
+    if item.product_id is not None:
+        product["id"] = item.product_id
+    if item.category is not None:
+        product["category"] = item.category
+    if item.quantity is not None:
+        product["quantity"] = int(item.quantity) if item.quantity.is_integer() else item.quantity
+    if item.unit is not None:
+        product["unit"] = item.unit
+    return product
+
+def load_order_items(db: Session, order_ids: List[int]) -> Dict[int, List[OrderItem]]:
+    """Fetch the line items of several orders in one query, grouped by order id"""
+    items_by_order: Dict[int, List[OrderItem]] = {}
+    if not order_ids:
+        return items_by_order
+    
+    items = db.query(OrderItem).filter(
+        OrderItem.order_id.in_(order_ids)
+    ).order_by(OrderItem.order_id, OrderItem.position).all()
+    for item in items:
+        items_by_order.setdefault(item.order_id, []).append(item)
+    return items_by_order
+
+def serialize_order(order: Order, items: Optional[List[OrderItem]] = None) -> dict:
+    """Plain dict for an order, with products rebuilt from its line items"""
+    if items:
+        products = [serialize_order_item(item) for item in items]
+    else:
+        # Orders submitted before order_items existed only have the JSON blob
+        products = order.products
+        if products:
+            try:
+                products = json.loads(products)
+            except ValueError:
                 pass
     
-    return {"orders": orders, "total": len(orders)}
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "order_number": order.order_number,
+        "customer_name": order.customer_name,
+        "customer_email": order.customer_email,
+        "customer_company": order.customer_company,
+        "customer_phone": order.customer_phone,
+        "products": products,
+        "total_amount": order.total_amount,
+        "currency": order.currency,
+        "language": order.language,
+        "status": order.status,
+        "notes": order.notes,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "updated_at": order.updated_at.isoformat() if order.updated_at else None
+    }
+
+# Get orders (admin endpoint)
+@app.get("/api/orders", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def get_orders(
+    page: int = 1,
+    limit: int = 50,
+    product_id: Optional[str] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get orders with pagination, newest first (admin endpoint)
+
+    ``product_id`` and ``category`` restrict the list to orders containing a
+    matching line item.
+    """
+    page = max(page, 1)
+    limit = min(max(limit, 1), MAX_ORDERS_PAGE_SIZE)
+    offset = (page - 1) * limit
+    
+    query = db.query(Order)
+    if product_id or category:
+        matching = db.query(OrderItem.order_id)
+        if product_id:
+            matching = matching.filter(OrderItem.product_id == product_id)
+        if category:
+            matching = matching.filter(OrderItem.category == category)
+        query = query.filter(Order.id.in_(matching))
+    
+    total = query.with_entities(func.count(Order.id)).scalar()
+    orders = query.order_by(
+        Order.created_at.desc(), Order.id.desc()
+    ).offset(offset).limit(limit).all()
+    items_by_order = load_order_items(db, [order.id for order in orders])
+    
+    return {
+        "orders": [serialize_order(order, items_by_order.get(order.id)) for order in orders],
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit
+    }
+
+# Ordered volume per category (admin endpoint)
+@app.get("/api/orders/volume", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def get_order_volume(db: Session = Depends(get_db)):
+    """Total ordered quantity and order count per product category and unit"""
+    rows = db.query(
+        OrderItem.category,
+        OrderItem.unit,
+        func.sum(OrderItem.quantity),
+        func.count(func.distinct(OrderItem.order_id))
+    ).group_by(OrderItem.category, OrderItem.unit).all()
+    
+    return {
+        "volume": [
+            {"category": category, "unit": unit, "quantity": quantity, "orders": orders}
+            for category, unit, quantity, orders in rows
+        ]
+    }
+
+# Export orders as NDJSON (admin endpoint)
+@app.get("/api/orders/export", dependencies=[Depends(require_access_token)])
+def export_orders():
+    """Stream every order as newline-delimited JSON.
+
+    Orders are read in keyset pages of EXPORT_BATCH_SIZE, so memory use stays
+    flat regardless of how many orders exist.
+    """
+    def generate():
+        # The request-scoped session is closed before the body is streamed.
+        # Each page gets a short-lived session of its own, so no cursor or
+        # transaction stays open while the client reads, and the items query
+        # never shares a connection with an unfinished streaming result
+        # (which unbuffered MySQL drivers would silently cut short).
+        last_id = 0
+        while True:
+            with SessionLocal() as db:
+                orders = db.execute(
+                    select(Order).where(Order.id > last_id).order_by(Order.id).limit(EXPORT_BATCH_SIZE)
+                ).scalars().all()
+                if not orders:
+                    return
+                items_by_order = load_order_items(db, [order.id for order in orders])
+                chunk = "".join(
+                    json.dumps(serialize_order(order, items_by_order.get(order.id))) + "\n"
+                    for order in orders
+                )
+            last_id = orders[-1].id
+            yield chunk
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=orders.ndjson"}
+    )
+
+# Export users, contact messages or tour requests (admin endpoint)
+@app.get("/api/export/{kind}")
+async def export_records(
+    kind: str,
+    request: Request,
+    format: str = "csv",
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    claims: Dict = Depends(require_access_token)
+):
+    """Stream ``users``, ``contact-messages`` or ``virtual-tours`` as CSV or NDJSON.
+
+    ``status`` is a comma-separated list (``active``/``inactive`` for users),
+    and ``since`` (inclusive) / ``until`` (exclusive) bound ``created_at``.
+    The body is gzipped on the fly when the client accepts it. The user
+    list is only exported for admins.
+    """
+    if kind not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if kind == "users" and claims["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        statuses = parse_statuses(kind, status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    compress = accepts_gzip(request)
+    headers = {
+        "Content-Disposition": f"attachment; filename={export_filename(kind, format)}",
+        "Vary": "Accept-Encoding"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        stream_export(kind, export_query(kind, statuses, since, until), format, compress),
+        media_type=EXPORT_FORMATS[format][0],
+        headers=headers
+    )
 
 # Get contact messages (admin endpoint)
-@app.get("/api/contact-messages")
+@app.get("/api/contact-messages", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def get_contact_messages(
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Get contact messages with pagination (admin endpoint)"""
-    offset = (page - 1) * limit
-    
-    # Query with sorting: unarchived first, then by created_at desc
+    """Get contact messages with pagination (admin endpoint)
+
+    Pass ``cursor`` (empty for the first page, then ``next_cursor``) for keyset
+    pagination, where deep pages cost the same as the first one.
+    """
     query = db.query(ContactMessage)
     
+    if cursor is not None:
+        try:
+            messages, next_cursor = keyset_page(query, ContactMessage, cursor, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {
+            "messages": messages,
+            "next_cursor": next_cursor,
+            "limit": limit,
+            "total": cached_count(db, ContactMessage) if with_total else None
+        }
+    
+    offset = (page - 1) * limit
+    
     # Get total count
     total = query.count()
     
     # Sort: non-archived first, then by date
-    # SQLite doesn't handle boolean sorting directly, so we use CASE
-    from sqlalchemy import case
-    messages = query.order_by(
-        case((ContactMessage.status == 'archived', 1), else_=0),  # 0 for non-archived, 1 for archived
-        ContactMessage.created_at.desc()
-    ).offset(offset).limit(limit).all()
+    messages = query.order_by(*inbox_order(ContactMessage)).offset(offset).limit(limit).all()
     
     return {
         "messages": messages,
@@ -506,7 +950,8 @@ def get_contact_messages(
         "pages": (total + limit - 1) // limit
     }
 
-@app.patch("/api/contact-messages/{message_id}/archive")
+@app.patch("/api/contact-messages/{message_id}/archive", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def archive_contact_message(message_id: int, db: Session = Depends(get_db)):
     """Archive a contact message"""
     message = db.query(ContactMessage).filter(ContactMessage.id == message_id).first()
@@ -519,7 +964,8 @@ def archive_contact_message(message_id: int, db: Session = Depends(get_db)):
     
     return {"success": True, "message": "Message archived successfully"}
 
-@app.delete("/api/contact-messages/{message_id}")
+@app.delete("/api/contact-messages/{message_id}", dependencies=[Depends(require_access_token)])
+@async_endpoint
 def delete_contact_message(message_id: int, db: Session = Depends(get_db)):
     """Delete a contact message (admin only)"""
     message = db.query(ContactMessage).filter(ContactMessage.id == message_id).first()
@@ -531,100 +977,243 @@ def delete_contact_message(message_id: int, db: Session = Depends(get_db)):
     
     return {"success": True, "message": "Message deleted successfully"}
 
-# Image upload endpoint
-@app.post("/api/upload/image")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload an image file"""
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+def bulk_action_response(db: Session, model, request: BulkActionRequest) -> dict:
+    selection = request.filter or BulkActionFilter()
+    criteria = bulk_criteria(model, selection.status, selection.since, selection.until, selection.email)
+    affected = apply_bulk_action(db, model, request.action, criteria, request.ids, request.status)
+    return {
+        "success": True,
+        "action": request.action,
+        "affected": affected,
+        "requested": len(set(request.ids)) if request.ids is not None else None
+    }
+
+# Bulk actions on the inbox (admin endpoints)
+@app.post("/api/contact-messages/bulk-actions", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def bulk_update_contact_messages(request: BulkActionRequest, db: Session = Depends(get_db)):
+    """Archive, delete or change the status of many contact messages at once
+
+    Rows are picked by ``ids``, by ``filter`` (status list, ``since`` /
+    ``until`` on created_at, sender ``email``), or both. One UPDATE or DELETE
+    in one transaction; the response counts the rows actually changed.
+    """
+    return bulk_action_response(db, ContactMessage, request)
+
+@app.post("/api/virtual-tours/bulk-actions", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def bulk_update_virtual_tours(request: BulkActionRequest, db: Session = Depends(get_db)):
+    """Archive, delete or change the status of many tour requests at once
+    (see bulk_update_contact_messages)"""
+    return bulk_action_response(db, VirtualTour, request)
+
+# Write-behind queue status (admin endpoint)
+@app.get("/api/admin/ingest", dependencies=[Depends(require_access_token)])
+async def get_ingest_status():
+    """Queue depth and last group commit of the write-behind queue"""
+    if ingest_queue is None:
+        return {"mode": "direct"}
+    return ingest_queue.status()
+
+# Notification outbox status (admin endpoint)
+@app.get("/api/admin/notifications", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def get_notification_status(db: Session = Depends(get_db)):
+    """Pending and failed notifications per channel, and the latest failures"""
+    return outbox_status(db)
+
+# Dashboard statistics (admin endpoints)
+@app.get("/api/admin/stats", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def get_admin_stats(db: Session = Depends(get_db)):
+    """Counts per status of contact messages, tour requests and orders"""
+    return read_status_counts(db)
+
+@app.post("/api/admin/stats/reconcile", dependencies=[Depends(require_role("admin"))])
+@async_endpoint
+def reconcile_admin_stats(db: Session = Depends(get_db)):
+    """Recount the source tables and repair drifted counters"""
+    return {"success": True, "corrections": reconcile_status_counts(db)}
+
+# Full-text search (admin endpoint)
+MAX_SEARCH_PAGE_SIZE = 100
+
+@app.get("/api/search", dependencies=[Depends(require_access_token)])
+@async_endpoint
+def search_records(
+    q: str,
+    types: Optional[str] = None,
+    page: int = 1,
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    """Search contact messages, tour requests and orders, best matches first
+
+    ``types`` is a comma-separated subset of contact, tour and order.
+    Matched words are wrapped in <mark> in the (HTML-escaped) highlights.
+    """
+    kinds = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_KINDS)
+    unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    page = max(1, page)
+    
+    try:
+        results, has_more = search(db, q, kinds, limit, (page - 1) * limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
     
-    file_extension = file.filename.split(".")[-1]
-    file_name = f"{datetime.now().timestamp()}.{file_extension}"
-    file_path = IMAGES_DIR / file_name
+    return {
+        "results": results,
+        "page": page,
+        "limit": limit,
+        "has_more": has_more
+    }
+
+# Image upload endpoint
+@app.post("/api/upload/image", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_image(request: Request):
+    """Upload an image file (multipart/form-data, field ``file``)"""
+    stored = await store_upload(request, IMAGES_DIR, MAX_IMAGE_UPLOAD_SIZE, "image/", "File must be an image")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Render the standard responsive variants in the background
+    derivative_cache.render_defaults(IMAGES_DIR / stored["filename"])
     
     return {
         "success": True,
-        "filename": file_name,
-        "url": f"/api/images/{file_name}"
+        **stored,
+        "url": f"/api/images/{stored['filename']}",
+        "widths": list(DERIVATIVE_WIDTHS)
     }
 
 # Video upload endpoint
-@app.post("/api/upload/video")
-async def upload_video(file: UploadFile = File(...)):
-    """Upload a video file"""
-    if not file.content_type.startswith("video/"):
+@app.post("/api/upload/video", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_video(request: Request):
+    """Upload a video file (multipart/form-data, field ``file``)"""
+    stored = await store_upload(request, VIDEOS_DIR, MAX_VIDEO_UPLOAD_SIZE, "video/", "File must be a video")
+    
+    return {
+        "success": True,
+        **stored,
+        "url": f"/api/videos/{stored['filename']}"
+    }
+
+# Resumable video upload endpoints
+@app.post("/api/upload/video/sessions")
+async def create_video_upload_session(req: VideoUploadSessionRequest, request: Request):
+    """Start a resumable video upload; chunks are then PUT individually"""
+    if req.content_type and not req.content_type.startswith("video/"):
         raise HTTPException(status_code=400, detail="File must be a video")
     
-    file_extension = file.filename.split(".")[-1]
-    file_name = f"{datetime.now().timestamp()}.{file_extension}"
-    file_path = VIDEOS_DIR / file_name
+    client_ip = request.client.host if request.client else None
+    session = await video_upload_sessions.create(req.filename, req.size, req.content_type, client_ip)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    return {
+        "success": True,
+        **session,
+        "url": f"/api/upload/video/sessions/{session['session_id']}"
+    }
+
+@app.get("/api/upload/video/sessions/{session_id}")
+async def get_video_upload_session(session_id: str):
+    """Received chunks and the offset to resume a sequential upload from"""
+    return {"success": True, **await video_upload_sessions.status(session_id)}
+
+@app.put("/api/upload/video/sessions/{session_id}/chunks/{index}")
+async def upload_video_chunk(session_id: str, index: int, request: Request):
+    """Upload chunk ``index`` as the raw request body.
+
+    Chunks may arrive in any order and in parallel. When an
+    ``X-Chunk-SHA256`` header is sent, the chunk is rejected unless its
+    contents match.
+    """
+    chunk = await video_upload_sessions.write_chunk(
+        session_id, index, request.stream(), request.headers.get("x-chunk-sha256")
+    )
+    return {"success": True, **chunk}
+
+@app.post("/api/upload/video/sessions/{session_id}/complete")
+async def complete_video_upload_session(session_id: str):
+    """Move a fully uploaded video into place"""
+    stored = await video_upload_sessions.complete(session_id)
     
     return {
         "success": True,
-        "filename": file_name,
-        "url": f"/api/videos/{file_name}"
+        **stored,
+        "url": f"/api/videos/{stored['filename']}"
     }
 
+@app.delete("/api/upload/video/sessions/{session_id}")
+async def abort_video_upload_session(session_id: str):
+    """Discard an upload session and its chunks"""
+    await video_upload_sessions.abort(session_id)
+    return {"success": True, "message": "Upload session deleted"}
+
 # Serve uploaded images
-@app.get("/api/images/{filename}")
-def get_image(filename: str):
-    """Serve uploaded images"""
+@app.api_route("/api/images/{filename}", methods=["GET", "HEAD"])
+async def get_image(
+    filename: str,
+    request: Request,
+    w: Optional[int] = None,
+    format: Optional[str] = None
+):
+    """Serve uploaded images
+
+    ``w`` (snapped up to a standard width) and ``format`` (webp, avif, jpeg,
+    png or auto) serve a cached derivative instead of the original.
+    """
     file_path = IMAGES_DIR / filename
-    if not file_path.exists():
+    if filename.startswith(TEMP_PREFIX) or not file_path.exists():
         # Return a placeholder image
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(file_path)
+    
+    if w is None and format is None:
+        return await serve_file(request, file_path)
+    
+    if w is not None and w < 1:
+        raise HTTPException(status_code=400, detail="Width must be positive")
+    try:
+        fmt = pick_format(format, request.headers.get("accept", ""), filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    width = snap_width(w) if w is not None else DERIVATIVE_WIDTHS[-1]
+    
+    try:
+        variant = await derivative_cache.get(file_path, width, fmt)
+    except DecompressionBombError:
+        raise HTTPException(status_code=415, detail="Image is too large to convert")
+    except (OSError, SyntaxError, ValueError):
+        # Pillow raises these for files it can't decode
+        raise HTTPException(status_code=415, detail="Image can't be converted")
+    
+    response = await serve_file(request, variant, media_type=IMAGE_FORMATS[fmt][1])
+    if format == "auto":
+        response.headers["Vary"] = "Accept"
+    return response
 
 # Serve uploaded videos
-@app.get("/api/videos/{filename}")
-def get_video(filename: str):
-    """Serve uploaded videos"""
+@app.api_route("/api/videos/{filename}", methods=["GET", "HEAD"])
+async def get_video(filename: str, request: Request):
+    """Serve uploaded videos, with byte ranges for seeking"""
     file_path = VIDEOS_DIR / filename
-    if not file_path.exists():
+    if filename.startswith(TEMP_PREFIX) or not file_path.exists():
         raise HTTPException(status_code=404, detail="Video not found")
-    return FileResponse(file_path)
+    return await serve_file(request, file_path)
 
 # Sample data endpoint
 @app.get("/api/sample-request")
-def request_sample():
+async def request_sample(request: Request):
     """Request product samples"""
-    return {
-        "message": "Sample request endpoint",
-        "process": [
-            "Fill out the sample request form",
-            "Specify products and quantities",
-            "Provide shipping information",
-            "Receive confirmation within 24 hours",
-            "Samples shipped within 3-5 business days"
-        ]
-    }
+    return SAMPLE_REQUEST_RESPONSE.respond(request)
 
 # Company information
 @app.get("/api/company-info")
-def get_company_info():
+async def get_company_info(request: Request):
     """Get company information"""
-    return {
-        "name": "Tropical Wood, a division of Roilux",
-        "location": "Cameroon",
-        "established": "2010",
-        "capacity": "50+ containers per month",
-        "certifications": [
-            "FSC Certified",
-            "ISO 9001:2015",
-            "PEFC Certified"
-        ],
-        "contact": {
-            "email": "roilux.woods@gmail.com",
-            "phone": "+237-681-21-1111",
-            "address": "Abonbang, Cameroon"
-        }
-    }
+    return COMPANY_INFO_RESPONSE.respond(request)
 
 # Health check
 @app.get("/health")
@@ -632,6 +1221,18 @@ def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# Database engine profile (admin endpoint)
+@app.get("/health/db", dependencies=[Depends(require_monitoring_access)])
+def database_profile():
+    """Report the active engine profile, effective SQLite PRAGMAs and pool status"""
+    return check_engine_profile(engine, ENGINE_PROFILE)
+
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_monitoring_access)])
+async def metrics():
+    """Request, database and pool metrics of this worker process"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Authentication Models
 class LoginRequest(BaseModel):
     username: str
@@ -647,95 +1248,89 @@ class PasswordChangeRequest(BaseModel):
     username: str
     new_password: str
 
-def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+# Default admin users, created on first boot
+DEFAULT_ADMIN_USERS = [
+    {"username": "admin", "email": "roilux.woods@gmail.com", "password": "roilux2024", "role": "admin"},
+    {"username": "processor1", "email": "processor@roilux.com", "password": "processor123", "role": "processor"},
+]
 
-# Initialize default admin users
-@app.on_event("startup")
-async def create_default_admin():
-    """Create default admin user if not exists or reset password"""
-    db = next(get_db())
-    
-    # Check if admin user already exists
-    existing_admin = db.query(AdminUser).filter(AdminUser.username == "admin").first()
-    if existing_admin:
-        # Always reset to correct password on startup
-        existing_admin.password_hash = hash_password("roilux2024")
-        existing_admin.email = "roilux.woods@gmail.com"
-        existing_admin.role = "admin"
-        db.commit()
-        print(f"Admin user password reset. Hash: {existing_admin.password_hash}")
-    else:
-        admin_user = AdminUser(
-            username="admin",
-            email="roilux.woods@gmail.com",
-            password_hash=hash_password("roilux2024"),
-            role="admin"
-        )
-        db.add(admin_user)
-        db.commit()
-        print(f"Admin user created. Hash: {admin_user.password_hash}")
-    
-    # Add a sample processor if not exists
-    existing_processor = db.query(AdminUser).filter(AdminUser.username == "processor1").first()
-    if not existing_processor:
-        processor_user = AdminUser(
-            username="processor1",
-            email="processor@roilux.com", 
-            password_hash=hash_password("processor123"),
-            role="processor"
-        )
-        db.add(processor_user)
+def seed_default_admins():
+    """Create the default admin users that don't exist yet.
+
+    Existing accounts are never modified, so changed passwords survive restarts.
+    """
+    db = SessionLocal()
+    try:
+        existing = set(db.scalars(select(AdminUser.username).where(
+            AdminUser.username.in_([user["username"] for user in DEFAULT_ADMIN_USERS])
+        )))
+        for user in DEFAULT_ADMIN_USERS:
+            if user["username"] in existing:
+                continue
+            try:
+                with db.begin_nested():
+                    db.add(AdminUser(
+                        username=user["username"],
+                        email=user["email"],
+                        password_hash=hash_password(user["password"]),
+                        role=user["role"]
+                    ))
+                print(f"Default user created: {user['username']}")
+            except IntegrityError:
+                # Created concurrently by another worker
+                pass
         db.commit()
-        print("Processor user created")
+    finally:
+        db.close()
 
 # Authentication endpoints
-@app.post("/api/auth/login")
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    """Admin/processor login"""
-    print(f"Login attempt for username: {login_data.username}")
-    
-    admin_user = db.query(AdminUser).filter(AdminUser.username == login_data.username).first()
+def serialize_admin_user(admin_user: AdminUser) -> dict:
+    return {
+        "id": admin_user.id,
+        "username": admin_user.username,
+        "email": admin_user.email,
+        "role": admin_user.role,
+        "createdAt": admin_user.created_at.isoformat(),
+        "lastLogin": admin_user.last_login.isoformat() if admin_user.last_login else None
+    }
+
+def authenticate_admin_user(db: Session, username: str, password_hash: str) -> dict:
+    admin_user = db.query(AdminUser).filter(AdminUser.username == username).first()
     
-    if not admin_user:
-        print(f"User not found: {login_data.username}")
-        # Debug info for temporary debugging
-        all_users = db.query(AdminUser).all()
-        user_list = [f"{u.username}({u.role})" for u in all_users]
-        error_detail = f"User '{login_data.username}' not found. Available users: {', '.join(user_list)}"
-        raise HTTPException(status_code=401, detail=error_detail)
-    
-    provided_hash = hash_password(login_data.password)
-    print(f"Provided password hash: {provided_hash}")
-    print(f"Stored password hash: {admin_user.password_hash}")
-    
-    if admin_user.password_hash != provided_hash:
-        print("Password mismatch!")
-        # Debug info for temporary debugging
-        error_detail = f"Password mismatch for '{login_data.username}'. Provided: '{login_data.password}' (hash: {provided_hash}), Expected hash: {admin_user.password_hash}"
-        raise HTTPException(status_code=401, detail=error_detail)
+    if not admin_user or admin_user.password_hash != password_hash:
+        print(f"Failed login attempt for username: {username}")
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    if not admin_user.is_active:
+        raise HTTPException(status_code=403, detail="Account is disabled")
     
     # Update last login
     admin_user.last_login = datetime.now()
     db.commit()
     
+    return serialize_admin_user(admin_user)
+
+@app.post("/api/auth/login")
+async def login(login_data: LoginRequest, db: AsyncDB = Depends(get_async_db)):
+    """Admin/processor login, returning a signed access token"""
+    password_hash = await hash_password_async(login_data.password)
+    user = await db.run(authenticate_admin_user, login_data.username, password_hash)
+    token, claims = issue_access_token(user["id"], user["username"], user["role"])
+    
     return {
         "success": True,
-        "user": {
-            "id": admin_user.id,
-            "username": admin_user.username,
-            "email": admin_user.email,
-            "role": admin_user.role,
-            "createdAt": admin_user.created_at.isoformat(),
-            "lastLogin": admin_user.last_login.isoformat() if admin_user.last_login else None
-        }
+        "user": user,
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_at": datetime.utcfromtimestamp(claims["exp"]).isoformat() + "Z"
     }
 
-@app.post("/api/auth/register")
-def register_admin_user(user_data: AdminUserRegistration, db: Session = Depends(get_db)):
-    """Register new admin/processor user"""
-    
+@app.post("/api/auth/logout")
+async def logout(claims: Dict = Depends(require_access_token), db: AsyncDB = Depends(get_async_db)):
+    """Revoke the access token used for this request"""
+    await db.run(revocations.revoke_token, claims)
+    return {"success": True, "message": "Logged out"}
+
+def create_admin_user(db: Session, user_data: AdminUserRegistration, password_hash: str) -> dict:
     # Check if user already exists
     existing_user = db.query(AdminUser).filter(
         (AdminUser.username == user_data.username) | (AdminUser.email == user_data.email)
@@ -744,48 +1339,65 @@ def register_admin_user(user_data: AdminUserRegistration, db: Session = Depends(
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
-    # Validate role
-    if user_data.role not in ["admin", "processor"]:
-        raise HTTPException(status_code=400, detail="Invalid role. Must be 'admin' or 'processor'")
-    
     # Create new admin user
     admin_user = AdminUser(
         username=user_data.username,
         email=user_data.email,
-        password_hash=hash_password(user_data.password),
+        password_hash=password_hash,
         role=user_data.role
     )
     
     db.add(admin_user)
+    db.flush()
+    user_id = admin_user.id
     db.commit()
-    db.refresh(admin_user)
     
     return {
         "success": True,
         "message": "User registered successfully",
-        "user_id": admin_user.id
+        "user_id": user_id
     }
 
-@app.post("/api/auth/change-password")
-def change_password(password_data: PasswordChangeRequest, db: Session = Depends(get_db)):
-    """Change user password (admin only)"""
-    
-    admin_user = db.query(AdminUser).filter(AdminUser.username == password_data.username).first()
+@app.post("/api/auth/register", dependencies=[Depends(require_role("admin"))])
+async def register_admin_user(user_data: AdminUserRegistration, db: AsyncDB = Depends(get_async_db)):
+    """Register new admin/processor user"""
+    # Validate role
+    if user_data.role not in ["admin", "processor"]:
+        raise HTTPException(status_code=400, detail="Invalid role. Must be 'admin' or 'processor'")
     
+    password_hash = await hash_password_async(user_data.password)
+    return await db.run(create_admin_user, user_data, password_hash)
+
+def set_admin_password(db: Session, criterion, password_hash: str):
+    """Store a new password hash for the matching user and revoke their existing tokens"""
+    admin_user = db.query(AdminUser).filter(criterion).first()
     if not admin_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Update password
-    admin_user.password_hash = hash_password(password_data.new_password)
+    admin_user.password_hash = password_hash
     admin_user.updated_at = datetime.now()
+    revocations.revoke_user(db, admin_user.id)
     db.commit()
+
+@app.post("/api/auth/change-password")
+async def change_password(password_data: PasswordChangeRequest, claims: Dict = Depends(require_access_token),
+                          db: AsyncDB = Depends(get_async_db)):
+    """Change a user's password: admins for anyone, everyone else only their own"""
+    criterion = AdminUser.username == password_data.username
+    if claims["role"] != "admin":
+        if claims["username"] != password_data.username:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        criterion = criterion & (AdminUser.id == claims["sub"])
+    password_hash = await hash_password_async(password_data.new_password)
+    await db.run(set_admin_password, criterion, password_hash)
     
     return {
         "success": True,
         "message": "Password changed successfully"
     }
 
-@app.get("/api/auth/users")
+@app.get("/api/auth/users", dependencies=[Depends(require_role("admin"))])
+@async_endpoint
 def get_all_admin_users(db: Session = Depends(get_db)):
     """Get all admin users"""
     admin_users = db.query(AdminUser).all()
@@ -814,87 +1426,61 @@ class PasswordResetConfirm(BaseModel):
     new_password: str
 
 # Password Reset endpoints
+def find_admin_user_id(db: Session, email: str) -> Optional[int]:
+    return db.query(AdminUser.id).filter(AdminUser.email == email).scalar()
+
+def queue_password_reset_email(db: Session, email: str, reset_link: str):
+    queue_notifications(db, [("password_reset.requested", {
+        "email": email, "reset_link": reset_link, "expires_in_minutes": RESET_TOKEN_TTL // 60
+    })])
+    db.commit()
+
 @app.post("/api/auth/request-password-reset")
-def request_password_reset(request: PasswordResetRequest, db: Session = Depends(get_db)):
+async def request_password_reset(request: PasswordResetRequest, db: AsyncDB = Depends(get_async_db)):
     """Request password reset"""
-    admin_user = db.query(AdminUser).filter(AdminUser.email == request.email).first()
+    admin_user_id = await db.run(find_admin_user_id, request.email)
     
-    if not admin_user:
+    if admin_user_id is None:
         # Don't reveal if email exists or not for security
         return {"success": True, "message": "If the email exists, a reset link will be sent"}
     
-    # Generate reset token
-    import secrets
+    # Generate reset token; the store expires it on its own
     reset_token = secrets.token_urlsafe(32)
-    
-    # Store token with expiration (30 minutes)
-    # In production, you'd store this in database with expiration
-    # For now, we'll use a simple in-memory store
-    import time
-    if not hasattr(app.state, 'reset_tokens'):
-        app.state.reset_tokens = {}
-    
-    app.state.reset_tokens[reset_token] = {
-        'user_id': admin_user.id,
-        'email': admin_user.email,
-        'expires': time.time() + 1800  # 30 minutes
-    }
-    
-    # In production, you would send email here
-    # For demo, we'll log the reset link
-    reset_link = f"http://localhost:3000/reset-password?token={reset_token}"
-    print(f"Password reset link: {reset_link}")
+    await reset_tokens.set_async(reset_token, {
+        'user_id': admin_user_id,
+        'email': request.email
+    }, RESET_TOKEN_TTL)
+    
+    reset_link = f"{FRONTEND_URL}/reset-password?token={reset_token}"
+    if email_enabled():
+        await db.run(queue_password_reset_email, request.email, reset_link)
+        notifier.wake()
+    else:
+        # No SMTP server configured (development): log the link instead
+        print(f"Password reset link: {reset_link}")
     
     return {"success": True, "message": "Password reset link sent"}
 
 @app.post("/api/auth/validate-reset-token")
-def validate_reset_token(token_data: dict, db: Session = Depends(get_db)):
+async def validate_reset_token(token_data: dict):
     """Validate password reset token"""
     token = token_data.get('token')
-    
-    if not hasattr(app.state, 'reset_tokens'):
+    if not isinstance(token, str):
         return {"valid": False}
     
-    token_info = app.state.reset_tokens.get(token)
-    if not token_info:
-        return {"valid": False}
-    
-    import time
-    if time.time() > token_info['expires']:
-        # Token expired, remove it
-        del app.state.reset_tokens[token]
-        return {"valid": False}
-    
-    return {"valid": True}
+    return {"valid": await reset_tokens.get_async(token) is not None}
 
 @app.post("/api/auth/reset-password")
-def reset_password_confirm(request: PasswordResetConfirm, db: Session = Depends(get_db)):
+async def reset_password_confirm(request: PasswordResetConfirm, db: AsyncDB = Depends(get_async_db)):
     """Confirm password reset"""
-    if not hasattr(app.state, 'reset_tokens'):
-        raise HTTPException(status_code=400, detail="Invalid or expired reset token")
-    
-    token_info = app.state.reset_tokens.get(request.token)
+    # Taking the token out of the store makes it single-use, even under concurrent requests
+    token_info = await reset_tokens.pop_async(request.token)
     if not token_info:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
-    import time
-    if time.time() > token_info['expires']:
-        # Token expired, remove it
-        del app.state.reset_tokens[request.token]
-        raise HTTPException(status_code=400, detail="Reset token has expired")
-    
-    # Get user and update password
-    admin_user = db.query(AdminUser).filter(AdminUser.id == token_info['user_id']).first()
-    if not admin_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Update password
-    admin_user.password_hash = hash_password(request.new_password)
-    admin_user.updated_at = datetime.now()
-    db.commit()
-    
-    # Remove used token
-    del app.state.reset_tokens[request.token]
+    password_hash = await hash_password_async(request.new_password)
+    await db.run(set_admin_password, AdminUser.id == token_info['user_id'], password_hash)
     
     return {"success": True, "message": "Password reset successfully"}
 
@@ -0,0 +1,179 @@
+# Streaming, content-addressed storage for uploaded media
+
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import multipart
+from fastapi import HTTPException, Request
+from multipart.multipart import parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+# Size caps per media type (bytes)
+MAX_IMAGE_UPLOAD_SIZE = int(os.getenv("MAX_IMAGE_UPLOAD_SIZE", 20 * 1024 * 1024))
+MAX_VIDEO_UPLOAD_SIZE = int(os.getenv("MAX_VIDEO_UPLOAD_SIZE", 2 * 1024 * 1024 * 1024))
+
+# Bytes buffered from the request per disk write
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Prefix of in-progress files, which are never served
+TEMP_PREFIX = ".upload-"
+
+# OpenAPI description of the body store_upload() parses itself
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+def safe_extension(filename: Optional[str]) -> str:
+    """Lower-cased extension of ``filename`` limited to safe characters"""
+    if not filename or "." not in filename:
+        return ""
+    extension = filename.rsplit(".", 1)[-1].lower()
+    return extension if re.fullmatch(r"[a-z0-9]{1,10}", extension) else ""
+
+def _write_chunk(out, hasher, chunk: bytes):
+    hasher.update(chunk)
+    out.write(chunk)
+
+def _finalize(temp_path: Path, directory: Path, digest: str, extension: str):
+    """Move the upload to its content-addressed name, or drop it if that
+    content is already stored. Returns (path, duplicate)."""
+    target = directory / (f"{digest}.{extension}" if extension else digest)
+    if target.exists():
+        temp_path.unlink()
+        return target, True
+
+    os.replace(temp_path, target)
+    return target, False
+
+class _MultipartEvents:
+    """Parser callbacks, queued as (kind, value) events so the async side can
+    act on them (and await disk writes) after each parser.write()"""
+
+    def __init__(self):
+        self.events = []
+        self._headers = {}
+        self._field = bytearray()
+        self._value = bytearray()
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._value.extend(data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", self._headers)),
+            "on_part_data": lambda data, start, end: self.events.append(("data", data[start:end])),
+            "on_part_end": lambda: self.events.append(("end", None)),
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_end(self):
+        self._headers[bytes(self._field).lower()] = bytes(self._value)
+        self._field.clear()
+        self._value.clear()
+
+    def take(self):
+        events, self.events = self.events, []
+        return events
+
+async def store_upload(request: Request, directory: Path, max_size: int,
+                       content_type: str = "", type_error: str = "Unsupported file type",
+                       field: str = "file") -> Dict:
+    """Stream the ``field`` file of a multipart/form-data request into
+    ``directory`` under the SHA-256 of its contents.
+
+    The body is parsed as it arrives rather than spooled first, so the file
+    is written to disk once and the ``max_size`` cap (413) applies while
+    reading; a Content-Length over the cap is refused before reading at all.
+    Parts whose type doesn't start with ``content_type`` are rejected with
+    400 ``type_error``. Content that is already stored is not kept twice.
+    """
+    media_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if media_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    too_large = HTTPException(status_code=413, detail=f"File exceeds the {max_size} byte limit")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_size + MULTIPART_OVERHEAD:
+        raise too_large
+
+    events = _MultipartEvents()
+    parser = multipart.MultipartParser(params[b"boundary"], events.callbacks())
+    temp_path = directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}"
+    hasher = hashlib.sha256()
+    out = None
+    filename = None
+    in_file = done = False
+    size = other = 0
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, value in events.take():
+                if kind == "headers":
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    in_file = not done and options.get(b"name") == field.encode() and b"filename" in options
+                    if in_file:
+                        part_type = value.get(b"content-type", b"").decode("latin-1")
+                        if not part_type.startswith(content_type):
+                            raise HTTPException(status_code=400, detail=type_error)
+                        filename = options[b"filename"].decode("utf-8", "replace")
+                        out = await run_in_threadpool(open, temp_path, "wb")
+                elif kind == "data" and in_file:
+                    size += len(value)
+                    if size > max_size:
+                        raise too_large
+                    buffer.extend(value)
+                    if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                        await run_in_threadpool(_write_chunk, out, hasher, bytes(buffer))
+                        buffer.clear()
+                elif kind == "data":
+                    # Other form fields are ignored, within reason
+                    other += len(value)
+                    if other > MULTIPART_OVERHEAD:
+                        raise too_large
+                elif kind == "end" and in_file:
+                    await run_in_threadpool(_write_chunk, out, hasher, bytes(buffer))
+                    buffer.clear()
+                    in_file, done = False, True
+        parser.finalize()
+        if not done:
+            raise HTTPException(status_code=400, detail=f"No file uploaded in the '{field}' field")
+        await run_in_threadpool(out.close)
+
+        digest = hasher.hexdigest()
+        path, duplicate = await run_in_threadpool(
+            _finalize, temp_path, directory, digest, safe_extension(filename)
+        )
+    except BaseException:
+        if out is not None:
+            out.close()
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+    return {
+        "filename": path.name,
+        "sha256": digest,
+        "size": size,
+        "duplicate": duplicate
+    }
@@ -0,0 +1,64 @@
+# Alembic environment: runs migrations on the application's engine, so the
+# DATABASE_URL, pool profile and SQLite pragmas match the running app.
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import Base, DATABASE_URL, engine
+
+config = context.config
+
+# Only configure logging when run from the alembic CLI, not from startup
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def include_name(name, type_, parent_names) -> bool:
+    """Keep autogenerate away from schema objects that only exist in
+    migrations: the FTS5 search table (and its shadow tables) and MySQL
+    FULLTEXT indexes"""
+    if type_ == "table":
+        return not name.startswith("search_index")
+    if type_ == "index":
+        return not name.startswith("ft_")
+    return True
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL instead of running it (``alembic upgrade head --sql``)"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Called programmatically with an open connection (see schema.py)
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite can't ALTER most things; batch mode recreates the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,209 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 22:24:38.052905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Inbox sort key (archived rows last), spelled exactly like
+# database.archived_flag so list queries can use the index. The extra
+# parentheses make it a functional key part on MySQL.
+ARCHIVED_FLAG = sa.text("(CASE WHEN (status = 'archived') THEN 1 ELSE 0 END)")
+
+
+def upgrade() -> None:
+    op.create_table('admin_users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('last_login', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('admin_users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_admin_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_admin_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_admin_users_username'), ['username'], unique=True)
+
+    op.create_table('contact_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('company', sa.String(length=255), nullable=True),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('language', sa.String(length=5), nullable=False),
+    sa.Column('status', sa.Enum('unread', 'read', 'replied', 'archived', name='message_status'), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('contact_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_contact_messages_id'), ['id'], unique=False)
+        batch_op.create_index('ix_contact_messages_inbox', [ARCHIVED_FLAG, sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+    op.create_table('kv_entries',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('kv_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_kv_entries_expires_at'), ['expires_at'], unique=False)
+
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('order_number', sa.String(length=50), nullable=False),
+    sa.Column('customer_name', sa.String(length=100), nullable=False),
+    sa.Column('customer_email', sa.String(length=255), nullable=False),
+    sa.Column('customer_company', sa.String(length=255), nullable=True),
+    sa.Column('customer_phone', sa.String(length=50), nullable=True),
+    sa.Column('products', sa.Text(), nullable=False),
+    sa.Column('total_amount', sa.String(length=50), nullable=True),
+    sa.Column('currency', sa.String(length=10), nullable=True),
+    sa.Column('language', sa.String(length=5), nullable=False),
+    sa.Column('status', sa.Enum('inquiry', 'quote_sent', 'confirmed', 'in_production', 'shipped', 'delivered', 'cancelled', name='order_status'), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('order_number')
+    )
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_id'), ['id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('company', sa.String(length=255), nullable=True),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('language', sa.String(length=5), nullable=False),
+    sa.Column('country', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+
+    op.create_table('virtual_tours',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('company', sa.String(length=255), nullable=True),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('preferred_date', sa.String(length=50), nullable=False),
+    sa.Column('preferred_time', sa.String(length=50), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('language', sa.String(length=5), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'confirmed', 'completed', 'cancelled', 'archived', name='tour_status'), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('virtual_tours', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_virtual_tours_id'), ['id'], unique=False)
+        batch_op.create_index('ix_virtual_tours_inbox', [ARCHIVED_FLAG, sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.String(length=100), nullable=True),
+    sa.Column('category', sa.String(length=100), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('unit', sa.String(length=50), nullable=True),
+    sa.Column('attributes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_items_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_items_product_id'), ['product_id'], unique=False)
+
+    op.create_table('revoked_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=64), nullable=True),
+    sa.Column('admin_user_id', sa.Integer(), nullable=False),
+    sa.Column('revoked_at', sa.Float(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['admin_user_id'], ['admin_users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_admin_user_id'), ['admin_user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_id'), ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_id'))
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_revoked_tokens_admin_user_id'))
+
+    op.drop_table('revoked_tokens')
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_product_id'))
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+        batch_op.drop_index(batch_op.f('ix_order_items_id'))
+        batch_op.drop_index(batch_op.f('ix_order_items_category'))
+
+    op.drop_table('order_items')
+    with op.batch_alter_table('virtual_tours', schema=None) as batch_op:
+        batch_op.drop_index('ix_virtual_tours_inbox')
+        batch_op.drop_index(batch_op.f('ix_virtual_tours_id'))
+
+    op.drop_table('virtual_tours')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_id'))
+
+    op.drop_table('orders')
+    with op.batch_alter_table('kv_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_kv_entries_expires_at'))
+
+    op.drop_table('kv_entries')
+    with op.batch_alter_table('contact_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_contact_messages_inbox')
+        batch_op.drop_index(batch_op.f('ix_contact_messages_id'))
+
+    op.drop_table('contact_messages')
+    with op.batch_alter_table('admin_users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_admin_users_username'))
+        batch_op.drop_index(batch_op.f('ix_admin_users_id'))
+        batch_op.drop_index(batch_op.f('ix_admin_users_email'))
+
+    op.drop_table('admin_users')
@@ -0,0 +1,88 @@
+"""Full-text search index over contact messages, tour requests and orders
+
+SQLite: one FTS5 table, search_index, holding all three kinds. Its rowid
+is ``id * 4 + kind`` (see search.py), and triggers keep it in sync with
+the source tables. MySQL: FULLTEXT indexes on the source tables, which
+InnoDB maintains itself.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 23:05:12.418330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table, kind code, then the source expressions for name, email, company, subject, body
+SOURCES = [
+    ('contact_messages', 1, ('name', 'email', 'company', 'subject', 'message')),
+    ('virtual_tours', 2, ('name', 'email', 'company', 'NULL', 'message')),
+    ('orders', 3, ('customer_name', 'customer_email', 'customer_company', 'order_number', 'notes')),
+]
+
+FIELDS = ('name', 'email', 'company', 'subject', 'body')
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "name, email, company, subject, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        for table, kind, columns in SOURCES:
+            fields = ', '.join(FIELDS)
+            new_values = ', '.join('NULL' if c == 'NULL' else f'new.{c}' for c in columns)
+            assignments = ', '.join(
+                f'{field} = {"NULL" if c == "NULL" else f"new.{c}"}' for field, c in zip(FIELDS, columns)
+            )
+            watched = ', '.join(c for c in columns if c != 'NULL')
+            op.execute(
+                f"INSERT INTO search_index (rowid, {fields}) "
+                f"SELECT id * 4 + {kind}, {', '.join(columns)} FROM {table}"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO search_index (rowid, {fields}) VALUES (new.id * 4 + {kind}, {new_values}); END"
+            )
+            # Status changes don't touch the index
+            op.execute(
+                f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {watched} ON {table} BEGIN "
+                f"UPDATE search_index SET {assignments} WHERE rowid = old.id * 4 + {kind}; END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM search_index WHERE rowid = old.id * 4 + {kind}; END"
+            )
+
+    elif dialect == 'mysql':
+        for table, kind, columns in SOURCES:
+            op.create_index(
+                f'ft_{table}_search', table, [c for c in columns if c != 'NULL'],
+                mysql_prefix='FULLTEXT'
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        for table, kind, columns in SOURCES:
+            for event in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{event}")
+        op.execute("DROP TABLE IF EXISTS search_index")
+
+    elif dialect == 'mysql':
+        for table, kind, columns in SOURCES:
+            op.drop_index(f'ft_{table}_search', table_name=table)
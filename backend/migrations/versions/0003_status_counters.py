@@ -0,0 +1,94 @@
+"""Per-status row counters for the admin dashboard
+
+status_counters holds one row per (kind, status). Triggers on the source
+tables adjust it inside the transaction that inserts, deletes or changes
+the status of a row, so ORM writes, bulk inserts and set-based updates are
+all counted. stats.reconcile_status_counts repairs any drift.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 23:41:56.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# kind, table, statuses
+SOURCES = [
+    ('contact', 'contact_messages', ('unread', 'read', 'replied', 'archived')),
+    ('tour', 'virtual_tours', ('pending', 'confirmed', 'completed', 'cancelled', 'archived')),
+    ('order', 'orders', ('inquiry', 'quote_sent', 'confirmed', 'in_production', 'shipped', 'delivered', 'cancelled')),
+]
+
+
+def _adjust(kind: str, row: str, delta: str) -> str:
+    return (
+        f"UPDATE status_counters SET count = count {delta} 1 "
+        f"WHERE kind = '{kind}' AND status = {row}.status"
+    )
+
+
+def upgrade() -> None:
+    counters = op.create_table('status_counters',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'status')
+    )
+    op.bulk_insert(counters, [
+        {'kind': kind, 'status': status, 'count': 0}
+        for kind, table, statuses in SOURCES for status in statuses
+    ])
+    for kind, table, statuses in SOURCES:
+        op.execute(
+            f"UPDATE status_counters SET count = "
+            f"(SELECT COUNT(*) FROM {table} WHERE {table}.status = status_counters.status) "
+            f"WHERE kind = '{kind}'"
+        )
+
+    dialect = op.get_bind().dialect.name
+    for kind, table, statuses in SOURCES:
+        if dialect == 'sqlite':
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_insert AFTER INSERT ON {table} BEGIN "
+                f"{_adjust(kind, 'new', '+')}; END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_update AFTER UPDATE OF status ON {table} "
+                f"WHEN old.status IS NOT new.status BEGIN "
+                f"{_adjust(kind, 'old', '-')}; {_adjust(kind, 'new', '+')}; END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_delete AFTER DELETE ON {table} BEGIN "
+                f"{_adjust(kind, 'old', '-')}; END"
+            )
+        elif dialect == 'mysql':
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_insert AFTER INSERT ON {table} FOR EACH ROW "
+                f"{_adjust(kind, 'NEW', '+')}"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_update AFTER UPDATE ON {table} FOR EACH ROW "
+                f"BEGIN IF NOT (OLD.status <=> NEW.status) THEN "
+                f"{_adjust(kind, 'OLD', '-')}; {_adjust(kind, 'NEW', '+')}; END IF; END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {table}_counter_delete AFTER DELETE ON {table} FOR EACH ROW "
+                f"{_adjust(kind, 'OLD', '-')}"
+            )
+
+
+def downgrade() -> None:
+    for kind, table, statuses in SOURCES:
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_counter_{event}")
+    op.drop_table('status_counters')
@@ -0,0 +1,37 @@
+"""Submission ids for rows written through the write-behind queue
+
+Unique per journal record, so replaying a journal after a crash skips the
+records that were already committed.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:12:37.560914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('contact_messages', 'virtual_tours')
+
+
+def upgrade() -> None:
+    # Plain ADD COLUMN rather than batch mode: recreating the tables on
+    # SQLite would drop their search and counter triggers
+    for table in TABLES:
+        op.add_column(table, sa.Column('submission_id', sa.String(length=32), nullable=True))
+        op.create_index(op.f(f'ix_{table}_submission_id'), table, ['submission_id'], unique=True)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(op.f(f'ix_{table}_submission_id'), table_name=table)
+        op.drop_column(table, 'submission_id')
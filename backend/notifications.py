@@ -0,0 +1,378 @@
+# Email (SMTP) and webhook notifications, delivered from a persistent outbox
+#
+# Endpoints call queue_notifications inside the transaction that creates
+# the order, message or tour request, so a notification exists exactly when
+# its row does, and the request never waits on a mail server or webhook.
+# NotificationDispatcher runs in the background of every worker. It claims
+# due outbox rows in batches, sends the emails of a batch over one SMTP
+# connection and POSTs the webhook events of a batch to each URL in one
+# request through a shared, pooled httpx.AsyncClient. Delivered rows are
+# deleted; failed ones are retried with exponential backoff and marked
+# failed after NOTIFY_MAX_ATTEMPTS.
+#
+# Delivery is at least once: webhook receivers should dedupe on event id.
+#
+# For local testing, point SMTP_HOST/SMTP_PORT at a debugging SMTP server
+# (e.g. ``python -m aiosmtpd -n -l localhost:1025`` with SMTP_TLS=false) and
+# NOTIFY_WEBHOOK_URLS at any local HTTP listener.
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import smtplib
+import ssl
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, NotificationOutbox
+from metrics import Counter, Gauge, Histogram
+
+# Email is off unless SMTP_HOST and a sender are set; webhooks are off without URLs
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_TLS = os.getenv("SMTP_TLS", "true").lower() == "true"
+NOTIFY_EMAIL_FROM = os.getenv("NOTIFY_EMAIL_FROM") or SMTP_USER or os.getenv("COMPANY_EMAIL", "")
+# Recipients of order, message and tour notifications (comma separated)
+NOTIFY_EMAIL_TO = os.getenv("NOTIFY_EMAIL_TO") or os.getenv("COMPANY_EMAIL", "")
+NOTIFY_WEBHOOK_URLS = [url.strip() for url in os.getenv("NOTIFY_WEBHOOK_URLS", "").split(",") if url.strip()]
+# Webhook bodies are signed with HMAC-SHA256 in X-Signature-256 when set
+NOTIFY_WEBHOOK_SECRET = os.getenv("NOTIFY_WEBHOOK_SECRET", "")
+
+# Rows claimed per round, and how often the outbox is checked without a wake-up (seconds)
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", 100))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", 5))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", 8))
+# Connection pool of the shared webhook client, and the timeout of each send (seconds)
+NOTIFY_MAX_CONNECTIONS = int(os.getenv("NOTIFY_MAX_CONNECTIONS", 10))
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", 10))
+# Retry delays double from NOTIFY_RETRY_DELAY up to NOTIFY_MAX_RETRY_DELAY (seconds)
+NOTIFY_RETRY_DELAY = 30
+NOTIFY_MAX_RETRY_DELAY = 3600
+# Claimed rows become due again after this long, in case their dispatcher died (seconds)
+NOTIFY_LEASE = 300
+
+# event -> (email subject, email recipients, sent to webhooks). "company"
+# means NOTIFY_EMAIL_TO; "user" means the email in the event data.
+EVENTS = {
+    "order.created": ("New order inquiry {order_number}", "company", True),
+    "contact.created": ("New contact message: {subject}", "company", True),
+    "tour.created": ("Virtual tour request from {name}", "company", True),
+    # Carries a reset link, so it only goes to the account's own address
+    "password_reset.requested": ("Reset your password", "user", False),
+}
+
+NOTIFICATIONS_SENT = Counter(
+    "notifications_sent_total", "Notifications delivered", ("channel",)
+)
+NOTIFICATION_FAILURES = Counter(
+    "notification_failures_total", "Notification delivery attempts that failed", ("channel",)
+)
+NOTIFICATION_LATENCY = Histogram(
+    "notification_delivery_duration_seconds", "Time to deliver one batch of notifications", ("channel",)
+)
+NOTIFICATION_OUTBOX = Gauge(
+    "notification_outbox_rows", "Notifications in the outbox at the last dispatch round", ("status",)
+)
+
+def email_enabled() -> bool:
+    return bool(SMTP_HOST and NOTIFY_EMAIL_FROM)
+
+def notification_rows(event: str, data: Dict) -> List[Dict]:
+    """Outbox rows for one event: one per configured channel and target"""
+    _, recipients, webhooks = EVENTS[event]
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    rows = []
+    to = data.get("email") if recipients == "user" else NOTIFY_EMAIL_TO
+    if email_enabled() and to:
+        rows.append(dict(event=event, channel="email", target=to, payload=payload))
+    if webhooks:
+        rows.extend(dict(event=event, channel="webhook", target=url, payload=payload) for url in NOTIFY_WEBHOOK_URLS)
+    return rows
+
+def queue_notifications(db: Session, events: List[Tuple[str, Dict]]) -> int:
+    """Add notifications for ``events`` to the outbox in the caller's
+    transaction. Returns the number of rows queued (0 with no channels)."""
+    now = datetime.utcnow()
+    rows = [
+        dict(row, status="pending", attempts=0, next_attempt_at=now, created_at=now)
+        for event, data in events for row in notification_rows(event, data)
+    ]
+    if rows:
+        db.execute(insert(NotificationOutbox), rows)
+    return len(rows)
+
+def _field(value) -> str:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, indent=2)
+    return str(value)
+
+def render_email(event: str, target: str, data: Dict) -> EmailMessage:
+    subject, _, _ = EVENTS[event]
+    message = EmailMessage()
+    message["Subject"] = subject.format_map({key: _field(value) for key, value in data.items()})
+    message["From"] = NOTIFY_EMAIL_FROM
+    message["To"] = target
+    if event == "password_reset.requested":
+        body = (
+            f"Use this link within {data['expires_in_minutes']} minutes to reset your password:\n\n"
+            f"{data['reset_link']}\n\n"
+            "If you didn't ask for a password reset, you can ignore this email."
+        )
+    else:
+        body = "\n".join(
+            f"{key.replace('_', ' ').capitalize()}: {_field(value)}"
+            for key, value in data.items() if value not in (None, "")
+        )
+    message.set_content(body)
+    return message
+
+def send_emails(messages: List[Tuple[int, EmailMessage]]) -> Dict[int, Optional[str]]:
+    """Send ``messages`` over one SMTP connection. Returns an error per
+    outbox id, None for those that were accepted."""
+    results: Dict[int, Optional[str]] = {}
+    try:
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=NOTIFY_TIMEOUT) as smtp:
+            if SMTP_TLS:
+                smtp.starttls(context=ssl.create_default_context())
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+            for row_id, message in messages:
+                try:
+                    smtp.send_message(message)
+                    results[row_id] = None
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # Only this message was refused; the connection is still usable
+                    results[row_id] = f"{type(e).__name__}: {e}"
+    except (OSError, smtplib.SMTPException) as e:
+        for row_id, _ in messages:
+            results.setdefault(row_id, f"{type(e).__name__}: {e}")
+    return results
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so failed rows don't retry in lockstep"""
+    delay = min(NOTIFY_RETRY_DELAY * 2 ** (attempts - 1), NOTIFY_MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+def claim_due(limit: int) -> List[Dict]:
+    """Lease up to ``limit`` due rows to this dispatcher and return them"""
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    columns = (NotificationOutbox.id, NotificationOutbox.event, NotificationOutbox.channel,
+               NotificationOutbox.target, NotificationOutbox.payload, NotificationOutbox.attempts)
+    with SessionLocal() as db:
+        counts = dict(db.execute(
+            select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)
+        ).all())
+        for status in NotificationOutbox.status.type.enums:
+            NOTIFICATION_OUTBOX.set(status, value=counts.get(status, 0))
+        ids = db.scalars(
+            select(NotificationOutbox.id)
+            .where(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(limit)
+        ).all()
+        if not ids:
+            return []
+        # Rows another dispatcher claimed in the meantime no longer match next_attempt_at <= now
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids), NotificationOutbox.next_attempt_at <= now)
+            .values(claim=token, next_attempt_at=now + timedelta(seconds=NOTIFY_LEASE))
+        )
+        db.commit()
+        return [row._asdict() for row in db.execute(select(*columns).where(NotificationOutbox.claim == token))]
+
+def record_results(rows: List[Dict], results: Dict[int, Optional[str]]):
+    """Delete delivered rows; schedule retries for the rest or mark them failed"""
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        delivered = [row["id"] for row in rows if results.get(row["id"]) is None]
+        if delivered:
+            db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(delivered)))
+        for row in rows:
+            error = results.get(row["id"])
+            if error is None:
+                continue
+            attempts = row["attempts"] + 1
+            values = dict(attempts=attempts, claim=None, last_error=error[:1000])
+            if attempts >= NOTIFY_MAX_ATTEMPTS:
+                values["status"] = "failed"
+                print(f"Notification {row['id']} ({row['event']} by {row['channel']}) failed for good: {error}")
+            else:
+                values["next_attempt_at"] = now + timedelta(seconds=retry_delay(attempts))
+            db.execute(update(NotificationOutbox).where(NotificationOutbox.id == row["id"]).values(**values))
+        db.commit()
+
+def outbox_status(db: Session) -> Dict:
+    counts = {
+        f"{status}_{channel}": count
+        for status, channel, count in db.execute(
+            select(NotificationOutbox.status, NotificationOutbox.channel, func.count())
+            .group_by(NotificationOutbox.status, NotificationOutbox.channel)
+        )
+    }
+    oldest = db.scalar(select(func.min(NotificationOutbox.created_at)).where(NotificationOutbox.status == "pending"))
+    recent_failures = db.execute(
+        select(NotificationOutbox.id, NotificationOutbox.event, NotificationOutbox.channel,
+               NotificationOutbox.target, NotificationOutbox.attempts, NotificationOutbox.last_error)
+        .where(NotificationOutbox.status == "failed")
+        .order_by(NotificationOutbox.id.desc())
+        .limit(10)
+    )
+    return {
+        "channels": {"email": email_enabled(), "webhooks": len(NOTIFY_WEBHOOK_URLS)},
+        "counts": counts,
+        "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else None,
+        "recent_failures": [
+            {**row._asdict(), "target": row.target if row.channel == "email" else httpx.URL(row.target).host}
+            for row in recent_failures
+        ],
+    }
+
+class NotificationDispatcher:
+    """Delivers outbox rows in the background; ``wake()`` after queueing"""
+
+    def __init__(self, batch_size: int = NOTIFY_BATCH_SIZE, poll_interval: float = NOTIFY_POLL_INTERVAL,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.transport = transport
+        self.client: Optional[httpx.AsyncClient] = None
+        # Bound to the loop of the running app, so created in start()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def enabled(self) -> bool:
+        return email_enabled() or bool(NOTIFY_WEBHOOK_URLS)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=NOTIFY_TIMEOUT,
+            limits=httpx.Limits(max_connections=NOTIFY_MAX_CONNECTIONS, max_keepalive_connections=NOTIFY_MAX_CONNECTIONS),
+            headers={"User-Agent": "tropical-wood-notifications"},
+        )
+
+    async def close(self):
+        self._loop = None
+        self._wake = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def wake(self):
+        """Deliver new rows now rather than at the next poll. Safe to call
+        from worker threads."""
+        loop, event = self._loop, self._wake
+        if loop is not None and event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    async def post_webhook(self, url: str, rows: List[Dict]) -> Optional[str]:
+        """POST a batch of events to ``url``; returns an error or None"""
+        body = json.dumps({"events": [
+            {"id": row["id"], "event": row["event"], "data": json.loads(row["payload"])} for row in rows
+        ]}, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if NOTIFY_WEBHOOK_SECRET:
+            digest = hmac.new(NOTIFY_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-256"] = f"sha256={digest}"
+        try:
+            response = await self.client.post(url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            return f"{type(e).__name__}: {e}"
+        if response.status_code >= 300:
+            return f"HTTP {response.status_code}"
+        return None
+
+    async def _deliver_webhooks(self, rows: List[Dict]) -> Dict[int, Optional[str]]:
+        by_url: Dict[str, List[Dict]] = {}
+        for row in rows:
+            by_url.setdefault(row["target"], []).append(row)
+
+        async def deliver(url: str, batch: List[Dict]) -> Dict[int, Optional[str]]:
+            started = time.perf_counter()
+            error = await self.post_webhook(url, batch)
+            NOTIFICATION_LATENCY.observe(time.perf_counter() - started, "webhook")
+            return {row["id"]: error for row in batch}
+
+        results: Dict[int, Optional[str]] = {}
+        for outcome in await asyncio.gather(*(deliver(url, batch) for url, batch in by_url.items())):
+            results.update(outcome)
+        return results
+
+    async def _deliver_emails(self, rows: List[Dict]) -> Dict[int, Optional[str]]:
+        results: Dict[int, Optional[str]] = {}
+        messages = []
+        for row in rows:
+            try:
+                messages.append((row["id"], render_email(row["event"], row["target"], json.loads(row["payload"]))))
+            except (KeyError, ValueError) as e:
+                results[row["id"]] = f"Cannot render {row['event']} email: {type(e).__name__}: {e}"
+        if not messages:
+            return results
+        started = time.perf_counter()
+        results.update(await run_in_threadpool(send_emails, messages))
+        NOTIFICATION_LATENCY.observe(time.perf_counter() - started, "email")
+        return results
+
+    async def dispatch_due(self) -> int:
+        """Deliver one batch of due rows; returns how many were claimed"""
+        rows = await run_in_threadpool(claim_due, self.batch_size)
+        if not rows:
+            return 0
+        emails = [row for row in rows if row["channel"] == "email"]
+        webhooks = [row for row in rows if row["channel"] == "webhook"]
+        deliveries = []
+        if emails:
+            deliveries.append((emails, self._deliver_emails(emails)))
+        if webhooks:
+            deliveries.append((webhooks, self._deliver_webhooks(webhooks)))
+        # Emails and webhooks go out side by side. An unexpected error fails
+        # its channel's rows, so they still back off and run out of attempts.
+        results: Dict[int, Optional[str]] = {}
+        outcomes = await asyncio.gather(*(delivery for _, delivery in deliveries), return_exceptions=True)
+        for (channel_rows, _), outcome in zip(deliveries, outcomes):
+            if isinstance(outcome, Exception):
+                outcome = {row["id"]: f"{type(outcome).__name__}: {outcome}" for row in channel_rows}
+            results.update(outcome)
+        for row in rows:
+            if results.get(row["id"]) is None:
+                NOTIFICATIONS_SENT.inc(row["channel"])
+            else:
+                NOTIFICATION_FAILURES.inc(row["channel"])
+        await run_in_threadpool(record_results, rows, results)
+        return len(rows)
+
+    async def run(self):
+        """Deliver due notifications as they are queued; runs until cancelled"""
+        self.start()
+        while True:
+            try:
+                self._wake.clear()
+                # A full batch means more may be due already
+                if await self.dispatch_due() >= self.batch_size:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                # Keep delivering; the rows of a failed round are retried after their lease
+                print(f"Notification dispatch failed: {type(e).__name__}: {e}")
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,99 @@
+# Keyset (cursor) pagination for the admin inbox endpoints
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, tuple_
+from sqlalchemy.orm import Session
+
+from database import archived_flag
+
+# How long a cached row count stays valid (seconds)
+COUNT_CACHE_TTL = 30
+
+_count_cache: Dict[str, Tuple[float, int]] = {}
+
+def inbox_order(model):
+    """Sort: non-archived first, then newest first, id as tie-breaker"""
+    return (archived_flag(model.status), model.created_at.desc(), model.id.desc())
+
+def encode_cursor(row) -> str:
+    """Build an opaque cursor pointing just after ``row``"""
+    key = [
+        1 if row.status == "archived" else 0,
+        row.created_at.isoformat() if row.created_at else None,
+        row.id,
+    ]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, Optional[datetime], int]:
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        archived, created_at, row_id = json.loads(raw)
+        return (
+            int(archived),
+            datetime.fromisoformat(created_at) if created_at else None,
+            int(row_id),
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def after_cursor(model, key: Tuple[int, Optional[datetime], int]) -> List[Tuple]:
+    """Split the rows sorting strictly after ``key`` in ``inbox_order`` into segments.
+
+    Returns ``(filter, order)`` pairs in sort order. Each one is a single seek
+    on the inbox index: the rest of the cursor's timestamp run, then the rest
+    of its archived group, then every later group from its start. An OR of
+    the three would make the database scan the index instead.
+    """
+    archived, created_at, row_id = key
+    flag = archived_flag(model.status)
+    # The flag is fixed within a group; ordering by it there costs a sort
+    in_group = (model.created_at.desc(), model.id.desc())
+    segments = []
+    if created_at is not None:
+        segments.append((
+            and_(flag == archived, tuple_(model.created_at, model.id) < tuple_(created_at, row_id)),
+            in_group,
+        ))
+        # Rows without a timestamp sort last within their archived group
+        segments.append((and_(flag == archived, model.created_at.is_(None)), in_group))
+    else:
+        segments.append((and_(flag == archived, model.created_at.is_(None), model.id < row_id), in_group))
+    segments.append((flag > archived, inbox_order(model)))
+    return segments
+
+def keyset_page(query, model, cursor: str, limit: int) -> Tuple[List, Optional[str]]:
+    """Fetch one page after ``cursor`` (empty string = first page).
+
+    Returns the rows and the cursor for the next page, or None on the last page.
+    """
+    limit = max(limit, 1)
+    if cursor:
+        segments = after_cursor(model, decode_cursor(cursor))
+    else:
+        segments = [(None, inbox_order(model))]
+    rows = []
+    for condition, order in segments:
+        segment = query if condition is None else query.filter(condition)
+        rows.extend(segment.order_by(*order).limit(limit + 1 - len(rows)).all())
+        if len(rows) > limit:
+            break
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def cached_count(db: Session, model) -> int:
+    """Row count of ``model``'s table, cached for COUNT_CACHE_TTL seconds"""
+    key = model.__tablename__
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = db.query(func.count(model.id)).scalar()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
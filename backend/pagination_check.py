@@ -0,0 +1,147 @@
+"""Query plan and timing check for the inbox keyset pagination
+
+Run from the backend directory:
+
+    python pagination_check.py
+
+Seeds a scratch SQLite database with contact messages (archived rows, shared
+timestamps and rows without one included), then checks that:
+
+- walking every page by cursor returns exactly the rows of the full sort,
+- every query keyset_page issues is a seek on the inbox index, without a
+  sort step,
+- a page deep into the inbox costs about as much as the first one.
+
+Prints the timings and exits with status 1 on any problem.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# The engine is configured on import, so this comes before the app modules
+workdir = Path(tempfile.mkdtemp(prefix="pagination-check-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'inbox.db'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects import sqlite
+
+from database import ContactMessage, SessionLocal, engine
+from pagination import after_cursor, decode_cursor, encode_cursor, inbox_order, keyset_page
+from schema import ensure_schema
+
+ROWS = 40_000
+PAGE_SIZE = 20
+WALK_PAGE_SIZE = 500
+TIMING_RUNS = 50
+# A deep page may cost this much more than the first one before it counts as a regression
+MAX_DEEP_RATIO = 3.0
+INDEX = "ix_contact_messages_inbox"
+
+def seed():
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    statuses = ["unread", "read", "replied", "archived"]
+    rows = []
+    for n in range(ROWS):
+        # Minute resolution so plenty of rows share a timestamp
+        created_at = None if rng.random() < 0.02 else start + timedelta(minutes=rng.randrange(ROWS // 4))
+        rows.append({
+            "name": f"Sender {n}",
+            "email": f"sender{n}@example.com",
+            "subject": "Hello",
+            "message": "Pagination check",
+            "language": "en",
+            "status": rng.choice(statuses),
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(ContactMessage.__table__), rows)
+        conn.execute(text("ANALYZE"))
+
+def segment_queries(db, cursor):
+    """The statements keyset_page runs for ``cursor`` when no segment fills the page"""
+    if cursor:
+        segments = after_cursor(ContactMessage, decode_cursor(cursor))
+    else:
+        segments = [(None, inbox_order(ContactMessage))]
+    for condition, order in segments:
+        query = db.query(ContactMessage)
+        if condition is not None:
+            query = query.filter(condition)
+        yield query.order_by(*order).limit(PAGE_SIZE + 1).statement
+
+def query_plan(conn, statement):
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+def timed(fn):
+    samples = []
+    for _ in range(TIMING_RUNS):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+def main() -> int:
+    problems = []
+    try:
+        ensure_schema()
+        seed()
+        with SessionLocal() as db:
+            expected = [row.id for row in db.query(ContactMessage).order_by(*inbox_order(ContactMessage))]
+
+            walked, cursor = [], ""
+            while cursor is not None:
+                rows, cursor = keyset_page(db.query(ContactMessage), ContactMessage, cursor, WALK_PAGE_SIZE)
+                walked.extend(row.id for row in rows)
+            if walked != expected:
+                problems.append(f"cursor walk returned {len(walked)} rows out of order or incomplete, expected {len(expected)}")
+
+            by_id = {row.id: row for row in db.query(ContactMessage)}
+            # First page, the middle of the open messages, the undated tail of a
+            # group and a page deep into the archive
+            probes = {"first": ""}
+            undated = [n for n, row_id in enumerate(expected) if by_id[row_id].created_at is None]
+            probes["middle"] = encode_cursor(by_id[expected[len(expected) // 3]])
+            probes["undated"] = encode_cursor(by_id[expected[undated[0]]])
+            probes["deep"] = encode_cursor(by_id[expected[-PAGE_SIZE * 2]])
+
+            with engine.connect() as conn:
+                for name, cursor in probes.items():
+                    for statement in segment_queries(db, cursor):
+                        plan = query_plan(conn, statement)
+                        if not any(f"USING INDEX {INDEX}" in step for step in plan) or any("TEMP B-TREE" in step for step in plan):
+                            problems.append(f"{name} page: not an index seek: {plan}")
+
+            def page(cursor):
+                return lambda: keyset_page(db.query(ContactMessage), ContactMessage, cursor, PAGE_SIZE)
+
+            first = timed(page(probes["first"]))
+            deep = timed(page(probes["deep"]))
+            offset = timed(lambda: db.query(ContactMessage).order_by(*inbox_order(ContactMessage))
+                           .offset(len(expected) - PAGE_SIZE * 2).limit(PAGE_SIZE).all())
+            print(f"first page {first:.2f} ms, deep cursor page {deep:.2f} ms, same page by offset {offset:.2f} ms")
+            if deep > first * MAX_DEEP_RATIO:
+                problems.append(f"deep page took {deep / first:.1f}x the first page")
+    finally:
+        engine.dispose()
+        for path in workdir.iterdir():
+            path.unlink()
+        workdir.rmdir()
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print(f"OK: {ROWS} rows, every page is an index seek")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+# Resumable chunked uploads for large videos
+#
+# Protocol:
+#   1. POST   /api/upload/video/sessions               -> session id, chunk size, chunk count
+#   2. PUT    /api/upload/video/sessions/{id}/chunks/{n} (any order, in parallel,
+#             optional X-Chunk-SHA256 header checked against the received bytes)
+#   3. GET    /api/upload/video/sessions/{id}          -> received chunks and resume offset
+#   4. POST   /api/upload/video/sessions/{id}/complete -> final file in VIDEOS_DIR
+#
+# Each chunk is written straight to its offset in one preallocated file, and
+# completing a session renames it, never copies it. The file's SHA-256 is kept
+# running as chunks arrive: the next chunk in order is hashed while it streams
+# in, and chunks that came early are read back once the ones before them are
+# there. Completing only reads what the completing worker process hasn't
+# hashed yet. Videos therefore get the same content-addressed name as
+# single-shot uploads and the two deduplicate against each other.
+#
+# Chunk writes hold a shared flock on the session's meta.json and complete /
+# abort an exclusive one, so a session is never moved away under a chunk
+# that is still being written, whichever worker process handles each request.
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from media import safe_extension
+
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Sessions without activity for this long are deleted (seconds)
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))
+
+# How often abandoned sessions are collected (seconds)
+UPLOAD_SESSION_GC_INTERVAL = 3600
+
+# Sessions open at once, in total and per client address
+MAX_UPLOAD_SESSIONS = int(os.getenv("MAX_UPLOAD_SESSIONS", 200))
+MAX_UPLOAD_SESSIONS_PER_CLIENT = int(os.getenv("MAX_UPLOAD_SESSIONS_PER_CLIENT", 10))
+
+# Received bytes are buffered up to this size before each disk write, and
+# completed files are hashed in blocks of this size
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class UploadSessions:
+    """Upload sessions kept on disk, so every worker process can serve any chunk"""
+
+    def __init__(self, directory: Path, destination: Path, max_size: int):
+        self.directory = directory
+        self.destination = destination
+        self.max_size = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Session id -> SHA-256 over the leading chunks this process has hashed
+        # and those chunks' digests. hashlib state can't be saved to disk, so
+        # it lives here; the digests match it against the chunk markers.
+        self._prefix_hashes: Dict[str, Tuple[object, List[str]]] = {}
+        self._prefix_lock = threading.Lock()
+        self._catching_up = set()
+
+    def _session_dir(self, session_id: str) -> Path:
+        if not SESSION_ID.match(session_id):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        path = self.directory / session_id
+        if not (path / "meta.json").exists():
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return path
+
+    @staticmethod
+    def _read_meta(path: Path) -> Dict:
+        with open(path / "meta.json") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _lock(path: Path, exclusive: bool):
+        """Open and flock the session's meta.json without blocking.
+
+        Raises 409 when the session is busy and 404 when it was completed or
+        aborted in the meantime; the lock is released by closing the file.
+        """
+        try:
+            lock_file = open(path / "meta.json")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        try:
+            fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            detail = "Chunks are still being uploaded" if exclusive else "Upload session is being completed"
+            raise HTTPException(status_code=409, detail=detail)
+        if not (path / "meta.json").exists():
+            lock_file.close()
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return lock_file
+
+    def _open_sessions(self) -> List[Dict]:
+        sessions = []
+        for path in self.directory.iterdir():
+            try:
+                sessions.append(self._read_meta(path))
+            except (OSError, ValueError):
+                # Not a session, or one being created or removed
+                continue
+        return sessions
+
+    @staticmethod
+    def _received(path: Path) -> Dict[int, str]:
+        """Chunk index -> hex digest for every fully written chunk"""
+        received = {}
+        for marker in (path / "chunks").iterdir():
+            if marker.name.isdigit():
+                received[int(marker.name)] = marker.read_text()
+        return received
+
+    def _prefix_hash(self, session_id: str, index: int):
+        """A copy of the running file hash if chunk ``index`` extends it, else None"""
+        with self._prefix_lock:
+            hasher, digests = self._prefix_hashes.get(session_id, (None, []))
+            if len(digests) != index:
+                return None
+            return hasher.copy() if hasher else hashlib.sha256()
+
+    def _extend_prefix_hash(self, session_id: str, index: int, hasher, digest: str):
+        with self._prefix_lock:
+            _, digests = self._prefix_hashes.get(session_id, (None, []))
+            # A parallel upload of the same chunk may have got here first
+            if len(digests) == index:
+                self._prefix_hashes[session_id] = (hasher, digests + [digest])
+
+    def _catch_up(self, session_id: str, path: Path, meta: Dict):
+        """Extend the running file hash over the chunks after it that are already
+        on disk, i.e. arrived out of order or before this process had a hash"""
+        with self._prefix_lock:
+            if session_id in self._catching_up:
+                return
+            self._catching_up.add(session_id)
+        try:
+            with open(path / "data", "rb") as f:
+                while True:
+                    with self._prefix_lock:
+                        hasher, digests = self._prefix_hashes.get(session_id, (None, []))
+                    index = len(digests)
+                    if index == meta["total_chunks"]:
+                        break
+                    try:
+                        expected = (path / "chunks" / str(index)).read_text()
+                    except FileNotFoundError:
+                        break
+                    file_hasher = hasher.copy() if hasher else hashlib.sha256()
+                    chunk_hasher = hashlib.sha256()
+                    f.seek(index * meta["chunk_size"])
+                    remaining = self._chunk_length(meta, index)
+                    while remaining:
+                        block = f.read(min(WRITE_BUFFER_SIZE, remaining))
+                        if not block:
+                            break
+                        chunk_hasher.update(block)
+                        file_hasher.update(block)
+                        remaining -= len(block)
+                    if remaining or chunk_hasher.hexdigest() != expected:
+                        # Being rewritten; completing will hash it from disk
+                        break
+                    self._extend_prefix_hash(session_id, index, file_hasher, expected)
+        finally:
+            with self._prefix_lock:
+                self._catching_up.discard(session_id)
+
+    def _take_prefix_hash(self, session_id: str, received: Dict[int, str]):
+        """The running file hash and how many chunks it covers. It only counts
+        while its chunks are still the ones on disk; a chunk rewritten since
+        (possibly by another process) has a different marker."""
+        with self._prefix_lock:
+            hasher, digests = self._prefix_hashes.pop(session_id, (None, []))
+        if hasher is None or any(received[i] != digest for i, digest in enumerate(digests)):
+            return hashlib.sha256(), 0
+        return hasher, len(digests)
+
+    def _chunk_length(self, meta: Dict, index: int) -> int:
+        if index == meta["total_chunks"] - 1:
+            return meta["size"] - index * meta["chunk_size"]
+        return meta["chunk_size"]
+
+    def _create(self, filename: str, size: int, content_type: Optional[str], client: Optional[str]) -> Dict:
+        # Counting and creating under one lock keeps the limits exact across workers
+        with open(self.directory / "create.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            sessions = self._open_sessions()
+            if len(sessions) >= MAX_UPLOAD_SESSIONS:
+                raise HTTPException(status_code=429, detail="Too many uploads in progress, try again later")
+            if client and sum(1 for meta in sessions if meta.get("client") == client) >= MAX_UPLOAD_SESSIONS_PER_CLIENT:
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"At most {MAX_UPLOAD_SESSIONS_PER_CLIENT} uploads in progress per client"
+                )
+            return self._create_session(filename, size, content_type, client)
+
+    def _create_session(self, filename: str, size: int, content_type: Optional[str], client: Optional[str]) -> Dict:
+        session_id = uuid.uuid4().hex
+        path = self.directory / session_id
+        (path / "chunks").mkdir(parents=True)
+        # Preallocate (sparsely) so chunks can be written at any offset
+        with open(path / "data", "wb") as f:
+            f.truncate(size)
+
+        meta = {
+            "session_id": session_id,
+            "filename": filename,
+            "extension": safe_extension(filename),
+            "content_type": content_type,
+            "size": size,
+            "chunk_size": RESUMABLE_CHUNK_SIZE,
+            "total_chunks": max(1, -(-size // RESUMABLE_CHUNK_SIZE)),
+            "created_at": time.time(),
+        }
+        with open(path / "meta.json", "w") as f:
+            json.dump({**meta, "client": client}, f)
+        return meta
+
+    async def create(self, filename: str, size: int, content_type: Optional[str] = None,
+                     client: Optional[str] = None) -> Dict:
+        """Start a session; ``client`` (the client's address) is counted
+        against MAX_UPLOAD_SESSIONS_PER_CLIENT"""
+        if size < 1:
+            raise HTTPException(status_code=400, detail="Size must be positive")
+        if size > self.max_size:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {self.max_size} byte limit")
+        return await run_in_threadpool(self._create, filename, size, content_type, client)
+
+    def _status(self, session_id: str) -> Dict:
+        path = self._session_dir(session_id)
+        meta = self._read_meta(path)
+        received = sorted(self._received(path))
+        meta.pop("client", None)
+
+        # Bytes that can be skipped when resuming sequentially
+        contiguous = 0
+        while contiguous < len(received) and received[contiguous] == contiguous:
+            contiguous += 1
+        return {
+            **meta,
+            "received_chunks": received,
+            "missing_chunks": meta["total_chunks"] - len(received),
+            "offset": min(contiguous * meta["chunk_size"], meta["size"]),
+        }
+
+    async def status(self, session_id: str) -> Dict:
+        return await run_in_threadpool(self._status, session_id)
+
+    async def write_chunk(self, session_id: str, index: int, body: AsyncIterator[bytes],
+                          expected_sha256: Optional[str] = None) -> Dict:
+        """Stream one chunk from ``body`` into place, verifying its length and checksum"""
+        path = await run_in_threadpool(self._session_dir, session_id)
+        meta = await run_in_threadpool(self._read_meta, path)
+        if not 0 <= index < meta["total_chunks"]:
+            raise HTTPException(status_code=400, detail=f"Chunk index must be 0-{meta['total_chunks'] - 1}")
+
+        expected_length = self._chunk_length(meta, index)
+        offset = index * meta["chunk_size"]
+        hasher = hashlib.sha256()
+        # Also fed to the whole-file hash when this is the next chunk it needs
+        file_hasher = self._prefix_hash(session_id, index)
+        hashers = [hasher, file_hasher] if file_hasher else [hasher]
+        written = 0
+        buffer = bytearray()
+
+        lock_file = await run_in_threadpool(self._lock, path, False)
+        try:
+            # A rewritten chunk stops counting until its new bytes are verified
+            await run_in_threadpool(_remove_marker, path / "chunks", index)
+            fd = await run_in_threadpool(os.open, path / "data", os.O_WRONLY)
+            try:
+                async for piece in body:
+                    if written + len(buffer) + len(piece) > expected_length:
+                        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected_length} bytes")
+                    buffer += piece
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        data = bytes(buffer)
+                        buffer.clear()
+                        await run_in_threadpool(_hash_and_write, fd, hashers, data, offset + written)
+                        written += len(data)
+                if buffer:
+                    data = bytes(buffer)
+                    await run_in_threadpool(_hash_and_write, fd, hashers, data, offset + written)
+                    written += len(data)
+            finally:
+                await run_in_threadpool(os.close, fd)
+
+            if written != expected_length:
+                raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected_length} bytes")
+            digest = hasher.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != digest:
+                raise HTTPException(status_code=422, detail=f"Checksum mismatch for chunk {index}")
+
+            # The marker is written last, so a chunk only counts once all its bytes are on disk
+            await run_in_threadpool(_write_marker, path / "chunks", index, digest)
+            if file_hasher:
+                self._extend_prefix_hash(session_id, index, file_hasher, digest)
+            await run_in_threadpool(self._catch_up, session_id, path, meta)
+        finally:
+            lock_file.close()
+        return {"index": index, "size": written, "sha256": digest}
+
+    def _complete(self, session_id: str) -> Dict:
+        path = self._session_dir(session_id)
+        with self._lock(path, exclusive=True):
+            meta = self._read_meta(path)
+            received = self._received(path)
+            missing = [i for i in range(meta["total_chunks"]) if i not in received]
+            if missing:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"{len(missing)} chunks missing, first missing chunk is {missing[0]}"
+                )
+
+            hasher, hashed_chunks = self._take_prefix_hash(session_id, received)
+            with open(path / "data", "rb") as f:
+                f.seek(hashed_chunks * meta["chunk_size"])
+                for block in iter(lambda: f.read(WRITE_BUFFER_SIZE), b""):
+                    hasher.update(block)
+            digest = hasher.hexdigest()
+            extension = meta["extension"]
+            target = self.destination / (f"{digest}.{extension}" if extension else digest)
+
+            duplicate = target.exists()
+            if not duplicate:
+                os.replace(path / "data", target)
+            shutil.rmtree(path, ignore_errors=True)
+        return {
+            "filename": target.name,
+            "sha256": digest,
+            "size": meta["size"],
+            "duplicate": duplicate
+        }
+
+    async def complete(self, session_id: str) -> Dict:
+        return await run_in_threadpool(self._complete, session_id)
+
+    def _abort(self, session_id: str):
+        path = self._session_dir(session_id)
+        with self._lock(path, exclusive=True):
+            shutil.rmtree(path, ignore_errors=True)
+        with self._prefix_lock:
+            self._prefix_hashes.pop(session_id, None)
+
+    async def abort(self, session_id: str):
+        await run_in_threadpool(self._abort, session_id)
+
+    def collect_garbage(self) -> int:
+        """Delete sessions with no activity for UPLOAD_SESSION_TTL; returns how many"""
+        cutoff = time.time() - UPLOAD_SESSION_TTL
+        removed = 0
+        for path in self.directory.iterdir():
+            if not path.is_dir():
+                continue
+            chunks = path / "chunks"
+            last_activity = max(
+                (p.stat().st_mtime for p in [path, chunks] if p.exists()),
+                default=0
+            )
+            if last_activity < cutoff:
+                if not (path / "meta.json").exists():
+                    # Left behind by a failed create
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+                    continue
+                try:
+                    with self._lock(path, exclusive=True):
+                        shutil.rmtree(path, ignore_errors=True)
+                except HTTPException:
+                    # Busy again, or already gone
+                    continue
+                removed += 1
+        # Sessions completed, aborted or collected by any process
+        with self._prefix_lock:
+            for session_id in list(self._prefix_hashes):
+                if not (self.directory / session_id / "meta.json").exists():
+                    del self._prefix_hashes[session_id]
+        return removed
+
+    async def run_garbage_collector(self):
+        """Periodically collect abandoned sessions; runs until cancelled"""
+        while True:
+            removed = await run_in_threadpool(self.collect_garbage)
+            if removed:
+                print(f"Removed {removed} abandoned upload sessions")
+            await asyncio.sleep(UPLOAD_SESSION_GC_INTERVAL)
+
+def _hash_and_write(fd: int, hashers: List, data: bytes, offset: int):
+    for hasher in hashers:
+        hasher.update(data)
+    view = memoryview(data)
+    while view:
+        count = os.pwrite(fd, view, offset)
+        view = view[count:]
+        offset += count
+
+def _remove_marker(chunks_dir: Path, index: int):
+    try:
+        (chunks_dir / str(index)).unlink()
+    except FileNotFoundError:
+        pass
+
+def _write_marker(chunks_dir: Path, index: int, digest: str):
+    temp = chunks_dir / f".{index}.{uuid.uuid4().hex}"
+    temp.write_text(digest)
+    os.replace(temp, chunks_dir / str(index))
@@ -0,0 +1,141 @@
+# Schema version check for startup; Alembic (migrations/) does the migrating
+#
+# A booted app only reads the alembic_version stamp. Alembic is imported and
+# run only when the stamp is missing or behind, e.g. on first boot or after
+# a deploy that ships a new migration. With several workers, run
+# ``alembic upgrade head`` once before starting them.
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+
+from database import Base, engine
+
+# Head of migrations/versions; bump it with every new migration
+SCHEMA_REVISION = "0005"
+
+# What create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+def current_revision(conn) -> Optional[str]:
+    """Revision stamped in the database, or None if it was never stamped"""
+    if not inspect(conn).has_table("alembic_version"):
+        return None
+    return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+def alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.attributes["connection"] = connection
+    # Leave the app's logging alone
+    config.attributes["configure_logger"] = False
+    return config
+
+class _MissingOnly:
+    """Stands in for ``alembic.op`` while the baseline migration runs on a
+    legacy database: creates only the tables and indexes that are missing"""
+
+    def __init__(self, conn):
+        from alembic.migration import MigrationContext
+        from alembic.operations import Operations
+
+        self.ops = Operations(MigrationContext.configure(conn))
+        self.conn = conn
+        self.tables = set(inspect(conn).get_table_names())
+        self.table = None
+
+    def f(self, name):
+        return self.ops.f(name)
+
+    def create_table(self, name, *columns, **kw):
+        if name not in self.tables:
+            self.ops.create_table(name, *columns, **kw)
+
+    @contextmanager
+    def batch_alter_table(self, table, **kw):
+        # The baseline only adds indexes in these blocks; no table rebuild needed
+        self.table = table
+        try:
+            yield self
+        finally:
+            self.table = None
+
+    def create_index(self, name, columns, **kw):
+        if name not in index_names(self.conn, self.table):
+            self.ops.create_index(name, self.table, columns, **kw)
+
+def complete_baseline(conn):
+    """Bring a database created by create_all before migrations existed up to
+    the baseline, by running the baseline migration for whatever it lacks.
+
+    Only baseline columns and indexes are created; anything added later is
+    left to the migration that adds it.
+    """
+    from alembic.script import ScriptDirectory
+
+    module = ScriptDirectory.from_config(alembic_config()).get_revision(BASELINE_REVISION).module
+    op = module.op
+    module.op = _MissingOnly(conn)
+    try:
+        module.upgrade()
+    finally:
+        module.op = op
+
+def index_names(conn, table: str) -> set:
+    if conn.dialect.name == "sqlite":
+        # The SQLite inspector leaves out expression indexes
+        return set(conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {"table": table}
+        ).scalars())
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+def schema_problems(conn) -> List[str]:
+    """Tables, columns and indexes of the models that the database lacks"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    problems = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            problems.append(f"missing table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems.extend(f"missing column {table.name}.{column.name}" for column in table.columns if column.name not in columns)
+        indexes = index_names(conn, table.name)
+        problems.extend(f"missing index {index.name}" for index in table.indexes if index.name not in indexes)
+    return problems
+
+def migrate(revision: Optional[str]):
+    from alembic import command
+
+    with engine.begin() as conn:
+        config = alembic_config(conn)
+        # Created by create_all before migrations existed: complete it and
+        # adopt it at the baseline so later migrations still run
+        if revision is None and inspect(conn).has_table("contact_messages"):
+            complete_baseline(conn)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+def ensure_schema() -> bool:
+    """Migrate the database if its stamp isn't SCHEMA_REVISION.
+
+    Returns True if anything ran, so callers can limit one-off work (seeding,
+    backfills) to boots that changed the schema.
+    """
+    with engine.connect() as conn:
+        revision = current_revision(conn)
+    if revision == SCHEMA_REVISION:
+        return False
+
+    print(f"Database schema at {revision or 'no revision'}, migrating to {SCHEMA_REVISION}")
+    migrate(revision)
+    with engine.connect() as conn:
+        for problem in schema_problems(conn):
+            print(f"Database schema warning: {problem}")
+    return True
@@ -0,0 +1,74 @@
+"""Upgrade check for databases created before migrations existed
+
+Run from the backend directory:
+
+    python schema_check.py
+
+Builds a scratch SQLite database the way create_all did before Alembic:
+the baseline schema without a stamp, missing the tables and indexes that
+were added last. It then runs the startup schema check on it and verifies
+that the stamp is at the head, that every column and index of the models
+exists and that the existing rows survived. Exits with status 1 on any
+problem.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The engine is configured on import, so this comes before the app modules
+workdir = Path(tempfile.mkdtemp(prefix="schema-check-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'legacy.db'}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from alembic import command
+from sqlalchemy import text
+
+from database import engine
+from schema import BASELINE_REVISION, SCHEMA_REVISION, alembic_config, current_revision, ensure_schema, schema_problems
+
+# Added to the models shortly before migrations were introduced, so older
+# create_all databases don't have them
+LEGACY_MISSING_TABLES = ["order_items", "revoked_tokens", "kv_entries"]
+LEGACY_MISSING_INDEXES = ["ix_contact_messages_inbox", "ix_virtual_tours_inbox"]
+
+def build_legacy_database():
+    with engine.begin() as conn:
+        command.upgrade(alembic_config(conn), BASELINE_REVISION)
+        conn.execute(text("DROP TABLE alembic_version"))
+        for table in LEGACY_MISSING_TABLES:
+            conn.execute(text(f"DROP TABLE {table}"))
+        for index in LEGACY_MISSING_INDEXES:
+            conn.execute(text(f"DROP INDEX {index}"))
+        conn.execute(text(
+            "INSERT INTO contact_messages (name, email, subject, message, language, status, created_at, updated_at) "
+            "VALUES ('Legacy', 'legacy@example.com', 'Hello', 'From before migrations', 'en', 'unread', "
+            "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+        ))
+
+def main() -> int:
+    try:
+        build_legacy_database()
+        ensure_schema()
+        with engine.connect() as conn:
+            problems = schema_problems(conn)
+            revision = current_revision(conn)
+            if revision != SCHEMA_REVISION:
+                problems.append(f"stamped at {revision}, expected {SCHEMA_REVISION}")
+            if conn.execute(text("SELECT COUNT(*) FROM contact_messages WHERE email = 'legacy@example.com'")).scalar() != 1:
+                problems.append("existing contact message lost")
+    finally:
+        engine.dispose()
+        for path in workdir.iterdir():
+            path.unlink()
+        workdir.rmdir()
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print(f"OK: legacy database upgraded to {SCHEMA_REVISION}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
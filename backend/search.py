@@ -0,0 +1,154 @@
+# Full-text search across contact messages, tour requests and orders
+#
+# SQLite queries the FTS5 table from migration 0002 and MySQL the FULLTEXT
+# indexes from the same migration. Either way, one query returns ranked hits
+# for all three kinds, with matched terms highlighted.
+
+import html
+import re
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import DateTime, Float, Integer, String, text
+from sqlalchemy.orm import Session
+
+# Kind codes; on SQLite a search_index rowid is ``id * 4 + code``
+KINDS = {"contact": 1, "tour": 2, "order": 3}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+FIELDS = ("name", "email", "company", "subject", "body")
+
+# bm25 weight per field, in FIELDS order
+FIELD_WEIGHTS = (3.0, 2.0, 4.0, 2.0, 1.0)
+
+# Searchable source columns per kind, in FIELDS order (None: no such field)
+SOURCE_COLUMNS = {
+    "contact": ("contact_messages", ("name", "email", "company", "subject", "message")),
+    "tour": ("virtual_tours", ("name", "email", "company", None, "message")),
+    "order": ("orders", ("customer_name", "customer_email", "customer_company", "order_number", "notes")),
+}
+
+MAX_QUERY_TERMS = 8
+
+# Words of context kept around a match in the body snippet
+SNIPPET_WORDS = 16
+
+# Placeholders the database puts around matches; swapped for <mark> after escaping
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+TERM = re.compile(r"\w+")
+
+RESULT_COLUMNS = dict(
+    kind=Integer, id=Integer, score=Float, status=String, created_at=DateTime,
+    **{field: String for field in FIELDS}
+)
+
+def query_terms(query: str) -> List[str]:
+    """Words of a user query; punctuation and operators are dropped"""
+    return TERM.findall(query.lower())[:MAX_QUERY_TERMS]
+
+def _sqlite_search(db: Session, terms: List[str], kinds: Sequence[str], limit: int, offset: int):
+    weights = ", ".join(str(w) for w in FIELD_WEIGHTS)
+    highlights = ",\n".join(
+        f"highlight(search_index, {i}, :mark_start, :mark_end) AS {field}"
+        for i, field in enumerate(FIELDS[:-1])
+    )
+    codes = ", ".join(str(KINDS[kind]) for kind in kinds)
+    statement = text(f"""
+        SELECT s.rowid % 4 AS kind, s.rowid / 4 AS id,
+               -bm25(search_index, {weights}) AS score,
+               {highlights},
+               snippet(search_index, {len(FIELDS) - 1}, :mark_start, :mark_end, '…', {SNIPPET_WORDS}) AS body,
+               COALESCE(c.status, t.status, o.status) AS status,
+               COALESCE(c.created_at, t.created_at, o.created_at) AS created_at
+        FROM search_index AS s
+        LEFT JOIN contact_messages AS c ON s.rowid % 4 = 1 AND c.id = s.rowid / 4
+        LEFT JOIN virtual_tours AS t ON s.rowid % 4 = 2 AND t.id = s.rowid / 4
+        LEFT JOIN orders AS o ON s.rowid % 4 = 3 AND o.id = s.rowid / 4
+        WHERE search_index MATCH :query AND s.rowid % 4 IN ({codes})
+        ORDER BY bm25(search_index, {weights})
+        LIMIT :limit OFFSET :offset
+    """).columns(**RESULT_COLUMNS)
+    # Every term must match, each as a word prefix
+    match = " ".join(f'"{term}"*' for term in terms)
+    return db.execute(statement, {
+        "query": match, "mark_start": MARK_START, "mark_end": MARK_END,
+        "limit": limit, "offset": offset,
+    }).mappings().all()
+
+def _mysql_search(db: Session, terms: List[str], kinds: Sequence[str], limit: int, offset: int):
+    selects = []
+    for kind in kinds:
+        table, columns = SOURCE_COLUMNS[kind]
+        indexed = ", ".join(c for c in columns if c)
+        fields = ", ".join(f"{c or 'NULL'} AS {field}" for field, c in zip(FIELDS, columns))
+        match = f"MATCH({indexed}) AGAINST (:query IN BOOLEAN MODE)"
+        selects.append(
+            f"SELECT {KINDS[kind]} AS kind, id, {match} AS score, {fields}, status, created_at "
+            f"FROM {table} WHERE {match}"
+        )
+    statement = text(
+        f"SELECT * FROM ({' UNION ALL '.join(selects)}) AS hits "
+        f"ORDER BY score DESC LIMIT :limit OFFSET :offset"
+    ).columns(**RESULT_COLUMNS)
+    match = " ".join(f"+{term}*" for term in terms)
+    rows = db.execute(statement, {"query": match, "limit": limit, "offset": offset}).mappings().all()
+
+    # FULLTEXT has no highlighting, so mark the matches here
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+    marked = []
+    for row in rows:
+        row = dict(row)
+        for field in FIELDS[:-1]:
+            if row[field]:
+                row[field] = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, row[field])
+        if row["body"]:
+            row["body"] = _snippet(row["body"], pattern)
+        marked.append(row)
+    return marked
+
+def _snippet(body: str, pattern) -> str:
+    """About SNIPPET_WORDS words of ``body`` around its first match, matches marked"""
+    words = body.split()
+    first = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(0, first - SNIPPET_WORDS // 4)
+    window = " ".join(words[start:start + SNIPPET_WORDS])
+    window = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, window)
+    return ("…" if start > 0 else "") + window + ("…" if start + SNIPPET_WORDS < len(words) else "")
+
+def _render(value):
+    """HTML-escape a field and turn the match placeholders into <mark> tags"""
+    if value is None:
+        return None
+    return html.escape(value).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+def search(db: Session, query: str, kinds: Sequence[str], limit: int, offset: int) -> Tuple[List[Dict], bool]:
+    """Ranked hits for ``query`` among ``kinds``, best first, and whether more follow.
+
+    Raises ValueError if the query has no searchable words and
+    NotImplementedError on databases without a search index.
+    """
+    terms = query_terms(query)
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        rows = _sqlite_search(db, terms, kinds, limit + 1, offset)
+    elif dialect == "mysql":
+        rows = _mysql_search(db, terms, kinds, limit + 1, offset)
+    else:
+        raise NotImplementedError(f"Search is not available on {dialect}")
+
+    hits = [
+        {
+            "type": KIND_NAMES[row["kind"]],
+            "id": row["id"],
+            "score": row["score"],
+            "status": row["status"],
+            "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+            "highlights": {field: _render(row[field]) for field in FIELDS if row[field]},
+        }
+        for row in rows[:limit]
+    ]
+    return hits, len(rows) > limit
@@ -1,7 +1,6 @@
 #!/bin/bash
+# Dependencies are installed when the image is built (see Dockerfile), and
+# the app migrates the database itself when its schema stamp is behind.
 echo "Starting backend server..."
 echo "PORT: ${PORT:-8000}"
-echo "Installing dependencies..."
-pip install -r requirements.txt
-echo "Starting uvicorn..."
-uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000}
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000}
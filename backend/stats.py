@@ -0,0 +1,83 @@
+# Dashboard counts per status, read from the status_counters table
+#
+# Triggers from migration 0003 keep the counters current inside every
+# writing transaction, so reading them costs the same at any table size.
+# reconcile_status_counts recounts the source tables and repairs drift
+# (e.g. rows changed while the triggers were missing).
+
+import asyncio
+import os
+from typing import Dict
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, StatusCounter, ContactMessage, VirtualTour, Order
+
+STATUS_MODELS = {
+    "contact": ContactMessage,
+    "tour": VirtualTour,
+    "order": Order,
+}
+
+# How often the counters are checked against the source tables (seconds)
+STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", 6 * 3600))
+
+def read_status_counts(db: Session) -> Dict[str, Dict]:
+    """Counts per status for every kind, plus a total per kind"""
+    stats = {
+        kind: {"total": 0, "by_status": {status: 0 for status in model.status.type.enums}}
+        for kind, model in STATUS_MODELS.items()
+    }
+    for counter in db.execute(select(StatusCounter)).scalars():
+        if counter.kind in stats:
+            stats[counter.kind]["by_status"][counter.status] = counter.count
+            stats[counter.kind]["total"] += counter.count
+    return stats
+
+def reconcile_status_counts(db: Session) -> Dict[str, Dict[str, int]]:
+    """Recount every source table and fix counters that drifted.
+
+    Returns the corrections applied as {kind: {status: delta}}.
+    """
+    # Concurrent writes must wait until the repaired counts are committed,
+    # or the recount would overwrite their trigger increments
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite ignores FOR UPDATE: take the database write lock up front
+        db.execute(text("BEGIN IMMEDIATE"))
+    counters = {
+        (counter.kind, counter.status): counter
+        for counter in db.execute(select(StatusCounter).with_for_update()).scalars()
+    }
+    corrections: Dict[str, Dict[str, int]] = {}
+    for kind, model in STATUS_MODELS.items():
+        actual = dict(db.execute(
+            select(model.status, func.count()).where(model.status.isnot(None)).group_by(model.status)
+        ).all())
+        for status in model.status.type.enums:
+            count = actual.get(status, 0)
+            counter = counters.get((kind, status))
+            if counter is None:
+                counter = StatusCounter(kind=kind, status=status, count=0)
+                db.add(counter)
+            if counter.count != count:
+                corrections.setdefault(kind, {})[status] = count - counter.count
+                counter.count = count
+    db.commit()
+    return corrections
+
+def reconcile() -> Dict[str, Dict[str, int]]:
+    with SessionLocal() as db:
+        return reconcile_status_counts(db)
+
+async def run_reconciler():
+    """Reconcile every STATS_RECONCILE_INTERVAL seconds; runs until cancelled"""
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+        try:
+            corrections = await run_in_threadpool(reconcile)
+            if corrections:
+                print(f"Status counters repaired: {corrections}")
+        except Exception as e:
+            print(f"Status counter reconciliation failed: {e}")
@@ -1,5 +1,12 @@
 # Translations for Tropical Wood Application
 
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from geoip import lookup_country
+from http_cache import CachedJSON
+
 TRANSLATIONS = {
     "en": {
         # Company Information
@@ -176,6 +183,28 @@ TRANSLATIONS = {
     }
 }
 
+# Most distinct key filters whose serialized bundles are kept in memory
+BUNDLE_CACHE_SIZE = 256
+
+def normalize_key_filter(keys: Optional[str]) -> Tuple[str, ...]:
+    """Turn a ``keys`` query value like "nav_*,product_*" into a canonical
+    tuple of patterns, so equivalent filters share one cached bundle"""
+    if not keys:
+        return ()
+    return tuple(sorted({pattern.strip() for pattern in keys.split(",") if pattern.strip()}))
+
+@lru_cache(maxsize=BUNDLE_CACHE_SIZE)
+def get_translation_bundle(language: str, patterns: Tuple[str, ...] = ()) -> CachedJSON:
+    """Serialized, pre-compressed translations for ``language``, optionally
+    restricted to keys matching any of ``patterns`` (shell-style wildcards)"""
+    translations = TRANSLATIONS[language]
+    if patterns:
+        translations = {
+            key: value for key, value in translations.items()
+            if any(fnmatchcase(key, pattern) for pattern in patterns)
+        }
+    return CachedJSON({"language": language, "translations": translations})
+
 def get_translation(key: str, language: str = "en") -> str:
     """Get translation for a key in specified language"""
     if language not in TRANSLATIONS:
@@ -183,43 +212,103 @@ def get_translation(key: str, language: str = "en") -> str:
     
     return TRANSLATIONS[language].get(key, TRANSLATIONS["en"].get(key, key))
 
-def get_user_language(request, country_code: str = None) -> str:
-    """Detect user language based on country or Accept-Language header"""
-    
-    # French-speaking countries in Africa
-    french_countries = [
-        "CM",  # Cameroon
-        "CI",  # Ivory Coast
-        "SN",  # Senegal
-        "ML",  # Mali
-        "BF",  # Burkina Faso
-        "NE",  # Niger
-        "TD",  # Chad
-        "CF",  # Central African Republic
-        "GA",  # Gabon
-        "CG",  # Republic of the Congo
-        "CD",  # Democratic Republic of the Congo
-        "DJ",  # Djibouti
-        "KM",  # Comoros
-        "MG",  # Madagascar
-        "SC",  # Seychelles
-        "FR",  # France
-        "BE",  # Belgium
-        "CH",  # Switzerland (partial)
-        "CA",  # Canada (partial)
-        "MC",  # Monaco
-        "LU",  # Luxembourg
-        "AD",  # Andorra
-    ]
+# Languages the site is translated into; the first one is the default
+SUPPORTED_LANGUAGES = ("en", "fr")
+
+# French-speaking countries
+FRENCH_COUNTRIES = frozenset([
+    "CM",  # Cameroon
+    "CI",  # Ivory Coast
+    "SN",  # Senegal
+    "ML",  # Mali
+    "BF",  # Burkina Faso
+    "NE",  # Niger
+    "TD",  # Chad
+    "CF",  # Central African Republic
+    "GA",  # Gabon
+    "CG",  # Republic of the Congo
+    "CD",  # Democratic Republic of the Congo
+    "DJ",  # Djibouti
+    "KM",  # Comoros
+    "MG",  # Madagascar
+    "SC",  # Seychelles
+    "FR",  # France
+    "BE",  # Belgium
+    "CH",  # Switzerland (partial)
+    "CA",  # Canada (partial)
+    "MC",  # Monaco
+    "LU",  # Luxembourg
+    "AD",  # Andorra
+])
+
+# Most (IP prefix, Accept-Language) combinations remembered by detect_user_language
+LANGUAGE_CACHE_SIZE = 4096
+
+def parse_accept_language(header: str) -> List[Tuple[str, float]]:
+    """Parse an Accept-Language header (RFC 9110) into (tag, q) pairs,
+    highest preference first. Malformed entries are skipped."""
+    entries = []
+    for position, item in enumerate(header.split(",")):
+        tag, *params = [part.strip() for part in item.split(";")]
+        if not tag:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = -1.0
+        if 0 <= q <= 1:
+            entries.append((tag.lower(), q, position))
+    # Stable on position so equal weights keep header order
+    entries.sort(key=lambda entry: (-entry[1], entry[2]))
+    return [(tag, q) for tag, q, _ in entries]
+
+def negotiate_language(header: str) -> Optional[str]:
+    """Best supported language for an Accept-Language header, or None if the
+    header doesn't accept any of them"""
+    entries = parse_accept_language(header)
+    # "fr;q=0" explicitly refuses a language, wherever it appears in the header
+    excluded = {tag.split("-", 1)[0] for tag, q in entries if q == 0}
+    for tag, q in entries:
+        primary = tag.split("-", 1)[0]
+        if q == 0:
+            continue
+        if primary == "*":
+            # Any language the header doesn't refuse
+            for language in SUPPORTED_LANGUAGES:
+                if language not in excluded:
+                    return language
+        elif primary in SUPPORTED_LANGUAGES and primary not in excluded:
+            return primary
+    return None
+
+def pick_language(accept_language: str, country_code: Optional[str] = None) -> str:
+    """An explicit browser preference wins; otherwise fall back to the country"""
+    language = negotiate_language(accept_language)
+    if language:
+        return language
     
     # If country code suggests French
-    if country_code and country_code.upper() in french_countries:
-        return "fr"
-    
-    # Check Accept-Language header
-    accept_language = request.headers.get("accept-language", "")
-    if "fr" in accept_language.lower():
+    if country_code and country_code.upper() in FRENCH_COUNTRIES:
         return "fr"
     
     # Default to English
-    return "en"
\ No newline at end of file
+    return SUPPORTED_LANGUAGES[0]
+
+def ip_prefix(ip: Optional[str]) -> Optional[str]:
+    """Cache key for an address: its /24 for IPv4, the full address otherwise"""
+    if ip and ":" not in ip:
+        return ip.rsplit(".", 1)[0] + ".0"
+    return ip
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def _detect_cached(prefix: Optional[str], accept_language: str) -> Tuple[str, Optional[str]]:
+    country_code = lookup_country(prefix)
+    return pick_language(accept_language, country_code), country_code
+
+def detect_user_language(client_ip: Optional[str], accept_language: str) -> Tuple[str, Optional[str]]:
+    """(language, country code) for a client, memoized per IP prefix and header"""
+    return _detect_cached(ip_prefix(client_ip), accept_language)
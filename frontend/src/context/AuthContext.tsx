@@ -29,6 +29,12 @@ interface AuthContextType {
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
 
+// Authorization header for admin API calls, empty when not logged in
+export const authHeaders = (): Record<string, string> => {
+  const token = localStorage.getItem('accessToken');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (context === undefined) {
@@ -55,6 +61,11 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
         localStorage.removeItem('userPasswords');
         return null;
       }
+      // Sessions from before access tokens were issued can't call the admin API
+      if (!localStorage.getItem('accessToken')) {
+        localStorage.removeItem('currentUser');
+        return null;
+      }
       return parsedUser;
     }
     return null;
@@ -65,7 +76,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   // Load users from backend API
   const loadUsers = async () => {
     try {
-      const response = await fetch('/api/auth/users');
+      const response = await fetch('/api/auth/users', { headers: authHeaders() });
       if (response.ok) {
         const data = await response.json();
         setUsers(data.users);
@@ -95,6 +106,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
         if (data.success) {
           setUser(data.user);
           localStorage.setItem('currentUser', JSON.stringify(data.user));
+          localStorage.setItem('accessToken', data.access_token);
           await loadUsers(); // Refresh users list
           return true;
         }
@@ -106,8 +118,11 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   };
 
   const logout = () => {
+    // Revoke the token server-side; the redirect below doesn't wait for it
+    fetch('/api/auth/logout', { method: 'POST', headers: authHeaders() }).catch(() => {});
     setUser(null);
     localStorage.removeItem('currentUser');
+    localStorage.removeItem('accessToken');
     // Redirect to home page
     window.location.href = '/';
   };
@@ -130,6 +145,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...authHeaders(),
         },
         body: JSON.stringify({
           username: username,
@@ -153,6 +169,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...authHeaders(),
         },
         body: JSON.stringify(userData),
       });
@@ -16,7 +16,7 @@ import {
   ChevronRightIcon
 } from '@heroicons/react/24/outline';
 import UserManagement from './UserManagement';
-import { useAuth } from '../context/AuthContext';
+import { useAuth, authHeaders } from '../context/AuthContext';
 
 interface ContactRequest {
   id: string;
@@ -75,8 +75,8 @@ const Admin: React.FC<AdminProps> = ({ onLogout }) => {
     setLoading(true);
     try {
       // Load contact messages with pagination
-      const contactResponse = await fetch(`/api/contact-messages?page=${currentContactPage}&limit=20`);
-      const tourResponse = await fetch(`/api/virtual-tours?page=${currentTourPage}&limit=20`);
+      const contactResponse = await fetch(`/api/contact-messages?page=${currentContactPage}&limit=20`, { headers: authHeaders() });
+      const tourResponse = await fetch(`/api/virtual-tours?page=${currentTourPage}&limit=20`, { headers: authHeaders() });
       
       const allRequests: Request[] = [];
       
@@ -161,7 +161,8 @@ const Admin: React.FC<AdminProps> = ({ onLogout }) => {
       const response = await fetch(endpoint, {
         method: 'PATCH',
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          ...authHeaders()
         }
       });
       
@@ -197,7 +198,8 @@ const Admin: React.FC<AdminProps> = ({ onLogout }) => {
       const response = await fetch(endpoint, {
         method: 'DELETE',
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          ...authHeaders()
         }
       });
       